@@ -7,6 +7,7 @@ Two Xano endpoints are fetched separately, then merged in Python on id_legifranc
 Usage:
     python export_to_hf.py              # Full export + push to HF Hub
     python export_to_hf.py --dry-run    # Fetch + validate only, no push
+    python export_to_hf.py --wait       # Wait for a running Xano sync to finish first
 
 Env vars:
     XANO_BASE_URL  - Xano instance base URL (e.g. https://x123.xano.io/api:abc)
@@ -14,26 +15,149 @@ Env vars:
 """
 
 import argparse
+import hashlib
+import io
 import json
 import logging
 import os
 import sys
+import threading
+import time
+from datetime import datetime, timezone
+from queue import SimpleQueue
 
+import numpy as np
+import pyarrow.compute as pc
 import requests
-from datasets import Dataset, Features, Sequence, Value
+from datasets import Dataset, Features, Sequence, Value, concatenate_datasets, load_dataset
+from datasets.exceptions import DataFilesNotFoundError, DatasetNotFoundError
+from huggingface_hub.utils import EntryNotFoundError, RevisionNotFoundError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
 HF_REPO_ID = "ArthurSrz/open_codes"
+
+# Starting page sizes — the AdaptivePageSizer tunes them per endpoint at runtime
 CHUNKS_PER_PAGE = 500
 ARTICLES_PER_PAGE = 200
 
 
+# ── HTTP transport (pooled session + adaptive page sizing) ────────────────────
+
+HTTP_POOL_SIZE = 8
+HTTP_RETRIES = 3
+
+# Per-page latency / payload targets for the adaptive page sizer.
+# Embedding-heavy pages (1024 floats per chunk as JSON ≈ 20 KB/row) hit the
+# payload target long before the latency target.
+PAGE_TARGET_SECONDS = 4.0
+PAGE_TARGET_BYTES = 8 * 1024 * 1024
+
+# endpoint -> (min_per_page, max_per_page)
+PAGE_SIZE_LIMITS: dict[str, tuple[int, int]] = {
+    "/export_chunks_dataset": (100, 2000),
+    "/export_articles_dataset": (100, 2000),
+    "/export_legal_chunks_dataset": (100, 2000),
+    "/export_decisions_dataset": (100, 5000),
+    "/export_circulaires_dataset": (100, 5000),
+    "/export_reponses_dataset": (100, 5000),
+}
+DEFAULT_PAGE_SIZE_LIMITS = (50, 2000)
+
+_session: requests.Session | None = None
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide keep-alive session used for every Xano call.
+
+    The session pools connections (one TCP/TLS handshake per host instead of
+    one per page), negotiates gzip/deflate explicitly and retries transient
+    5xx / connection errors with exponential backoff.
+    """
+    global _session
+    if _session is None:
+        retry = Retry(
+            total=HTTP_RETRIES,
+            backoff_factor=1.0,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+        )
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+        _session = session
+    return _session
+
+
+class AdaptivePageSizer:
+    """Double or halve ``per_page`` to hit a target response time and payload size.
+
+    After each full page, the headroom is the smaller of
+    ``target_seconds / elapsed`` and ``target_bytes / payload``. Below 1 the
+    page size is halved; at 2 or more (a doubled page still fits the targets)
+    it is doubled. Sizes stay within [min_per_page, max_per_page].
+
+    Moving by powers of two keeps the fetched offset a multiple of the next
+    page size, so Xano's page numbering stays aligned without refetching rows.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_per_page: int,
+        max_per_page: int,
+        target_seconds: float = PAGE_TARGET_SECONDS,
+        target_bytes: int = PAGE_TARGET_BYTES,
+    ):
+        self.min_per_page = min_per_page
+        self.max_per_page = max_per_page
+        self.target_seconds = target_seconds
+        self.target_bytes = target_bytes
+        self.per_page = max(min_per_page, min(max_per_page, initial))
+
+    def update(self, elapsed: float, payload_bytes: int, n_items: int) -> int:
+        """Record one page's measurements and return the next per_page."""
+        # A short page is the tail of the result set and says nothing about capacity
+        if n_items < self.per_page:
+            return self.per_page
+        ratios = []
+        if elapsed > 0:
+            ratios.append(self.target_seconds / elapsed)
+        if payload_bytes > 0:
+            ratios.append(self.target_bytes / payload_bytes)
+        if not ratios:
+            return self.per_page
+        headroom = min(ratios)
+        if headroom < 1.0 and self.per_page // 2 >= self.min_per_page:
+            self.per_page //= 2
+        elif headroom >= 2.0 and self.per_page * 2 <= self.max_per_page:
+            self.per_page *= 2
+        return self.per_page
+
+
+def _page_sizer_for(endpoint: str, initial: int) -> AdaptivePageSizer:
+    lo, hi = PAGE_SIZE_LIMITS.get(endpoint, DEFAULT_PAGE_SIZE_LIMITS)
+    return AdaptivePageSizer(initial, lo, hi)
+
+
+def fetch_sync_status(base_url: str) -> dict:
+    """Return the raw /sync_status payload (queue counts, total_chunks, per-source counts)."""
+    resp = get_session().get(f"{base_url}/sync_status", timeout=30)
+    resp.raise_for_status()
+    return resp.json()
+
+
 def check_sync_status(base_url: str) -> bool:
     """Return True if sync pipeline is idle (safe to export)."""
-    resp = requests.get(f"{base_url}/sync_status", timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
+    data = fetch_sync_status(base_url)
     queue = data.get("queue", {})
     pending = queue.get("pending", 0)
     processing = queue.get("processing", 0)
@@ -44,29 +168,163 @@ def check_sync_status(base_url: str) -> bool:
     return True
 
 
+# ── Sync scheduling (wait for an idle queue instead of aborting) ─────────────
+
+# Xano sync source types, one per fetch group below. /sync_status may report
+# per-source queue counts under "sources": {source_type: {pending, processing}}.
+SYNC_SOURCES = ["legifrance", "judilibre", "circulaire", "reponse_ministerielle"]
+
+WAIT_TIMEOUT_SECONDS = 4 * 3600
+WAIT_INITIAL_DELAY = 30.0
+WAIT_MAX_DELAY = 600.0
+
+
+def _busy(queue: dict) -> int:
+    return (queue.get("pending", 0) or 0) + (queue.get("processing", 0) or 0)
+
+
+def settled_sources(status: dict) -> set[str]:
+    """Sources with nothing pending or processing.
+
+    An idle global queue settles everything; otherwise only sources that
+    /sync_status reports individually with an empty queue count as settled.
+    """
+    if _busy(status.get("queue", {})) == 0:
+        return set(SYNC_SOURCES)
+    per_source = status.get("sources") or {}
+    return {src for src in SYNC_SOURCES if src in per_source and _busy(per_source[src]) == 0}
+
+
+def wait_for_idle(
+    base_url: str,
+    timeout_seconds: float = WAIT_TIMEOUT_SECONDS,
+    on_settled=None,
+    initial_delay: float = WAIT_INITIAL_DELAY,
+    max_delay: float = WAIT_MAX_DELAY,
+    sleep=time.sleep,
+    clock=time.monotonic,
+) -> bool:
+    """Poll /sync_status until the queue is idle or the deadline passes.
+
+    Prints drain progress (remaining items, rate, ETA) on every poll. The
+    delay grows 1.5x per poll up to ``max_delay`` but never overshoots the
+    estimated drain time, so the export starts within one short poll of the
+    queue emptying. ``on_settled(source)`` is called once per source as soon
+    as it is settled, letting the caller fetch it while others still sync.
+    The calls run one at a time on a background thread, so a long fetch does
+    not stall polling or push the loop past its deadline; once the queue is
+    idle the remaining calls are awaited (they are part of the export), and
+    on timeout they are abandoned. A call that raises is reported and
+    skipped: the caller fetches that source again afterwards.
+    Transient /sync_status errors are retried until the deadline.
+
+    Returns True when idle, False on timeout.
+    """
+    deadline = clock() + timeout_seconds
+    delay = initial_delay
+    notified: set[str] = set()
+    settled_queue: SimpleQueue = SimpleQueue()
+    worker = None
+
+    def run_settled() -> None:
+        while (src := settled_queue.get()) is not None:
+            try:
+                on_settled(src)
+            except Exception as e:
+                print(f"  WARNING: early fetch of {src} failed, refetching after the wait: {e}")
+    warned_no_sources = False
+    last_remaining: int | None = None
+    last_time = clock()
+
+    while True:
+        try:
+            status = fetch_sync_status(base_url)
+        except requests.RequestException as e:
+            print(f"  sync_status unavailable ({e}), retrying...")
+            status = None
+
+        if status is not None:
+            queue = status.get("queue", {})
+            remaining = _busy(queue)
+            settled = settled_sources(status)
+            if on_settled is not None and remaining > 0 and "sources" not in status and not warned_no_sources:
+                warned_no_sources = True
+                print("  WARNING: sync_status has no per-source queues (\"sources\"): "
+                      "every source is fetched once the whole queue is idle")
+            if on_settled is not None:
+                for src in SYNC_SOURCES:
+                    if src in settled and src not in notified:
+                        notified.add(src)
+                        print(f"  Source {src} settled — fetching while sync continues")
+                        if worker is None:
+                            worker = threading.Thread(target=run_settled, name="settled-fetch", daemon=True)
+                            worker.start()
+                        settled_queue.put(src)
+
+            if remaining == 0:
+                print(f"Sync idle. {queue.get('done', 0)} done, {status.get('total_chunks', 0)} chunks in DB.")
+                if worker is not None:
+                    settled_queue.put(None)
+                    worker.join()
+                return True
+
+            now = clock()
+            eta = None
+            if last_remaining is not None and now > last_time and remaining < last_remaining:
+                rate = (last_remaining - remaining) / (now - last_time)
+                eta = remaining / rate
+            progress = f"{queue.get('pending', 0)} pending, {queue.get('processing', 0)} processing"
+            if eta is not None:
+                progress += f" — draining {rate * 60:.0f}/min, ETA {eta / 60:.1f} min"
+            print(f"  Sync running: {progress}")
+            last_remaining, last_time = remaining, now
+        else:
+            eta = None
+
+        left = deadline - clock()
+        if left <= 0:
+            print(f"ERROR: Sync still busy after {timeout_seconds / 60:.0f} min. Aborting.")
+            return False
+        wait = delay if eta is None else max(initial_delay, min(delay, eta))
+        sleep(min(wait, left))
+        delay = min(max_delay, delay * 1.5)
+
+
 def _paginate(base_url: str, endpoint: str, key: str, per_page: int, extra_params: dict | None = None) -> list[dict]:
-    """Generic paginator for Xano export endpoints."""
-    all_items = []
-    page = 1
+    """Generic paginator for Xano export endpoints.
+
+    ``per_page`` is only the starting size: it is re-tuned after every page by
+    an AdaptivePageSizer. A new size takes effect once the number of rows
+    already fetched is a multiple of it, so page N always starts at row
+    (N - 1) * per_page.
+    """
+    session = get_session()
+    sizer = _page_sizer_for(endpoint, per_page)
+    all_items: list[dict] = []
     while True:
+        if len(all_items) % sizer.per_page == 0:
+            per_page = sizer.per_page
+        page = len(all_items) // per_page + 1
         params: dict = {"page": page, "per_page": per_page}
         if extra_params:
             params.update(extra_params)
-        print(f"  Fetching {key} page {page}...", end=" ")
-        resp = requests.get(f"{base_url}{endpoint}", params=params, timeout=60)
+        print(f"  Fetching {key} page {page} ({per_page}/page)...", end=" ")
+        started = time.monotonic()
+        resp = session.get(f"{base_url}{endpoint}", params=params, timeout=60)
         resp.raise_for_status()
         data = resp.json()
+        elapsed = time.monotonic() - started
         # Xano paging wraps items: data[key] = {items: [...], itemsTotal, pageTotal, ...}
         wrapper = data.get(key, {})
         items = wrapper.get("items", []) if isinstance(wrapper, dict) else wrapper
         # Use Xano paging metadata (more reliable than computed total_pages)
         total = wrapper.get("itemsTotal", data.get("total", 0)) if isinstance(wrapper, dict) else data.get("total", 0)
         total_pages = wrapper.get("pageTotal", data.get("total_pages", 1)) if isinstance(wrapper, dict) else data.get("total_pages", 1)
-        print(f"{len(items)} items (total: {total}, page {page}/{total_pages})")
+        print(f"{len(items)} items (total: {total}, page {page}/{total_pages}, {elapsed:.1f}s)")
         all_items.extend(items)
-        if page >= total_pages:
+        if page >= total_pages or not items:
             break
-        page += 1
+        sizer.update(elapsed, len(resp.content), len(items))
     return all_items
 
 
@@ -108,12 +366,41 @@ def fetch_reponses_metadata(base_url: str) -> list[dict]:
 
 def fetch_code_names(base_url: str) -> dict[str, str]:
     """Fetch active codes from LEX_codes_piste via Xano list_active_codes endpoint."""
-    resp = requests.get(f"{base_url}/list_active_codes", timeout=30)
+    resp = get_session().get(f"{base_url}/list_active_codes", timeout=30)
     resp.raise_for_status()
     codes = resp.json()
     return {c["textId"]: c["titre"] for c in codes}
 
 
+def fetch_source(base_url: str, source: str) -> dict[str, list[dict]]:
+    """Fetch every Xano table feeding one sync source (see SYNC_SOURCES).
+
+    Returns {"chunks": [...], "metadata": [...]}; for legifrance the metadata
+    is the REF_codes_legifrance articles.
+    """
+    if source == "legifrance":
+        print("Fetching chunks from Xano...")
+        chunks = fetch_all_chunks(base_url)
+        print(f"Total chunks fetched: {len(chunks)}")
+        print("Fetching articles from Xano...")
+        metadata = fetch_all_articles(base_url)
+        print(f"Total articles fetched: {len(metadata)}")
+        return {"chunks": chunks, "metadata": metadata}
+
+    label, fetch_metadata = {
+        "judilibre": ("Judilibre decisions", fetch_decisions_metadata),
+        "circulaire": ("circulaires", fetch_circulaires_metadata),
+        "reponse_ministerielle": ("réponses ministérielles", fetch_reponses_metadata),
+    }[source]
+    print(f"Fetching {label} metadata...")
+    metadata = fetch_metadata(base_url)
+    print(f"  {len(metadata)} records fetched")
+    print(f"Fetching {label} chunks...")
+    chunks = fetch_legal_chunks(base_url, source)
+    print(f"  {len(chunks)} chunks fetched")
+    return {"chunks": chunks, "metadata": metadata}
+
+
 def dedup_articles(articles: list[dict]) -> list[dict]:
     """Deduplicate articles by id_legifrance, keeping the last occurrence."""
     seen: dict[str, dict] = {}
@@ -448,9 +735,742 @@ def transform_row(raw: dict, features: Features) -> dict:
     return row
 
 
-def generate_dataset_card() -> str:
-    """Generate the HF dataset card (README.md) content."""
-    return """---
+# ── Reduced-dimension projections (PCA) ──────────────────────────────────────
+
+# Published projected column sizes; nested, since PCA components are ordered
+PCA_DIMS = [256, 128]
+PCA_BLOCK_ROWS = 16384
+PROJECTIONS_DIR = "projections"
+
+
+def fit_pca(matrices: list[np.ndarray], n_components: int, block_rows: int = PCA_BLOCK_ROWS) -> dict[str, np.ndarray]:
+    """Fit a PCA over the rows of one or more (n, dim) embedding matrices.
+
+    Accumulates the sum and X^T X in float64 one block at a time (peak extra
+    memory: one block plus a dim x dim matrix), then takes the top
+    eigenvectors of the covariance. Each component's sign is fixed so its
+    largest loading is positive, making refits comparable night to night.
+    Zero rows (null embeddings) are left out of the fit, so they do not pull
+    the mean and the components towards the origin.
+
+    Returns float32 ``mean`` (dim,), ``components`` (n_components, dim) and
+    ``explained_variance_ratio`` (n_components,).
+    """
+    dim = matrices[0].shape[1]
+    total = np.zeros(dim, dtype=np.float64)
+    gram = np.zeros((dim, dim), dtype=np.float64)
+    n = 0
+    for matrix in matrices:
+        for start in range(0, len(matrix), block_rows):
+            block = matrix[start:start + block_rows].astype(np.float64)
+            block = block[np.any(block != 0, axis=1)]
+            total += block.sum(axis=0)
+            gram += block.T @ block
+            n += len(block)
+    if n < 2:
+        raise ValueError("PCA needs at least 2 rows")
+
+    mean = total / n
+    cov = (gram - n * np.outer(mean, mean)) / (n - 1)
+    eigvals, eigvecs = np.linalg.eigh(cov)
+    order = np.argsort(eigvals)[::-1][:n_components]
+    components = eigvecs[:, order].T
+    signs = np.sign(components[np.arange(len(components)), np.abs(components).argmax(axis=1)])
+    components *= signs[:, None]
+    explained = np.clip(eigvals[order], 0, None) / max(float(np.clip(eigvals, 0, None).sum()), 1e-12)
+    return {
+        "mean": mean.astype(np.float32),
+        "components": components.astype(np.float32),
+        "explained_variance_ratio": explained.astype(np.float32),
+    }
+
+
+def project_embeddings(matrix: np.ndarray, pca: dict[str, np.ndarray], dims: int,
+                       block_rows: int = PCA_BLOCK_ROWS) -> np.ndarray:
+    """Project (n, dim) embeddings onto the first ``dims`` components: (x - mean) @ W.T.
+
+    Zero rows (null embeddings) project to zero rows rather than to -mean @ W.T.
+    """
+    weights = pca["components"][:dims]
+    out = np.empty((len(matrix), dims), dtype=np.float32)
+    for start in range(0, len(matrix), block_rows):
+        block = matrix[start:start + block_rows]
+        out[start:start + block_rows] = (block - pca["mean"]) @ weights.T
+        out[start:start + block_rows][~np.any(block != 0, axis=1)] = 0
+    return out
+
+
+def add_projection_columns(ds: Dataset, pca: dict[str, np.ndarray], dims: list[int] = PCA_DIMS,
+                           matrix: np.ndarray | None = None) -> Dataset:
+    """Append one ``embedding_<d>`` float32[d] column per requested size.
+
+    ``matrix`` is the config's embedding_matrix when the caller already has it.
+    """
+    matrix = embedding_matrix(ds) if matrix is None else matrix
+    projected = project_embeddings(matrix, pca, max(dims))
+    columns = Dataset.from_dict(
+        {f"embedding_{d}": projected[:, :d] for d in dims},
+        features=Features({f"embedding_{d}": Sequence(Value("float32"), length=d) for d in dims}),
+    )
+    return concatenate_datasets([ds, columns], axis=1)
+
+
+def serialize_pca(pca: dict[str, np.ndarray]) -> bytes:
+    """Serialize a fitted projection as a compressed .npz (mean, components, explained_variance_ratio)."""
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **pca)
+    return buf.getvalue()
+
+
+def build_projections(
+    configs: dict[str, Dataset | None],
+    dims: list[int] = PCA_DIMS,
+    shared: bool = False,
+) -> tuple[dict[str, Dataset], dict[str, dict[str, np.ndarray]]]:
+    """Fit PCA per config (or one shared fit) and add the projected columns.
+
+    Returns the updated configs and the fitted projections keyed by artifact
+    name (the config name, or "shared"). Each embedding matrix is read once,
+    for both the fit and the projection.
+    """
+    names = [n for n, d in configs.items() if d is not None]
+    out = dict(configs)
+    fits: dict[str, dict[str, np.ndarray]] = {}
+    matrices: dict[str, np.ndarray] = {}
+    if shared and names:
+        matrices = {n: embedding_matrix(configs[n]) for n in names}
+        fits["shared"] = fit_pca(list(matrices.values()), max(dims))
+    for name in names:
+        matrix = matrices.pop(name) if shared else embedding_matrix(configs[name])
+        if not shared:
+            fits[name] = fit_pca([matrix], max(dims))
+        pca = fits["shared" if shared else name]
+        out[name] = add_projection_columns(configs[name], pca, dims, matrix=matrix)
+        kept = {d: float(pca["explained_variance_ratio"][:d].sum()) for d in dims}
+        print(f"  projections: {name}: " + ", ".join(f"{d} dims keep {v:.1%} variance" for d, v in kept.items()))
+    return out, fits
+
+
+# ── Nearest-neighbour graph (neighbors config) ───────────────────────────────
+
+NEIGHBORS_K = 10
+# Rows per side of each similarity block: a 4096 x 4096 float32 tile is 64 MB
+NEIGHBORS_BLOCK_ROWS = 4096
+# Published configs in neighbors-row order (rows are sorted by config, then row_id)
+NEIGHBORS_CONFIG_ORDER = ["default", "jurisprudence", "circulaires", "reponses_legis"]
+
+
+def embedding_matrix(ds: Dataset, column: str = "embedding") -> np.ndarray:
+    """Read a fixed-length embedding column as an (n, dim) float32 matrix via Arrow.
+
+    Null embeddings become zero rows. A zero row scores 0 against everything
+    under inner product, so callers ranking by similarity must mask it out
+    (build_neighbors_dataset does).
+    """
+    return _fixed_size_list_to_numpy(ds.data.column(column))
+
+
+def _fixed_size_list_to_numpy(column) -> np.ndarray:
+    arr = column.combine_chunks() if hasattr(column, "combine_chunks") else column
+    dim = arr.type.list_size
+    values = arr.values.slice(arr.offset * dim, len(arr) * dim)
+    matrix = values.to_numpy(zero_copy_only=False).astype(np.float32, copy=False).reshape(len(arr), dim)
+    if arr.null_count:
+        matrix = matrix.copy()
+        matrix[arr.is_null().to_numpy(zero_copy_only=False)] = 0.0
+    return matrix
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """Return row-wise L2-normalized float32 rows (zero rows stay zero)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def knn_topk(
+    queries: np.ndarray,
+    corpus: np.ndarray,
+    k: int,
+    exclude_self: bool = False,
+    block_rows: int = NEIGHBORS_BLOCK_ROWS,
+    corpus_valid: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Exact top-k inner-product neighbours of each query row in ``corpus``.
+
+    Runs as a blocked matrix product so peak memory is one
+    (block_rows, block_rows + k) tile, not the full (n_queries, n_corpus)
+    similarity matrix. With ``exclude_self`` the queries are the corpus and
+    row i never lists itself. ``corpus_valid`` (bool per corpus row) keeps
+    the False rows, e.g. null embeddings, out of every candidate list.
+
+    Returns (ids int64, scores float32), both (n_queries, k), sorted by
+    descending score. Missing slots (corpus smaller than k) are -1 / -inf.
+    """
+    n_queries = len(queries)
+    best_ids = np.full((n_queries, k), -1, dtype=np.int64)
+    best_scores = np.full((n_queries, k), -np.inf, dtype=np.float32)
+
+    for q_start in range(0, n_queries, block_rows):
+        q_block = queries[q_start:q_start + block_rows]
+        ids = best_ids[q_start:q_start + block_rows]
+        scores = best_scores[q_start:q_start + block_rows]
+
+        for c_start in range(0, len(corpus), block_rows):
+            c_block = corpus[c_start:c_start + block_rows]
+            sims = q_block @ c_block.T
+            if exclude_self:
+                rows = np.arange(len(q_block))
+                cols = rows + q_start - c_start
+                on_block = (cols >= 0) & (cols < len(c_block))
+                sims[rows[on_block], cols[on_block]] = -np.inf
+            if corpus_valid is not None:
+                sims[:, ~corpus_valid[c_start:c_start + len(c_block)]] = -np.inf
+
+            cand_scores = np.concatenate([scores, sims], axis=1)
+            cand_ids = np.concatenate(
+                [ids, np.broadcast_to(np.arange(c_start, c_start + len(c_block)), sims.shape)], axis=1
+            )
+            top = np.argpartition(-cand_scores, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(cand_scores, top, axis=1)
+            ids = np.take_along_axis(cand_ids, top, axis=1)
+
+        order = np.argsort(-scores, axis=1)
+        best_scores[q_start:q_start + block_rows] = np.take_along_axis(scores, order, axis=1)
+        best_ids[q_start:q_start + block_rows] = np.take_along_axis(ids, order, axis=1)
+
+    # Slots never filled (or only filled by masked self-matches) stay empty
+    best_ids[~np.isfinite(best_scores)] = -1
+    return best_ids, best_scores
+
+
+def build_neighbors_features(k: int) -> Features:
+    return Features({
+        "config": Value("string"),
+        "row_id": Value("int32"),
+        "within_ids": Sequence(Value("int32"), length=k),
+        "within_scores": Sequence(Value("float32"), length=k),
+        "cross_configs": Sequence(Value("string"), length=k),
+        "cross_ids": Sequence(Value("int32"), length=k),
+        "cross_scores": Sequence(Value("float32"), length=k),
+    })
+
+
+def build_neighbors_dataset(configs: dict[str, Dataset], k: int = NEIGHBORS_K) -> Dataset:
+    """Compute the top-k cosine-similarity graph within and across configs.
+
+    One row per source row, ordered by NEIGHBORS_CONFIG_ORDER then row_id, so
+    ``(config, row_id)`` maps to a fixed position. ``within_*`` lists the k
+    nearest rows of the same config (self excluded); ``cross_*`` the k nearest
+    rows from all other configs. Empty slots are id -1 with score NaN.
+    Rows with a null (zero) embedding are nobody's neighbour and have none.
+    """
+    names = [n for n in NEIGHBORS_CONFIG_ORDER if configs.get(n) is not None]
+    if not names:
+        raise ValueError("neighbors: no configs to index")
+    matrices = {n: l2_normalize(embedding_matrix(configs[n])) for n in names}
+    valid = {n: np.any(m != 0, axis=1) for n, m in matrices.items()}
+
+    parts: dict[str, list] = {col: [] for col in build_neighbors_features(k)}
+    for name in names:
+        queries = matrices[name]
+        n_rows = len(queries)
+        print(f"  neighbors: {name} ({n_rows} rows, k={k})")
+        within_ids, within_scores = knn_topk(queries, queries, k, exclude_self=True, corpus_valid=valid[name])
+
+        # Top-k per other config, then merge the candidate lists into one cross top-k
+        cand_ids, cand_scores, cand_configs = [], [], []
+        for other in names:
+            if other == name:
+                continue
+            ids, scores = knn_topk(queries, matrices[other], k, corpus_valid=valid[other])
+            cand_ids.append(ids)
+            cand_scores.append(scores)
+            cand_configs.append(np.full(ids.shape, other, dtype=object))
+        if cand_ids:
+            all_scores = np.concatenate(cand_scores, axis=1)
+            order = np.argsort(-all_scores, axis=1)[:, :k]
+            cross_ids = np.take_along_axis(np.concatenate(cand_ids, axis=1), order, axis=1)
+            cross_scores = np.take_along_axis(all_scores, order, axis=1)
+            cross_configs = np.take_along_axis(np.concatenate(cand_configs, axis=1), order, axis=1)
+            cross_configs[cross_ids < 0] = ""
+        else:
+            cross_ids = np.full((n_rows, k), -1, dtype=np.int64)
+            cross_scores = np.full((n_rows, k), np.nan, dtype=np.float32)
+            cross_configs = np.full((n_rows, k), "", dtype=object)
+
+        within_ids[~valid[name]] = -1
+        cross_ids[~valid[name]] = -1
+        cross_configs[~valid[name]] = ""
+
+        parts["config"].append(np.full(n_rows, name, dtype=object))
+        parts["row_id"].append(np.arange(n_rows, dtype=np.int32))
+        parts["within_ids"].append(within_ids.astype(np.int32))
+        parts["within_scores"].append(np.where(within_ids >= 0, within_scores, np.nan).astype(np.float32))
+        parts["cross_configs"].append(cross_configs)
+        parts["cross_ids"].append(cross_ids.astype(np.int32))
+        parts["cross_scores"].append(np.where(cross_ids >= 0, cross_scores, np.nan).astype(np.float32))
+
+    columns = {col: np.concatenate(chunks) for col, chunks in parts.items()}
+    columns["config"] = columns["config"].tolist()
+    columns["cross_configs"] = columns["cross_configs"].tolist()
+    return Dataset.from_dict(columns, features=build_neighbors_features(k))
+
+
+# ── Per-revision changelog (changelog config) ────────────────────────────────
+
+# Row identity per config: a chunk is (parent document id, chunk_index)
+CONFIG_KEY_FIELDS = {
+    "default": "id_legifrance",
+    "jurisprudence": "source_id",
+    "circulaires": "source_id",
+    "reponses_legis": "source_id",
+}
+
+
+def row_content_hashes(ds: Dataset, key_field: str) -> dict[tuple[str, int], tuple[int, str]]:
+    """Map each row's (key, chunk_index) to (row_id, sha1 of its content).
+
+    The hash covers every column: metadata as canonical JSON plus the raw
+    float32 bytes of the embedding, so a re-embedded chunk with unchanged
+    text still counts as updated. Derived ``embedding_<d>`` projections are
+    left out: they change whenever the PCA is refit.
+
+    Configs other than default are not deduplicated, so a (key, chunk_index)
+    can repeat: each repeat gets its occurrence number appended to the key
+    ("S1#2", "S1#3", in row order) and keeps its own entry and changelog line.
+    """
+    columns = [c for c in ds.column_names if not c.startswith("embedding")]
+    hashes: dict[tuple[str, int], tuple[int, str]] = {}
+    occurrences: dict[tuple[str, int], int] = {}
+    row_id = 0
+    for batch in ds.with_format("arrow").iter(batch_size=2048):
+        records = batch.select(columns).to_pylist()
+        embeddings = _fixed_size_list_to_numpy(batch.column("embedding")) if "embedding" in ds.column_names else None
+        for i, record in enumerate(records):
+            digest = hashlib.sha1(json.dumps(record, sort_keys=True, default=str).encode())
+            if embeddings is not None:
+                digest.update(embeddings[i].tobytes())
+            key = (record.get(key_field) or "", record.get("chunk_index") or 0)
+            occurrences[key] = occurrences.get(key, 0) + 1
+            if occurrences[key] > 1:
+                key = (f"{key[0]}#{occurrences[key]}", key[1])
+            hashes[key] = (row_id, digest.hexdigest())
+            row_id += 1
+    duplicated = sum(1 for n in occurrences.values() if n > 1)
+    if duplicated:
+        print(f"  WARNING: {duplicated} duplicate ({key_field}, chunk_index) keys, "
+              "repeats keyed by occurrence (key#2, key#3, …)")
+    return hashes
+
+
+def diff_row_hashes(
+    config: str,
+    new: dict[tuple[str, int], tuple[int, str]],
+    old: dict[tuple[str, int], tuple[int, str]],
+) -> list[dict]:
+    """List added, updated and removed keys between two row-hash maps.
+
+    ``row_id`` points into the new build (-1 for removed rows);
+    ``content_hash`` is the new hash (the old one for removed rows).
+    """
+    changes = []
+    for key, (row_id, digest) in new.items():
+        previous = old.get(key)
+        if previous is None:
+            change = "added"
+        elif previous[1] != digest:
+            change = "updated"
+        else:
+            continue
+        changes.append({"config": config, "change": change, "key": key[0], "chunk_index": key[1],
+                        "row_id": row_id, "content_hash": digest})
+    for key, (_, digest) in old.items():
+        if key not in new:
+            changes.append({"config": config, "change": "removed", "key": key[0], "chunk_index": key[1],
+                            "row_id": -1, "content_hash": digest})
+    return changes
+
+
+def resolve_published_revision(hf_token: str | None) -> str | None:
+    """Return the current commit SHA of the Hub dataset (None if unpublished/unreachable)."""
+    from huggingface_hub import HfApi
+    try:
+        return HfApi(token=hf_token).dataset_info(HF_REPO_ID).sha
+    except Exception as e:
+        print(f"  WARNING: could not resolve published revision: {e}")
+        return None
+
+
+def load_published_config(config: str, revision: str, hf_token: str | None) -> Dataset | None:
+    """Load one config's train split at a given Hub revision.
+
+    Returns None only when the config (or revision) does not exist there. Any
+    other failure (network, auth, Hub 5xx) is raised: diffing against an empty
+    base would report every row as added and no published row as removed.
+    """
+    try:
+        return load_dataset(HF_REPO_ID, config, split="train", revision=revision, token=hf_token)
+    except (DataFilesNotFoundError, DatasetNotFoundError, EntryNotFoundError, RevisionNotFoundError,
+            FileNotFoundError) as e:
+        print(f"  {config} not published at {revision[:12]}: {e}")
+        return None
+    except ValueError as e:
+        # Unknown config name: "BuilderConfig '<config>' not found. Available: [...]"
+        if "BuilderConfig" not in str(e):
+            raise
+        print(f"  {config} not published at {revision[:12]}: {e}")
+        return None
+
+
+def build_changelog_features() -> Features:
+    return Features({
+        "config": Value("string"),
+        "change": Value("string"),
+        "key": Value("string"),
+        "chunk_index": Value("int32"),
+        "row_id": Value("int32"),
+        "content_hash": Value("string"),
+        "base_revision": Value("string"),
+        "export_date": Value("string"),
+    })
+
+
+def build_changelog_dataset(
+    configs: dict[str, Dataset],
+    base_revision: str | None,
+    hf_token: str | None,
+    export_date: str,
+    row_hashes: dict[str, dict] | None = None,
+) -> Dataset:
+    """Diff each freshly built config against the same config at ``base_revision``.
+
+    Configs not built in this run are left out (their published shards are
+    untouched). With no base revision every row is reported as added.
+    ``row_hashes`` may carry already computed row_content_hashes per config.
+    """
+    changes: list[dict] = []
+    for config, ds in configs.items():
+        if ds is None:
+            continue
+        key_field = CONFIG_KEY_FIELDS[config]
+        new_hashes = (row_hashes or {}).get(config) or row_content_hashes(ds, key_field)
+        previous = load_published_config(config, base_revision, hf_token) if base_revision else None
+        old_hashes = row_content_hashes(previous, key_field) if previous is not None else {}
+        config_changes = diff_row_hashes(config, new_hashes, old_hashes)
+        counts = {c: sum(1 for x in config_changes if x["change"] == c) for c in ("added", "updated", "removed")}
+        print(f"  changelog: {config}: {counts['added']} added, {counts['updated']} updated, {counts['removed']} removed")
+        changes.extend(config_changes)
+
+    for change in changes:
+        change["base_revision"] = base_revision
+        change["export_date"] = export_date
+    return Dataset.from_list(changes, features=build_changelog_features())
+
+
+# ── Export manifest (manifest.json + card metadata) ──────────────────────────
+
+MANIFEST_PATH = "manifest.json"
+
+# Low-cardinality columns whose per-value row counts go into the manifest
+STATS_FACET_FIELDS = {
+    "default": ["code_name", "etat"],
+    "jurisprudence": ["jurisdiction", "chamber"],
+    "circulaires": ["ministere"],
+    "reponses_legis": ["ministere"],
+}
+
+# chunk_text length histogram bin edges (characters); the last bin is open-ended
+TEXT_LENGTH_BINS = [0, 250, 500, 1000, 2000, 4000, 8000, 16000]
+
+# Where push_to_hub writes each config's parquet shards in the Hub repo
+CONFIG_DATA_DIRS = {
+    "default": "data",
+    "jurisprudence": "jurisprudence",
+    "circulaires": "circulaires",
+    "reponses_legis": "reponses_legis",
+    "neighbors": "neighbors",
+    "changelog": "changelog",
+}
+
+
+def compute_config_stats(
+    ds: Dataset,
+    config: str,
+    row_hashes: dict[tuple[str, int], tuple[int, str]] | None = None,
+) -> dict:
+    """Summarize one built config with Arrow compute kernels.
+
+    Returns row count, per-value counts of the config's facet columns,
+    chunk_text length histogram, embedding L2-norm stats and a content hash
+    (SHA-256 over the per-row hashes in row order, stable across resharding).
+    """
+    table = ds.data
+    stats: dict = {"num_rows": ds.num_rows}
+
+    facets = {}
+    for field in STATS_FACET_FIELDS.get(config, []):
+        if field not in ds.column_names:
+            continue
+        counts = pc.value_counts(table.column(field)).to_pylist()
+        facets[field] = {
+            str(c["values"]): c["counts"]
+            for c in sorted(counts, key=lambda c: -c["counts"])
+        }
+    if facets:
+        stats["facets"] = facets
+
+    if "chunk_text" in ds.column_names:
+        lengths = pc.fill_null(pc.utf8_length(table.column("chunk_text")), 0).to_numpy()
+        counts, _ = np.histogram(lengths, bins=TEXT_LENGTH_BINS + [np.inf])
+        stats["text_length"] = {
+            "min": int(lengths.min()) if len(lengths) else 0,
+            "max": int(lengths.max()) if len(lengths) else 0,
+            "mean": round(float(lengths.mean()), 1) if len(lengths) else 0.0,
+            "bin_edges": TEXT_LENGTH_BINS,
+            "counts": counts.tolist(),
+        }
+
+    if "embedding" in ds.column_names:
+        norms = np.linalg.norm(embedding_matrix(ds), axis=1)
+        stats["embedding_norm"] = {
+            "dim": int(table.column("embedding").type.list_size),
+            "min": round(float(norms.min()), 6) if len(norms) else 0.0,
+            "max": round(float(norms.max()), 6) if len(norms) else 0.0,
+            "mean": round(float(norms.mean()), 6) if len(norms) else 0.0,
+            "std": round(float(norms.std()), 6) if len(norms) else 0.0,
+            "zero_vectors": int((norms == 0).sum()),
+        }
+
+    if row_hashes is None and config in CONFIG_KEY_FIELDS:
+        row_hashes = row_content_hashes(ds, CONFIG_KEY_FIELDS[config])
+    if row_hashes is not None:
+        digest = hashlib.sha256()
+        for _, row_hash in sorted(row_hashes.values()):
+            digest.update(row_hash.encode())
+        stats["content_hash"] = digest.hexdigest()
+
+    return stats
+
+
+def list_published_shards(hf_token: str | None, revision: str | None = None) -> dict[str, list[dict]]:
+    """List each config's parquet shards on the Hub with size and LFS SHA-256."""
+    from huggingface_hub import HfApi
+    api = HfApi(token=hf_token)
+    shards: dict[str, list[dict]] = {}
+    for config, data_dir in CONFIG_DATA_DIRS.items():
+        try:
+            entries = api.list_repo_tree(HF_REPO_ID, path_in_repo=data_dir, repo_type="dataset",
+                                         recursive=True, revision=revision)
+            files = [e for e in entries if getattr(e, "path", "").endswith(".parquet") and hasattr(e, "size")]
+        except Exception:
+            continue
+        shards[config] = [
+            {
+                "path": f.path,
+                "size": f.size,
+                "sha256": getattr(f.lfs, "sha256", None) if f.lfs else None,
+            }
+            for f in sorted(files, key=lambda f: f.path)
+        ]
+    return shards
+
+
+def build_manifest(
+    config_stats: dict[str, dict],
+    generated_at: str,
+    shards: dict[str, list[dict]] | None = None,
+    base_revision: str | None = None,
+    projections: dict[str, dict[str, np.ndarray]] | None = None,
+    pca_dims: list[int] = PCA_DIMS,
+) -> dict:
+    """Assemble manifest.json: one small file that says whether anything changed."""
+    configs = {}
+    for config, stats in config_stats.items():
+        entry = dict(stats)
+        if shards and config in shards:
+            entry["shards"] = shards[config]
+        if projections:
+            fit = projections.get("shared", projections.get(config))
+            if fit is not None and config in CONFIG_KEY_FIELDS:
+                name = "shared" if "shared" in projections else config
+                entry["projection"] = {
+                    "path": f"{PROJECTIONS_DIR}/{name}.npz",
+                    "dims": list(pca_dims),
+                    "explained_variance": {
+                        str(d): round(float(fit["explained_variance_ratio"][:d].sum()), 6) for d in pca_dims
+                    },
+                }
+        configs[config] = entry
+    return {
+        "dataset": HF_REPO_ID,
+        "generated_at": generated_at,
+        "base_revision": base_revision,
+        "total_rows": sum(
+            s["num_rows"] for c, s in config_stats.items() if c in CONFIG_KEY_FIELDS
+        ),
+        "configs": configs,
+    }
+
+
+def size_category(n: int) -> str:
+    """Map a row count to the Hub's size_categories label."""
+    for upper, label in [
+        (1_000, "n<1K"),
+        (10_000, "1K<n<10K"),
+        (100_000, "10K<n<100K"),
+        (1_000_000, "100K<n<1M"),
+        (10_000_000, "1M<n<10M"),
+        (100_000_000, "10M<n<100M"),
+        (1_000_000_000, "100M<n<1B"),
+        (10_000_000_000, "1B<n<10B"),
+        (100_000_000_000, "10B<n<100B"),
+        (1_000_000_000_000, "100B<n<1T"),
+    ]:
+        if n < upper:
+            return label
+    return "n>1T"
+
+
+def _manifest_card_yaml(manifest: dict) -> str:
+    """YAML header lines (dataset_info + manifest summary) for the dataset card."""
+    lines = ["dataset_info:"]
+    for config, stats in manifest["configs"].items():
+        lines += [
+            f"  - config_name: {config}",
+            "    splits:",
+            "      - name: train",
+            f"        num_examples: {stats['num_rows']}",
+        ]
+    lines += [
+        "open_codes_manifest:",
+        f"  path: {MANIFEST_PATH}",
+        f'  generated_at: "{manifest["generated_at"]}"',
+        f"  total_rows: {manifest['total_rows']}",
+        "  content_hashes:",
+    ]
+    for config, stats in manifest["configs"].items():
+        if stats.get("content_hash"):
+            lines.append(f"    {config}: {stats['content_hash']}")
+    return "\n".join(lines) + "\n"
+
+
+def _manifest_card_markdown(manifest: dict) -> str:
+    """Statistics section for the dataset card body."""
+    lines = [
+        "## Statistics",
+        "",
+        f"Generated at {manifest['generated_at']} — {manifest['total_rows']} chunks in total.",
+        f"Machine-readable version (with shard hashes): [`{MANIFEST_PATH}`]({MANIFEST_PATH}).",
+        "",
+        "| Config | Rows | Mean chunk length | Content hash |",
+        "|--------|------|-------------------|--------------|",
+    ]
+    for config, stats in manifest["configs"].items():
+        mean_len = stats.get("text_length", {}).get("mean", "")
+        content_hash = (stats.get("content_hash") or "")[:12]
+        lines.append(f"| `{config}` | {stats['num_rows']} | {mean_len} | `{content_hash}` |")
+    return "\n".join(lines) + "\n\n"
+
+
+# Configs derived from the data configs: declared on the card only when this export pushed them
+DERIVED_CONFIGS = {
+    "neighbors": (
+        "| `neighbors` | Precomputed top-k similar chunks, within and across configs "
+        "| Cosine similarity over `embedding` |\n",
+        """### `neighbors` config
+
+One row per chunk of the data configs, sorted by `config` (`default`,
+`jurisprudence`, `circulaires`, `reponses_legis`) then `row_id`, where
+`row_id` is the row position in that config's `train` split.
+
+| Column | Type | Description |
+|--------|------|-------------|
+| `config` | string | Config of the source chunk |
+| `row_id` | int32 | Row position of the source chunk in its config |
+| `within_ids` | int32[k] | Nearest rows in the same config (self excluded) |
+| `within_scores` | float32[k] | Cosine similarities for `within_ids` |
+| `cross_configs` | string[k] | Config of each cross-config neighbour |
+| `cross_ids` | int32[k] | Nearest rows in the other configs |
+| `cross_scores` | float32[k] | Cosine similarities for `cross_ids` |
+
+Empty slots (a config with fewer than k other rows) have id `-1` and score `NaN`.
+
+```python
+neighbors = load_dataset("ArthurSrz/open_codes", "neighbors", split="train")
+articles = neighbors.filter(lambda x: x["config"] == "default")
+similar = articles[42]["within_ids"]   # rows similar to default row 42, no embedding call
+```
+
+""",
+    ),
+    "changelog": (
+        "| `changelog` | Rows added, updated or removed by the latest export "
+        "| Diff against the previous revision |\n",
+        """### `changelog` config
+
+Each export diffs every rebuilt config against the revision that was
+published before it, keyed by (`id_legifrance`, `chunk_index`) for `default`
+and (`source_id`, `chunk_index`) for the other configs, plus a SHA-1 of the
+row content (metadata and embedding). The changelog at revision R lists
+exactly the changes from `base_revision` to R, so a downstream vector store
+can sync by walking the Hub commit history instead of re-indexing everything.
+
+| Column | Type | Description |
+|--------|------|-------------|
+| `config` | string | Config the row belongs to |
+| `change` | string | `added`, `updated` or `removed` |
+| `key` | string | `id_legifrance` (default) or `source_id` (other configs); a repeated (`key`, `chunk_index`) gets `#2`, `#3`, … in row order |
+| `chunk_index` | int32 | Chunk position within the parent document |
+| `row_id` | int32 | Row position in the new build (`-1` for removed rows) |
+| `content_hash` | string | SHA-1 of the row content (previous content for removed rows) |
+| `base_revision` | string | Hub commit SHA the diff was computed against (null on first publish) |
+| `export_date` | string | UTC timestamp of the export |
+
+```python
+changes = load_dataset("ArthurSrz/open_codes", "changelog", split="train")
+for c in changes.filter(lambda x: x["config"] == "default"):
+    if c["change"] == "removed":
+        store.delete((c["key"], c["chunk_index"]))
+    else:
+        store.upsert((c["key"], c["chunk_index"]), ds[c["row_id"]])
+```
+
+""",
+    ),
+}
+
+
+def card_configs(manifest: dict | None) -> list[str]:
+    """List the configs the dataset card declares.
+
+    The data configs always; ``neighbors`` and ``changelog`` only when the
+    manifest lists them (not pushed with ``--neighbors-k 0`` or
+    ``--skip-changelog``), or all of them without a manifest.
+    """
+    derived = [c for c in DERIVED_CONFIGS if manifest is None or c in manifest["configs"]]
+    return [c for c in CONFIG_DATA_DIRS if c not in DERIVED_CONFIGS or c in derived]
+
+
+def generate_dataset_card(manifest: dict | None = None) -> str:
+    """Generate the HF dataset card (README.md) content.
+
+    With a manifest, the YAML header carries the real size category,
+    per-config row counts and content hashes, and a Statistics section is added.
+    Derived configs are declared and documented per ``card_configs``.
+    """
+    size = size_category(manifest["total_rows"]) if manifest else "10K<n<100K"
+    manifest_yaml = _manifest_card_yaml(manifest) if manifest else ""
+    stats_md = _manifest_card_markdown(manifest) if manifest else ""
+    configs = card_configs(manifest)
+    configs_yaml = "".join(
+        f"  - config_name: {c}\n    data_files:\n      - split: train\n        path: {CONFIG_DATA_DIRS[c]}/train-*.parquet\n"
+        for c in configs
+    )
+    derived_rows = "".join(DERIVED_CONFIGS[c][0] for c in configs if c in DERIVED_CONFIGS)
+    neighbors_md = DERIVED_CONFIGS["neighbors"][1] if "neighbors" in configs else ""
+    changelog_md = DERIVED_CONFIGS["changelog"][1] if "changelog" in configs else ""
+    return f"""---
 license: etalab-2.0
 language:
   - fr
@@ -461,25 +1481,9 @@ tags:
   - legifrance
   - mistral
 size_categories:
-  - 10K<n<100K
-configs:
-  - config_name: default
-    data_files:
-      - split: train
-        path: data/train-*.parquet
-  - config_name: jurisprudence
-    data_files:
-      - split: train
-        path: jurisprudence/train-*.parquet
-  - config_name: circulaires
-    data_files:
-      - split: train
-        path: circulaires/train-*.parquet
-  - config_name: reponses_legis
-    data_files:
-      - split: train
-        path: reponses_legis/train-*.parquet
----
+  - {size}
+{manifest_yaml}configs:
+{configs_yaml}---
 
 # Open Codes
 
@@ -497,7 +1501,7 @@ legal code article.
 - **Source**: [PISTE Legifrance API](https://piste.gouv.fr/) (official French government legal database)
 - **License**: [Licence Ouverte / Etalab 2.0](https://www.etalab.gouv.fr/licence-ouverte-open-licence/)
 - **Embeddings**: Mistral AI `mistral-embed` (1024 dimensions)
-- **Update frequency**: Daily (nightly sync at 02:00 UTC, dataset push at 06:00 UTC)
+- **Update frequency**: Daily (nightly sync at 02:00 UTC, dataset push as soon as the sync queue drains)
 - **Codes**: Dynamically sourced from `LEX_codes_piste` (active codes only)
 - **Quality**: Dedup + stale-chunk filtering applied before every push
 
@@ -513,6 +1517,8 @@ Adding a new code there (with `actif=true`) automatically includes it in the nex
 |--------|------|-------------|
 | `chunk_text` | string | Text content of the chunk |
 | `embedding` | float32[1024] | Mistral AI embedding vector |
+| `embedding_256` | float32[256] | PCA projection of `embedding` (see below) |
+| `embedding_128` | float32[128] | PCA projection of `embedding` (first 128 components) |
 | `id_legifrance` | string | Legifrance article identifier |
 | `code_name` | string | Human-readable code name (e.g. "Code civil") |
 | `chunk_index` | int32 | Chunk position within the article (0-indexed) |
@@ -616,8 +1622,27 @@ Special value: `32472144000000` (year 2999) means "no end date" — the article
 | `jurisprudence` | Court decisions from Judilibre API | `REF_decisions_judilibre` + `REF_legal_chunks` |
 | `circulaires` | Government circulars | `REF_circulaires` + `REF_legal_chunks` |
 | `reponses_legis` | Parliamentary written answers | `REF_reponses_ministerial` + `REF_legal_chunks` |
+{derived_rows}
+{neighbors_md}### Reduced-dimension embeddings
+
+Every data config also carries `embedding_256` and `embedding_128`: PCA
+projections of the 1024-dim `embedding`, refit at each export. The
+projection is published as `projections/<config>.npz` (`mean`,
+`components`, `explained_variance_ratio`) so query vectors can be projected
+the same way. An index over `embedding_128` is 8x smaller than over
+`embedding`; rescoring its top candidates with the full vectors recovers
+most of the lost recall. The share of variance kept is in `manifest.json`.
+Rows without an embedding are left out of the fit and get all-zero projections.
 
-## Usage
+```python
+import numpy as np
+from huggingface_hub import hf_hub_download
+
+pca = np.load(hf_hub_download("ArthurSrz/open_codes", "projections/default.npz", repo_type="dataset"))
+query_128 = (query_emb - pca["mean"]) @ pca["components"][:128].T
+```
+
+{changelog_md}{stats_md}## Usage
 
 ```python
 from datasets import load_dataset
@@ -661,6 +1686,23 @@ and generates embeddings via Mistral AI.
 def main():
     parser = argparse.ArgumentParser(description="Export Xano chunks to HuggingFace")
     parser.add_argument("--dry-run", action="store_true", help="Fetch and validate only, no push")
+    parser.add_argument("--neighbors-k", type=int, default=NEIGHBORS_K,
+                        help=f"Neighbours per row in the neighbors config (default {NEIGHBORS_K}, 0 = skip)")
+    parser.add_argument("--skip-changelog", action="store_true",
+                        help="Do not diff against the published revision / push the changelog config")
+    parser.add_argument("--wait", action="store_true",
+                        help="Wait for the Xano sync queue to drain instead of aborting when busy")
+    parser.add_argument("--wait-timeout", type=float, default=WAIT_TIMEOUT_SECONDS,
+                        help=f"Seconds to wait for an idle queue with --wait (default {WAIT_TIMEOUT_SECONDS})")
+    parser.add_argument("--fetch-settled", action="store_true",
+                        help="With --wait, fetch each source as soon as its own queue is empty "
+                             "(needs per-source queues in /sync_status; otherwise waits for the whole queue)")
+    parser.add_argument("--pca-dims", default=",".join(str(d) for d in PCA_DIMS),
+                        help="Comma-separated projected embedding sizes to publish (empty = skip)")
+    parser.add_argument("--pca-shared", action="store_true",
+                        help="Fit one PCA over all configs instead of one per config")
+    parser.add_argument("--manifest-out", default=None,
+                        help=f"Also write {MANIFEST_PATH} to this local path")
     args = parser.parse_args()
 
     base_url = os.environ.get("XANO_BASE_URL")
@@ -673,19 +1715,27 @@ def main():
         print("ERROR: HF_TOKEN environment variable is required (or use --dry-run)")
         sys.exit(1)
 
-    # Step 1: Check sync status
+    # Step 1: Check sync status (or wait for it to drain)
     print("Checking sync status...")
-    if not check_sync_status(base_url):
+    fetched: dict[str, dict] = {}
+    if args.wait:
+        on_settled = None
+        if args.fetch_settled:
+            # Runs on wait_for_idle's background thread; a source whose fetch failed is fetched in step 2
+            def on_settled(source: str) -> None:
+                fetched[source] = fetch_source(base_url, source)
+        if not wait_for_idle(base_url, args.wait_timeout, on_settled=on_settled):
+            sys.exit(1)
+    elif not check_sync_status(base_url):
         sys.exit(1)
 
-    # Step 2: Fetch all data from both tables
-    print("Fetching chunks from Xano...")
-    raw_chunks = fetch_all_chunks(base_url)
-    print(f"Total chunks fetched: {len(raw_chunks)}")
+    # Step 2: Fetch all sources not already fetched while waiting
+    for source in SYNC_SOURCES:
+        if source not in fetched:
+            fetched[source] = fetch_source(base_url, source)
 
-    print("Fetching articles from Xano...")
-    raw_articles = fetch_all_articles(base_url)
-    print(f"Total articles fetched: {len(raw_articles)}")
+    raw_chunks = fetched["legifrance"]["chunks"]
+    raw_articles = fetched["legifrance"]["metadata"]
 
     if len(raw_chunks) == 0:
         print("ERROR: No chunks found. Aborting.")
@@ -718,30 +1768,10 @@ def main():
     if bad > 0:
         print(f"WARNING: {bad} chunks have non-1024 embeddings")
 
-    # ── Step 4b: Fetch and build the 3 new source type configs ──────────────
-    print("\nFetching Judilibre decisions metadata...")
-    decisions_meta = fetch_decisions_metadata(base_url)
-    print(f"  {len(decisions_meta)} decisions fetched")
-
-    print("Fetching jurisprudence chunks...")
-    juris_chunks = fetch_legal_chunks(base_url, "judilibre")
-    print(f"  {len(juris_chunks)} chunks fetched")
-
-    print("Fetching circulaires metadata...")
-    circ_meta = fetch_circulaires_metadata(base_url)
-    print(f"  {len(circ_meta)} circulaires fetched")
-
-    print("Fetching circulaires chunks...")
-    circ_chunks = fetch_legal_chunks(base_url, "circulaire")
-    print(f"  {len(circ_chunks)} chunks fetched")
-
-    print("Fetching réponses ministérielles metadata...")
-    rep_meta = fetch_reponses_metadata(base_url)
-    print(f"  {len(rep_meta)} réponses fetched")
-
-    print("Fetching réponses chunks...")
-    rep_chunks = fetch_legal_chunks(base_url, "reponse_ministerielle")
-    print(f"  {len(rep_chunks)} chunks fetched")
+    # ── Step 4b: Build the 3 new source type configs ───────────────────────
+    decisions_meta, juris_chunks = fetched["judilibre"]["metadata"], fetched["judilibre"]["chunks"]
+    circ_meta, circ_chunks = fetched["circulaire"]["metadata"], fetched["circulaire"]["chunks"]
+    rep_meta, rep_chunks = fetched["reponse_ministerielle"]["metadata"], fetched["reponse_ministerielle"]["chunks"]
 
     # Build each new config — skip gracefully if source tables are empty
     ds_juris = ds_circ = ds_rep = None
@@ -767,7 +1797,75 @@ def main():
     except ValueError as e:
         print(f"  SKIPPED: {e}")
 
+    # ── Step 4c: Reduced-dimension projections (PCA) ───────────────────────
+    pca_dims = sorted((int(d) for d in args.pca_dims.split(",") if d.strip()), reverse=True)
+    projections: dict = {}
+    if pca_dims:
+        print(f"\nFitting PCA projections ({', '.join(map(str, pca_dims))} dims)...")
+        projected, projections = build_projections(
+            {"default": ds, "jurisprudence": ds_juris, "circulaires": ds_circ, "reponses_legis": ds_rep},
+            dims=pca_dims,
+            shared=args.pca_shared,
+        )
+        ds, ds_juris, ds_circ, ds_rep = (
+            projected["default"], projected["jurisprudence"], projected["circulaires"], projected["reponses_legis"],
+        )
+
+    # ── Step 4d: Nearest-neighbour graph over all built configs ─────────────
+    ds_neighbors = None
+    if args.neighbors_k > 0:
+        print(f"\nBuilding neighbors graph (k={args.neighbors_k})...")
+        ds_neighbors = build_neighbors_dataset(
+            {"default": ds, "jurisprudence": ds_juris, "circulaires": ds_circ, "reponses_legis": ds_rep},
+            k=args.neighbors_k,
+        )
+        print(f"  {ds_neighbors}")
+
+    data_configs = {"default": ds, "jurisprudence": ds_juris, "circulaires": ds_circ, "reponses_legis": ds_rep}
+    export_date = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    row_hashes = {
+        name: row_content_hashes(d, CONFIG_KEY_FIELDS[name])
+        for name, d in data_configs.items() if d is not None
+    }
+
+    # ── Step 4e: Changelog against the currently published revision ─────────
+    # Resolved before any push: every push_to_hub below creates a new commit.
+    # Dry runs skip it (it downloads the published configs).
+    ds_changelog = None
+    base_revision = None
+    if args.dry_run and not args.skip_changelog:
+        print("\nDry run: changelog skipped (no download of the published revision)")
+    elif not args.skip_changelog:
+        print("\nDiffing against published revision...")
+        base_revision = resolve_published_revision(hf_token)
+        print(f"  Base revision: {base_revision or '(none — everything is new)'}")
+        try:
+            ds_changelog = build_changelog_dataset(
+                data_configs, base_revision, hf_token, export_date=export_date, row_hashes=row_hashes,
+            )
+            print(f"  {ds_changelog}")
+        except Exception as e:
+            # An incomplete diff would publish removals as missing: no changelog this run
+            print(f"  WARNING: published revision not readable, changelog skipped for this run: {e}")
+            base_revision = None
+
+    # ── Step 4f: Per-config statistics for manifest.json + dataset card ─────
+    print("\nComputing export statistics...")
+    config_stats = {
+        name: compute_config_stats(d, name, row_hashes.get(name))
+        for name, d in {**data_configs, "neighbors": ds_neighbors, "changelog": ds_changelog}.items()
+        if d is not None
+    }
+    for name, stats in config_stats.items():
+        print(f"  {name}: {stats['num_rows']} rows, content hash {stats.get('content_hash', '-')[:12]}")
+
     if args.dry_run:
+        if args.manifest_out:
+            manifest = build_manifest(config_stats, export_date, base_revision=base_revision,
+                                      projections=projections, pca_dims=pca_dims)
+            with open(args.manifest_out, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+            print(f"Manifest written to {args.manifest_out}")
         print("DRY RUN complete. All datasets built. Skipping push.")
         return
 
@@ -807,15 +1905,48 @@ def main():
             commit_message=f"Update reponses_legis config: {len(ds_rep)} chunks",
         )
 
-    # Push dataset card
-    from huggingface_hub import HfApi
+    if ds_neighbors is not None:
+        print("Pushing neighbors config...")
+        ds_neighbors.push_to_hub(
+            HF_REPO_ID,
+            config_name="neighbors",
+            token=hf_token,
+            commit_message=f"Update neighbors config: {len(ds_neighbors)} rows, k={args.neighbors_k}",
+        )
+
+    if ds_changelog is not None:
+        # Pushed even when empty, so the changelog at each revision always describes that revision
+        print("Pushing changelog config...")
+        ds_changelog.push_to_hub(
+            HF_REPO_ID,
+            config_name="changelog",
+            token=hf_token,
+            commit_message=f"Update changelog config: {len(ds_changelog)} changed rows",
+        )
+
+    # Push manifest + dataset card together, once shard hashes are known
+    from huggingface_hub import CommitOperationAdd, HfApi
+    manifest = build_manifest(
+        config_stats, export_date, shards=list_published_shards(hf_token), base_revision=base_revision,
+        projections=projections, pca_dims=pca_dims,
+    )
+    manifest_json = json.dumps(manifest, indent=2, ensure_ascii=False)
+    if args.manifest_out:
+        with open(args.manifest_out, "w", encoding="utf-8") as f:
+            f.write(manifest_json)
+    operations = [
+        CommitOperationAdd(path_in_repo=MANIFEST_PATH, path_or_fileobj=manifest_json.encode()),
+        CommitOperationAdd(path_in_repo="README.md", path_or_fileobj=generate_dataset_card(manifest).encode()),
+    ]
+    for name, pca in projections.items():
+        operations.append(CommitOperationAdd(path_in_repo=f"{PROJECTIONS_DIR}/{name}.npz",
+                                             path_or_fileobj=serialize_pca(pca)))
     api = HfApi(token=hf_token)
-    api.upload_file(
-        path_or_fileobj=generate_dataset_card().encode(),
-        path_in_repo="README.md",
+    api.create_commit(
         repo_id=HF_REPO_ID,
         repo_type="dataset",
-        commit_message="Update dataset card",
+        operations=operations,
+        commit_message=f"Update manifest, projections and dataset card: {manifest['total_rows']} chunks",
     )
 
     print(f"Done! Dataset available at https://huggingface.co/datasets/{HF_REPO_ID}")
@@ -5,21 +5,43 @@ No Xano connection needed — tests use fixtures from conftest.py.
 
 import json
 import sys
+import threading
+import time
 from pathlib import Path
 from unittest.mock import patch
 
+import numpy as np
 import pytest
+import requests
+from datasets import Dataset, Features, Sequence, Value
 
 # Add scripts/ to path so we can import export_to_hf
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from export_to_hf import (
+    AdaptivePageSizer,
+    _paginate,
+    build_changelog_dataset,
     build_dataset_features,
+    build_manifest,
+    build_neighbors_dataset,
+    build_projections,
+    compute_config_stats,
     dedup_articles,
     dedup_chunks,
+    diff_row_hashes,
     filter_stale_chunks,
+    fit_pca,
+    generate_dataset_card,
+    knn_topk,
+    l2_normalize,
+    load_published_config,
     merge_chunks_with_articles,
+    project_embeddings,
+    row_content_hashes,
+    size_category,
     transform_row,
+    wait_for_idle,
 )
 
 
@@ -126,3 +148,433 @@ class TestTransformRow:
         row = transform_row({}, features)
         assert row["chunk_text"] is None
         assert row["embedding"] is None
+
+
+class TestAdaptivePageSizer:
+    def test_doubles_when_well_under_targets(self):
+        sizer = AdaptivePageSizer(500, 100, 2000, target_seconds=4.0, target_bytes=8_000_000)
+        assert sizer.update(elapsed=1.0, payload_bytes=1_000_000, n_items=500) == 1000
+
+    def test_halves_when_payload_too_large(self):
+        sizer = AdaptivePageSizer(500, 100, 2000, target_seconds=4.0, target_bytes=8_000_000)
+        assert sizer.update(elapsed=1.0, payload_bytes=10_000_000, n_items=500) == 250
+
+    def test_holds_inside_band(self):
+        sizer = AdaptivePageSizer(500, 100, 2000, target_seconds=4.0, target_bytes=8_000_000)
+        assert sizer.update(elapsed=3.0, payload_bytes=5_000_000, n_items=500) == 500
+
+    def test_respects_limits(self):
+        sizer = AdaptivePageSizer(2000, 100, 2000)
+        assert sizer.update(elapsed=0.1, payload_bytes=1000, n_items=2000) == 2000
+        sizer = AdaptivePageSizer(100, 100, 2000)
+        assert sizer.update(elapsed=60.0, payload_bytes=1000, n_items=100) == 100
+
+    def test_short_page_ignored(self):
+        sizer = AdaptivePageSizer(500, 100, 2000)
+        assert sizer.update(elapsed=0.1, payload_bytes=1000, n_items=12) == 500
+
+
+class _FakeResponse:
+    def __init__(self, payload: dict):
+        self._payload = payload
+        self.content = json.dumps(payload).encode()
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class _FakeXano:
+    """Serves rows 0..n-1 with Xano paging semantics for any per_page."""
+
+    def __init__(self, n: int):
+        self.rows = [{"id": i} for i in range(n)]
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        page, per_page = params["page"], params["per_page"]
+        self.calls.append((page, per_page))
+        items = self.rows[(page - 1) * per_page: page * per_page]
+        page_total = max(1, -(-len(self.rows) // per_page))
+        return _FakeResponse({"chunks": {"items": items, "itemsTotal": len(self.rows), "pageTotal": page_total}})
+
+
+class TestPaginate:
+    @patch("export_to_hf.get_session")
+    def test_fetches_every_row_once_while_resizing(self, mock_session):
+        xano = _FakeXano(2350)
+        mock_session.return_value = xano
+        # Tiny payloads + fast responses make the sizer grow on every page
+        result = _paginate("http://fake", "/export_chunks_dataset", "chunks", 100)
+        assert [r["id"] for r in result] == list(range(2350))
+        assert len({size for _, size in xano.calls}) > 1
+
+    @patch("export_to_hf.get_session")
+    def test_single_page(self, mock_session):
+        mock_session.return_value = _FakeXano(3)
+        result = _paginate("http://fake", "/export_chunks_dataset", "chunks", 500)
+        assert len(result) == 3
+
+
+def _embedding_ds(matrix: np.ndarray) -> Dataset:
+    features = Features({"embedding": Sequence(Value("float32"), length=matrix.shape[1])})
+    return Dataset.from_dict({"embedding": matrix}, features=features)
+
+
+class TestKnnTopk:
+    def test_matches_brute_force_across_blocks(self):
+        rng = np.random.default_rng(0)
+        x = l2_normalize(rng.normal(size=(37, 16)).astype(np.float32))
+        sims = x @ x.T
+        np.fill_diagonal(sims, -np.inf)
+        expected = np.argsort(-sims, axis=1)[:, :4]
+        ids, scores = knn_topk(x, x, 4, exclude_self=True, block_rows=8)
+        assert (ids == expected).all()
+        assert (np.diff(scores, axis=1) <= 0).all()
+
+    def test_small_corpus_pads_with_minus_one(self):
+        x = l2_normalize(np.eye(3, dtype=np.float32))
+        ids, _ = knn_topk(x, x, 5, exclude_self=True)
+        assert (ids[:, 2:] == -1).all()
+        assert (ids[:, :2] >= 0).all()
+
+
+class TestBuildNeighborsDataset:
+    def test_rows_ordered_by_config_then_row_id(self):
+        rng = np.random.default_rng(1)
+        configs = {
+            "jurisprudence": _embedding_ds(rng.normal(size=(4, 8)).astype(np.float32)),
+            "default": _embedding_ds(rng.normal(size=(6, 8)).astype(np.float32)),
+            "circulaires": None,
+        }
+        ds = build_neighbors_dataset(configs, k=3)
+        assert ds["config"] == ["default"] * 6 + ["jurisprudence"] * 4
+        assert ds["row_id"] == list(range(6)) + list(range(4))
+        row = ds[0]
+        assert 0 not in row["within_ids"]
+        assert row["cross_configs"] == ["jurisprudence"] * 3
+
+    def test_identical_vectors_are_top_neighbours(self):
+        base = np.random.default_rng(2).normal(size=(5, 8)).astype(np.float32)
+        base[3] = base[0] * 2.0  # same direction, different norm
+        ds = build_neighbors_dataset({"default": _embedding_ds(base)}, k=2)
+        assert ds[0]["within_ids"][0] == 3
+        assert ds[0]["within_scores"][0] == pytest.approx(1.0, abs=1e-5)
+
+    def test_null_embeddings_excluded(self):
+        base = np.random.default_rng(3).normal(size=(5, 8)).astype(np.float32)
+        base[2] = 0.0  # null embedding
+        # k=4 slots but only 3 other real rows: an unmasked zero row would fill the last one
+        ds = build_neighbors_dataset({"default": _embedding_ds(base)}, k=4)
+        for row in ds:
+            assert 2 not in row["within_ids"]
+        assert ds[2]["within_ids"] == [-1] * 4
+
+
+def _legal_ds(rows: list[dict]) -> Dataset:
+    features = Features({
+        "chunk_text": Value("string"),
+        "embedding": Sequence(Value("float32"), length=2),
+        "source_id": Value("string"),
+        "chunk_index": Value("int32"),
+    })
+    return Dataset.from_list(rows, features=features)
+
+
+class TestChangelog:
+    OLD = [
+        {"chunk_text": "a", "embedding": [1.0, 0.0], "source_id": "S1", "chunk_index": 0},
+        {"chunk_text": "b", "embedding": [0.0, 1.0], "source_id": "S1", "chunk_index": 1},
+        {"chunk_text": "c", "embedding": [1.0, 1.0], "source_id": "S2", "chunk_index": 0},
+    ]
+
+    def test_unchanged_rows_not_reported(self):
+        hashes = row_content_hashes(_legal_ds(self.OLD), "source_id")
+        assert diff_row_hashes("circulaires", hashes, hashes) == []
+
+    def test_added_updated_removed(self):
+        new_rows = [
+            self.OLD[0],
+            {**self.OLD[1], "embedding": [0.0, 0.5]},  # re-embedded only
+            {"chunk_text": "d", "embedding": [0.5, 0.5], "source_id": "S3", "chunk_index": 0},
+        ]
+        old = row_content_hashes(_legal_ds(self.OLD), "source_id")
+        new = row_content_hashes(_legal_ds(new_rows), "source_id")
+        changes = {(c["key"], c["chunk_index"]): c for c in diff_row_hashes("circulaires", new, old)}
+        assert changes[("S1", 1)]["change"] == "updated"
+        assert changes[("S3", 0)]["change"] == "added"
+        assert changes[("S3", 0)]["row_id"] == 2
+        assert changes[("S2", 0)]["change"] == "removed"
+        assert changes[("S2", 0)]["row_id"] == -1
+        assert ("S1", 0) not in changes
+
+    def test_duplicate_keys_kept_by_occurrence(self):
+        duplicated = [*self.OLD, {**self.OLD[0], "chunk_text": "a bis"}]
+        old = row_content_hashes(_legal_ds(duplicated), "source_id")
+        assert set(old) == {("S1", 0), ("S1", 1), ("S2", 0), ("S1#2", 0)}
+        assert old[("S1#2", 0)][0] == 3
+
+        new_rows = [*self.OLD, {**self.OLD[0], "chunk_text": "a ter"}]
+        new = row_content_hashes(_legal_ds(new_rows), "source_id")
+        changes = diff_row_hashes("circulaires", new, old)
+        assert [(c["key"], c["chunk_index"], c["change"]) for c in changes] == [("S1#2", 0, "updated")]
+
+    def test_no_base_revision_reports_everything_added(self):
+        ds = build_changelog_dataset({"circulaires": _legal_ds(self.OLD), "jurisprudence": None},
+                                     None, None, export_date="2026-01-01T00:00:00Z")
+        assert len(ds) == 3
+        assert set(ds["change"]) == {"added"}
+        assert ds[0]["base_revision"] is None
+
+    @patch("export_to_hf.load_published_config")
+    def test_diffs_against_published_config(self, mock_load):
+        mock_load.return_value = _legal_ds(self.OLD)
+        new_rows = self.OLD[:2]
+        ds = build_changelog_dataset({"circulaires": _legal_ds(new_rows)}, "abc123", None,
+                                     export_date="2026-01-01T00:00:00Z")
+        assert ds["change"] == ["removed"]
+        assert ds[0]["base_revision"] == "abc123"
+        mock_load.assert_called_once_with("circulaires", "abc123", None)
+
+    @patch("export_to_hf.load_dataset")
+    def test_missing_config_loads_as_none(self, mock_load_dataset):
+        mock_load_dataset.side_effect = ValueError("BuilderConfig 'circulaires' not found. Available: ['default']")
+        assert load_published_config("circulaires", "abc123", None) is None
+
+    @patch("export_to_hf.load_dataset")
+    def test_hub_failure_is_raised(self, mock_load_dataset):
+        mock_load_dataset.side_effect = ConnectionError("503 Service Unavailable")
+        with pytest.raises(ConnectionError):
+            load_published_config("circulaires", "abc123", None)
+        with pytest.raises(ConnectionError):
+            build_changelog_dataset({"circulaires": _legal_ds(self.OLD)}, "abc123", None,
+                                    export_date="2026-01-01T00:00:00Z")
+
+
+class TestManifest:
+    ROWS = [
+        {"chunk_text": "x" * 100, "embedding": [3.0, 4.0], "source_id": "S1", "chunk_index": 0, "ministere": "Travail"},
+        {"chunk_text": "y" * 600, "embedding": [0.0, 1.0], "source_id": "S2", "chunk_index": 0, "ministere": "Travail"},
+        {"chunk_text": None, "embedding": [0.0, 0.0], "source_id": "S3", "chunk_index": 0, "ministere": "Justice"},
+    ]
+
+    def _ds(self, rows):
+        features = Features({
+            "chunk_text": Value("string"),
+            "embedding": Sequence(Value("float32"), length=2),
+            "source_id": Value("string"),
+            "chunk_index": Value("int32"),
+            "ministere": Value("string"),
+        })
+        return Dataset.from_list(rows, features=features)
+
+    def test_config_stats(self):
+        stats = compute_config_stats(self._ds(self.ROWS), "circulaires")
+        assert stats["num_rows"] == 3
+        assert stats["facets"]["ministere"] == {"Travail": 2, "Justice": 1}
+        assert sum(stats["text_length"]["counts"]) == 3
+        assert stats["text_length"]["max"] == 600
+        assert stats["embedding_norm"]["max"] == pytest.approx(5.0)
+        assert stats["embedding_norm"]["zero_vectors"] == 1
+
+    def test_content_hash_tracks_content(self):
+        a = compute_config_stats(self._ds(self.ROWS), "circulaires")["content_hash"]
+        b = compute_config_stats(self._ds(self.ROWS), "circulaires")["content_hash"]
+        changed = [dict(self.ROWS[0], chunk_text="z"), *self.ROWS[1:]]
+        c = compute_config_stats(self._ds(changed), "circulaires")["content_hash"]
+        assert a == b
+        assert a != c
+
+    def test_size_category(self):
+        assert size_category(999) == "n<1K"
+        assert size_category(45_000) == "10K<n<100K"
+        assert size_category(2_500_000) == "1M<n<10M"
+
+    def test_card_yaml_reflects_manifest(self):
+        stats = {"circulaires": compute_config_stats(self._ds(self.ROWS), "circulaires")}
+        manifest = build_manifest(stats, "2026-01-01T00:00:00Z")
+        assert manifest["total_rows"] == 3
+        card = generate_dataset_card(manifest)
+        header = card.split("---")[1]
+        assert "  - n<1K" in header
+        assert "num_examples: 3" in header
+        assert stats["circulaires"]["content_hash"] in header
+        assert "## Statistics" in card
+
+    def _card_configs(self, card):
+        header = card.split("---")[1]
+        return [line.split(": ")[1] for line in header.split("configs:\n")[-1].splitlines()
+                if "config_name" in line]
+
+    def test_card_declares_only_pushed_derived_configs(self):
+        stats = {"default": compute_config_stats(self._ds(self.ROWS), "circulaires")}
+        changelog = compute_config_stats(self._ds(self.ROWS), "changelog")
+        neighbors = compute_config_stats(self._ds(self.ROWS), "neighbors")
+        data = ["default", "jurisprudence", "circulaires", "reponses_legis"]
+
+        # --neighbors-k 0
+        card = generate_dataset_card(build_manifest({**stats, "changelog": changelog}, "2026-01-01T00:00:00Z"))
+        assert self._card_configs(card) == [*data, "changelog"]
+        assert "### `neighbors` config" not in card
+        assert "| `neighbors` |" not in card
+        # --skip-changelog
+        card = generate_dataset_card(build_manifest({**stats, "neighbors": neighbors}, "2026-01-01T00:00:00Z"))
+        assert self._card_configs(card) == [*data, "neighbors"]
+        assert "### `changelog` config" not in card
+        assert "### `neighbors` config" in card
+
+    def test_card_without_manifest_unchanged_header(self):
+        card = generate_dataset_card()
+        assert "10K<n<100K" in card
+        assert "dataset_info" not in card
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _status(pending, processing=0, sources=None):
+    status = {"queue": {"pending": pending, "processing": processing, "done": 10}, "total_chunks": 100}
+    if sources is not None:
+        status["sources"] = sources
+    return status
+
+
+class TestWaitForIdle:
+    @patch("export_to_hf.fetch_sync_status")
+    def test_returns_once_queue_drains(self, mock_status):
+        mock_status.side_effect = [_status(100, 2), _status(40, 2), _status(0)]
+        fake = _FakeClock()
+        assert wait_for_idle("http://fake", 3600, sleep=fake.sleep, clock=fake.clock) is True
+        assert len(fake.sleeps) == 2
+
+    @patch("export_to_hf.fetch_sync_status")
+    def test_times_out(self, mock_status):
+        mock_status.return_value = _status(5)
+        fake = _FakeClock()
+        assert wait_for_idle("http://fake", 100, sleep=fake.sleep, clock=fake.clock) is False
+        assert fake.now == pytest.approx(100)
+
+    @patch("export_to_hf.fetch_sync_status")
+    def test_settled_sources_notified_once(self, mock_status):
+        busy_juris = {"legifrance": {"pending": 0, "processing": 0}, "judilibre": {"pending": 7}}
+        mock_status.side_effect = [_status(7, sources=busy_juris), _status(3, sources=busy_juris), _status(0)]
+        fake = _FakeClock()
+        settled = []
+        assert wait_for_idle("http://fake", 3600, on_settled=settled.append, sleep=fake.sleep, clock=fake.clock)
+        assert settled == ["legifrance", "judilibre", "circulaire", "reponse_ministerielle"]
+
+    @patch("export_to_hf.fetch_sync_status")
+    def test_without_per_source_queues_waits_for_idle(self, mock_status, capsys):
+        mock_status.side_effect = [_status(7), _status(3), _status(0)]
+        fake = _FakeClock()
+        settled = []
+        assert wait_for_idle("http://fake", 3600, on_settled=settled.append, sleep=fake.sleep, clock=fake.clock)
+        assert settled == ["legifrance", "judilibre", "circulaire", "reponse_ministerielle"]
+        assert capsys.readouterr().out.count("no per-source queues") == 1
+
+    @patch("export_to_hf.fetch_sync_status")
+    def test_slow_settled_fetch_does_not_extend_deadline(self, mock_status):
+        settled_legifrance = {"legifrance": {"pending": 0}, "judilibre": {"pending": 5}}
+        mock_status.return_value = _status(5, sources=settled_legifrance)
+        fake = _FakeClock()
+        release = threading.Event()
+
+        def slow_fetch(source):
+            release.wait(10)
+
+        started_at = time.monotonic()
+        try:
+            assert wait_for_idle("http://fake", 100, on_settled=slow_fetch, sleep=fake.sleep, clock=fake.clock) is False
+            # The poll loop reached its deadline while the fetch was still running
+            assert time.monotonic() - started_at < 2
+            assert fake.now == pytest.approx(100)
+        finally:
+            release.set()
+
+    @patch("export_to_hf.fetch_sync_status")
+    def test_failed_settled_fetch_is_reported(self, mock_status, capsys):
+        mock_status.side_effect = [_status(0, sources={})]
+
+        def failing_fetch(source):
+            raise requests.ConnectionError("reset")
+
+        assert wait_for_idle("http://fake", 100, on_settled=failing_fetch, sleep=lambda s: None) is True
+        assert capsys.readouterr().out.count("refetching after the wait") == 4
+
+    @patch("export_to_hf.fetch_sync_status")
+    def test_sleep_capped_by_drain_eta(self, mock_status):
+        mock_status.side_effect = [_status(1000), _status(10), _status(0)]
+        fake = _FakeClock()
+        wait_for_idle("http://fake", 3600, initial_delay=30, max_delay=600, sleep=fake.sleep, clock=fake.clock)
+        # 990 items drained in 30s -> 10 left is well under the next 45s backoff step
+        assert fake.sleeps == [30, 30]
+
+
+class TestPca:
+    def _matrix(self, n=300, dim=12, seed=3):
+        rng = np.random.default_rng(seed)
+        # Strongly anisotropic data so the leading components are well separated
+        return (rng.normal(size=(n, dim)) * np.linspace(5, 0.1, dim)).astype(np.float32)
+
+    def test_matches_svd(self):
+        x = self._matrix()
+        pca = fit_pca([x[:100], x[100:]], 4, block_rows=64)
+        centered = x - x.mean(axis=0)
+        _, sv, vt = np.linalg.svd(centered, full_matrices=False)
+        for got, ref in zip(pca["components"], vt[:4]):
+            assert abs(float(got @ ref)) == pytest.approx(1.0, abs=1e-4)
+        expected_ratio = (sv[:4] ** 2) / (sv ** 2).sum()
+        assert pca["explained_variance_ratio"] == pytest.approx(expected_ratio, rel=1e-3)
+
+    def test_projection_is_nested(self):
+        x = self._matrix()
+        pca = fit_pca([x], 6)
+        wide = project_embeddings(x, pca, 6)
+        narrow = project_embeddings(x, pca, 3)
+        assert np.allclose(wide[:, :3], narrow, atol=1e-5)
+
+    def test_build_projections_adds_columns(self):
+        ds = _embedding_ds(self._matrix(n=20, dim=8))
+        out, fits = build_projections({"default": ds, "circulaires": None}, dims=[4, 2])
+        assert out["circulaires"] is None
+        assert out["default"].column_names == ["embedding", "embedding_4", "embedding_2"]
+        assert len(out["default"][0]["embedding_4"]) == 4
+        assert set(fits) == {"default"}
+
+    def test_null_embeddings_left_out_of_fit(self):
+        x = self._matrix(n=30, dim=8)
+        rows = [*x.tolist(), None, None]
+        ds = Dataset.from_dict({"embedding": rows},
+                               features=Features({"embedding": Sequence(Value("float32"), length=8)}))
+        out, fits = build_projections({"default": ds}, dims=[3])
+        reference = fit_pca([x], 3)
+        assert np.allclose(fits["default"]["mean"], reference["mean"], atol=1e-5)
+        assert np.allclose(np.abs(fits["default"]["components"]), np.abs(reference["components"]), atol=1e-4)
+        projected = np.array(out["default"]["embedding_3"])
+        assert np.allclose(projected[:30], project_embeddings(x, reference, 3), atol=1e-4)
+        assert (projected[30:] == 0).all()
+
+    def test_shared_fit(self):
+        a, b = _embedding_ds(self._matrix(n=20, dim=8)), _embedding_ds(self._matrix(n=15, dim=8, seed=4))
+        _, fits = build_projections({"default": a, "jurisprudence": b}, dims=[2], shared=True)
+        assert set(fits) == {"shared"}
+
+    def test_row_hashes_ignore_projections(self):
+        rows = [{"chunk_text": "a", "embedding": [1.0, 0.0], "source_id": "S1", "chunk_index": 0},
+                {"chunk_text": "b", "embedding": [0.0, 1.0], "source_id": "S2", "chunk_index": 0},
+                {"chunk_text": "c", "embedding": [1.0, 1.0], "source_id": "S3", "chunk_index": 0}]
+        ds = _legal_ds(rows)
+        projected, _ = build_projections({"circulaires": ds}, dims=[1])
+        assert row_content_hashes(ds, "source_id") == row_content_hashes(projected["circulaires"], "source_id")
@@ -0,0 +1,57 @@
+"""Unit tests for the Space LRU/TTL cache and query normalization (spaces/enirtcod/cache.py)."""
+
+import sys
+from pathlib import Path
+
+# Add the Space to path so its modules import as in app.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "spaces" / "enirtcod"))
+
+from cache import LRUCache, normalize_query
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalize_query_folds_case_accents_and_spaces():
+    assert normalize_query("  Responsabilité   Civile ") == "responsabilite civile"
+
+
+class TestLRUCache:
+    def test_least_recently_used_evicted(self):
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1  # "b" is now least recently used
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_ttl_expiry(self):
+        clock = _FakeClock()
+        cache = LRUCache(maxsize=4, ttl_seconds=60, clock=clock)
+        cache.put("a", 1)
+        clock.now += 60
+        assert cache.get("a") == 1
+        clock.now += 1
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_restored_entry_keeps_its_age(self):
+        clock = _FakeClock()
+        cache = LRUCache(maxsize=4, ttl_seconds=60, clock=clock)
+        cache.put("old", 1, stored_at=clock.now - 120)
+        cache.put("fresh", 2, stored_at=clock.now - 30)
+        assert [k for k, _, _ in cache.items()] == ["fresh"]
+
+    def test_stats(self):
+        cache = LRUCache(maxsize=4)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("b")
+        assert cache.stats() == {"size": 1, "maxsize": 4, "hits": 1, "misses": 1, "hit_rate": 0.5}
@@ -0,0 +1,173 @@
+"""Unit tests for the Space citation matching and reference indexes (spaces/enirtcod/citations.py)."""
+
+import sys
+from pathlib import Path
+
+from datasets import Dataset
+
+# Add the Space to path so its modules import as in app.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "spaces" / "enirtcod"))
+
+from citations import (
+    article_keys,
+    build_citation_index,
+    build_reference_index,
+    citation_key,
+    extract_citations,
+    normalize_article_num,
+    parse_references,
+)
+
+
+class TestNormalization:
+    def test_article_num(self):
+        assert normalize_article_num("L. 1237-19") == "L1237-19"
+        assert normalize_article_num("l1237-19") == "L1237-19"
+        assert normalize_article_num("1240") == "1240"
+        assert normalize_article_num("25 BIS") == "25 bis"
+
+    def test_citation_key_folds_code_name(self):
+        assert citation_key("Code général des impôts", "L. 16") == "code general des impots|L16"
+
+    def test_article_keys(self):
+        article = {"id_legifrance": "LEGIARTI000006417902", "code_name": "Code civil", "num": "1240"}
+        assert article_keys(article) == ["LEGIARTI000006417902", "code civil|1240"]
+
+
+class TestExtractCitations:
+    def test_abbreviated_article_and_code(self):
+        assert extract_citations("Vu l'art. L. 1237-19 du code du travail ;") == {"code du travail|L1237-19"}
+
+    def test_several_numbers_one_code(self):
+        assert extract_citations("articles 6 et 700 du CPC") == {
+            "code de procedure civile|6", "code de procedure civile|700",
+        }
+
+    def test_procedure_civile_is_not_code_civil(self):
+        keys = extract_citations("en application de l'article 700 du code de procédure civile")
+        assert keys == {"code de procedure civile|700"}
+
+    def test_legifrance_id(self):
+        assert "LEGIARTI000006417902" in extract_citations("(LEGIARTI000006417902)")
+
+    def test_no_citation(self):
+        assert extract_citations("La cour rejette le pourvoi.") == set()
+        assert extract_citations(None) == set()
+
+    def test_citation_index(self):
+        ds = Dataset.from_dict({"chunk_text": [
+            "Vu l'article 1240 du code civil",
+            "Sans citation",
+            "articles 1240 et 1241 du Code civil",
+        ]})
+        index = build_citation_index(ds, batch_rows=2)
+        assert index["code civil|1240"].tolist() == [0, 2]
+        assert index["code civil|1241"].tolist() == [2]
+
+
+class TestParseReferences:
+    def test_article(self):
+        assert parse_references("article 1240 code civil") == {"articles": ["code civil|1240"]}
+        assert parse_references("L2121-1 CGCT") == {
+            "articles": ["code general des collectivites territoriales|L2121-1"],
+        }
+
+    def test_other_sources(self):
+        assert parse_references("pourvoi n° 21-20.145") == {"jurisprudence": ["21-20.145"]}
+        assert parse_references("circulaire n° 2023-045") == {"circulaires": ["2023-045"]}
+        assert parse_references("question n° 12345") == {"reponses": ["12345"]}
+
+    def test_question_is_not_a_reference(self):
+        assert parse_references("responsabilité civile délictuelle") is None
+        assert parse_references("  ") is None
+
+    def test_years_and_numbers_are_not_references(self):
+        assert parse_references("2023") is None
+        assert parse_references("1240") is None
+        assert parse_references("L1237-19") is None
+
+    def test_document_id_tried_in_every_source(self):
+        parsed = parse_references("JURITEXT000047456789")
+        assert parsed["jurisprudence"] == ["juritext000047456789"]
+        assert set(parsed) == {"articles", "jurisprudence", "circulaires", "reponses"}
+
+    def test_keys_match_reference_index(self):
+        ds = Dataset.from_dict({
+            "id_legifrance": ["LEGIARTI000006417902", "LEGIARTI000006417903"],
+            "code_name": ["Code civil", "Code civil"],
+            "num": ["1240", "1241"],
+        })
+        index = build_reference_index(ds, "articles")
+        for query, row in [("LEGIARTI000006417902", 0), ("art. 1241 du code civil", 1)]:
+            (key,) = parse_references(query)["articles"]
+            assert index[key].tolist() == [row]
+
+    def test_pourvoi_found_in_decision_text(self):
+        ds = Dataset.from_dict({
+            "source_id": ["JURITEXT1", "JURITEXT2"],
+            "chunk_text": ["Pourvoi n° 21-20.145 rejeté", "Cass. civ. 1re, 13 avr. 2023"],
+        })
+        index = build_reference_index(ds, "jurisprudence")
+        assert index["21-20.145"].tolist() == [0]
+        assert index["juritext2"].tolist() == [1]
+
+
+class TestLookupReferences:
+    def _articles(self):
+        return Dataset.from_dict({
+            "chunk_text": ["Responsabilité", "Responsabilité (suite)", "Ancienne version"],
+            "chunk_index": [0, 1, 0],
+            "id_legifrance": ["LEGIARTI1", "LEGIARTI1", "LEGIARTI2"],
+            "code_name": ["Code civil", "Code civil", "Code du travail"],
+            "num": ["1240", "1240", "1240"],
+            "article_dateDebut": ["1301616000000", "915148800000", "915148800000"],
+        })
+
+    def test_filters_narrow_exact_matches(self):
+        from facets import build_facet_index
+        from search import lookup_references
+
+        ds = self._articles()
+        references = {"articles": build_reference_index(ds, "articles")}
+        datasets = {"articles": ds}
+        facets = {"articles": build_facet_index(ds, "articles")}
+        query = "article 1240 code civil"
+
+        hits = lookup_references(query, datasets, references)
+        assert [r["row_id"] for r in hits["articles"]] == [0, 1]
+        for facet_index in (facets, None):  # without a facet index the rows are post-filtered
+            old = lookup_references(query, datasets, references, filters={"date_to": 2000}, facets=facet_index)
+            assert [r["row_id"] for r in old["articles"]] == [1]
+        assert lookup_references(query, datasets, references, filters={"code_name": "Code du travail"},
+                                 facets=facets) is None
+
+
+class TestFindRelatedDecisions:
+    ARTICLE = {"id_legifrance": "LEGIARTI000006417902", "code_name": "Code civil", "num": "1240"}
+
+    def _decisions(self):
+        return Dataset.from_dict({
+            "source_id": ["JURITEXT1", "JURITEXT2", "JURITEXT2", "JURITEXT3", "JURITEXT4"],
+            "chunk_text": [
+                "Vu l'article 1240 du code civil",
+                "Vu l'article 1240 du code civil (LEGIARTI000006417902)",
+                "articles 1240 et 1241 du code civil",
+                "Sans citation",
+                "Vu l'article 1240 du code civil (LEGIARTI000006417902)",
+            ],
+        })
+
+    def test_ranked_by_citation_count(self):
+        from search import find_related_decisions
+
+        ds = self._decisions()
+        related = find_related_decisions(self.ARTICLE, ds, build_citation_index(ds), limit=2)
+        # JURITEXT2 cites it 3 times over two chunks, JURITEXT4 twice, JURITEXT1 once
+        assert [r["chunk_text"] for r in related] == [ds[1]["chunk_text"], ds[4]["chunk_text"]]
+
+    def test_scan_fallback_on_a_view(self):
+        from search import find_related_decisions
+
+        view = self._decisions().select([3, 4, 0])
+        related = find_related_decisions(self.ARTICLE, view, None)
+        assert [r["chunk_text"] for r in related] == [view[1]["chunk_text"]]
@@ -0,0 +1,85 @@
+"""Unit tests for the Space facet indexes (spaces/enirtcod/facets.py) and apply_filters."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+from datasets import Dataset
+
+# Add the Space to path so its modules import as in app.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "spaces" / "enirtcod"))
+
+from facets import build_facet_index, date_year, facet_mask, mask_count, match_counts
+
+
+def _rows(mask, num_rows):
+    return np.flatnonzero(np.unpackbits(mask, count=num_rows, bitorder="little")).tolist()
+
+
+# 2011-04-01 and 1999-01-01 (UTC), as published in article_dateDebut
+MS_2011 = "1301616000000"
+MS_1999 = "915148800000"
+
+
+class TestDateYear:
+    def test_unix_ms_timestamp(self):
+        assert date_year(MS_2011) == 2011
+        assert date_year(MS_1999) == 1999
+
+    def test_negative_ms_timestamp(self):
+        assert date_year("-5364662400000") == 1800
+
+    def test_iso_date(self):
+        assert date_year("2023-04-13") == 2023
+
+    def test_unparseable(self):
+        assert date_year("") == -1
+        assert date_year(None) == -1
+        assert date_year("inconnue") == -1
+
+
+class TestFacetIndex:
+    def _articles(self):
+        return Dataset.from_dict({
+            "code_name": ["Code civil", "Code civil", "Code du travail", "Code civil"],
+            "etat": ["VIGUEUR", "ABROGE", "VIGUEUR", "VIGUEUR"],
+            "article_dateDebut": [MS_2011, MS_1999, MS_2011, ""],
+        })
+
+    def test_years_from_ms_timestamps(self):
+        facets = build_facet_index(self._articles(), "articles")
+        assert sorted(facets["years"]) == [1999, 2011]
+        assert _rows(facets["undated"], 4) == [3]
+
+    def test_filters_are_anded(self):
+        facets = build_facet_index(self._articles(), "articles")
+        mask = facet_mask(facets, "articles", {"code_name": "Code civil", "etat": "VIGUEUR"})
+        assert _rows(mask, 4) == [0, 3]
+
+    def test_date_range_keeps_undated_rows(self):
+        facets = build_facet_index(self._articles(), "articles")
+        mask = facet_mask(facets, "articles", {"date_from": 2000, "date_to": 2026})
+        assert _rows(mask, 4) == [0, 2, 3]
+
+    def test_unknown_value_matches_nothing(self):
+        facets = build_facet_index(self._articles(), "articles")
+        mask = facet_mask(facets, "articles", {"code_name": "Code pénal"})
+        assert mask_count(mask, 4) == 0
+
+    def test_filter_of_another_source_is_ignored(self):
+        facets = build_facet_index(self._articles(), "articles")
+        assert facet_mask(facets, "articles", {"ministere": "Intérieur"}) is None
+        assert match_counts({"articles": facets}, {"jurisdiction": "Cour de cassation"}) == {"articles": 4}
+
+
+class TestApplyFilters:
+    def test_ms_dates_filtered_by_year(self):
+        from search import apply_filters
+
+        results = [
+            {"source_type": "articles", "article_dateDebut": MS_2011},
+            {"source_type": "articles", "article_dateDebut": MS_1999},
+            {"source_type": "articles", "article_dateDebut": ""},
+        ]
+        kept = apply_filters(results, {"date_from": 2000, "date_to": 2026})
+        assert [r["article_dateDebut"] for r in kept] == [MS_2011, ""]
@@ -0,0 +1,52 @@
+"""Unit tests for the Space source loading (spaces/enirtcod/data_loader.py load_source)."""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from datasets import Dataset
+
+pytest.importorskip("faiss")
+
+# Add the Space to path so its modules import as in app.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "spaces" / "enirtcod"))
+
+import data_loader
+
+DIM = 8
+
+
+def _articles(rows: int = 12) -> Dataset:
+    vectors = np.random.default_rng(0).normal(size=(rows, DIM)).astype(np.float32)
+    return Dataset.from_dict({
+        "chunk_text": [f"extrait {i}" for i in range(rows)],
+        "code_name": ["Code civil"] * rows,
+        "embedding": vectors.tolist(),
+    })
+
+
+@pytest.fixture(autouse=True)
+def small_dim():
+    with patch.object(data_loader, "EMBED_DIM", DIM):
+        yield
+    data_loader.VECTORS["articles"] = None
+    data_loader._datasets["articles"] = None
+
+
+def test_vectors_published_with_the_dataset(tmp_path):
+    ds = data_loader.load_source("articles", "default", None, "k1", dataset=_articles(), cache_dir=str(tmp_path))
+    assert ds is not None
+    assert data_loader.VECTORS["articles"].shape == (12, DIM)
+
+
+def test_failed_load_leaves_no_stale_vectors(tmp_path):
+    data_loader.load_source("articles", "default", None, "k1", dataset=_articles(), cache_dir=str(tmp_path))
+    # Reload with a different corpus whose index build fails
+    with patch.object(data_loader, "new_index", side_effect=RuntimeError("no memory")):
+        ds = data_loader.load_source("articles", "default", None, "k2", dataset=_articles(20),
+                                     cache_dir=str(tmp_path))
+    assert ds is None
+    assert data_loader.LOADING_STATE["articles"] == "failed"
+    assert data_loader.VECTORS["articles"] is None
@@ -0,0 +1,84 @@
+"""Unit tests for the Space index cache keys (spaces/enirtcod/data_loader.py resolve_revisions)."""
+
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("faiss")
+
+# Add the Space to path so its modules import as in app.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "spaces" / "enirtcod"))
+
+import data_loader
+
+SHA = "f" * 40
+DATA_DIRS = data_loader.CONFIG_DATA_DIRS
+CHECKSUMS = {name: f"sum-{name}" for _, name in data_loader.CONFIGS}
+
+
+def _tree(checksums: dict[str, str]) -> dict[str, list]:
+    """One parquet shard per config directory, with the given LFS SHA-256."""
+    return {
+        DATA_DIRS[config]: [SimpleNamespace(path=f"{DATA_DIRS[config]}/train-00000.parquet", size=10,
+                                            lfs=SimpleNamespace(sha256=sha256))]
+        for config, sha256 in checksums.items()
+    }
+
+
+def _manifest(checksums: dict[str, str]) -> dict:
+    return {"configs": {
+        config: {
+            "num_rows": 3,
+            "content_hash": f"hash-{config}-{sha256}",
+            "shards": [{"path": f"{DATA_DIRS[config]}/train-00000.parquet", "size": 10, "sha256": sha256}],
+        }
+        for config, sha256 in checksums.items()
+    }}
+
+
+def _resolve(tmp_path, manifest: dict | None, tree: dict[str, list]):
+    """resolve_revisions against a Hub serving this manifest.json and repo tree at SHA."""
+    api = SimpleNamespace(
+        dataset_info=lambda repo: SimpleNamespace(sha=SHA),
+        list_repo_tree=lambda repo, path_in_repo, **kwargs: tree.get(path_in_repo, []),
+    )
+    manifest_path = tmp_path / "manifest.json"
+    if manifest is not None:
+        manifest_path.write_text(json.dumps(manifest), encoding="utf-8")
+
+    def download(repo, filename, **kwargs):
+        if manifest is None:
+            raise FileNotFoundError(filename)
+        return str(manifest_path)
+
+    with patch.object(data_loader, "HfApi", lambda: api), patch.object(data_loader, "hf_hub_download", download):
+        return data_loader.resolve_revisions()
+
+
+def test_manifest_matching_shards_keys_by_content_hash(tmp_path):
+    sha, keys = _resolve(tmp_path, _manifest(CHECKSUMS), _tree(CHECKSUMS))
+    assert sha == SHA
+    assert keys == {name: f"hash-{name}-sum-{name}" for name in CHECKSUMS}
+
+
+def test_mid_export_commit_keys_by_revision(tmp_path):
+    # jurisprudence parquet already pushed, manifest.json still the previous one
+    published = {**CHECKSUMS, "jurisprudence": "sum-new"}
+    _, keys = _resolve(tmp_path, _manifest(CHECKSUMS), _tree(published))
+    assert keys["jurisprudence"] == SHA
+    assert keys["default"] == "hash-default-sum-default"
+
+
+def test_manifest_without_shards_keys_by_revision(tmp_path):
+    manifest = _manifest(CHECKSUMS)
+    del manifest["configs"]["circulaires"]["shards"]
+    _, keys = _resolve(tmp_path, manifest, _tree(CHECKSUMS))
+    assert keys["circulaires"] == SHA
+
+
+def test_no_manifest_keys_by_revision(tmp_path):
+    assert _resolve(tmp_path, None, _tree(CHECKSUMS)) == (SHA, {name: SHA for name in CHECKSUMS})
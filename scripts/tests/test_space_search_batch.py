@@ -0,0 +1,98 @@
+"""Unit tests for the Space batch search grouping (spaces/enirtcod/search.py search_batch)."""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from datasets import Dataset
+
+faiss = pytest.importorskip("faiss")
+
+# Add the Space to path so its modules import as in app.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "spaces" / "enirtcod"))
+
+import search
+from facets import build_facet_index
+
+DIM = 8
+
+
+def _source(rows: int, seed: int, **columns) -> Dataset:
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(rows, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ds = Dataset.from_dict({
+        "chunk_text": [f"extrait {seed}-{i}" for i in range(rows)],
+        "embedding": vectors.tolist(),
+        **columns,
+    })
+    ds.add_faiss_index(column="embedding", metric_type=faiss.METRIC_INNER_PRODUCT)
+    return ds
+
+
+@pytest.fixture
+def corpus():
+    datasets = {
+        "articles": _source(20, 1, code_name=["Code civil", "Code du travail"] * 10),
+        "circulaires": _source(12, 2, ministere=["Intérieur", "Travail", "Justice"] * 4),
+    }
+    facets = {source: build_facet_index(ds, source) for source, ds in datasets.items()}
+    queries = np.random.default_rng(3).normal(size=(5, DIM)).astype(np.float32)
+    return datasets, facets, queries
+
+
+def _ids(results: dict) -> dict:
+    return {source: [r["row_id"] for r in rows] for source, rows in results.items()}
+
+
+class TestSearchBatch:
+    REQUESTS = [
+        {"source_filter": "Tous", "filters": {}},
+        {"source_filter": "Tous", "filters": {"code_name": "Code civil"}},
+        {"source_filter": "Tous", "filters": {}},
+        {"source_filter": "Articles", "filters": {}, "k": 5},
+        {"source_filter": "Tous", "filters": {"code_name": "Code civil"}},
+    ]
+
+    def test_matches_search_all(self, corpus):
+        datasets, facets, queries = corpus
+        batch = search.search_batch(queries, datasets, self.REQUESTS, facets=facets)
+        for query, request, results in zip(queries, self.REQUESTS, batch):
+            if request.get("k"):
+                continue
+            expected = search.search_all(query, datasets, request["source_filter"], request["filters"], facets=facets)
+            assert _ids(results) == _ids(expected)
+        assert len(batch[3]["articles"]) == 5
+        assert batch[3]["circulaires"] == []
+
+    def test_one_search_per_group_and_source(self, corpus):
+        datasets, facets, queries = corpus
+        with patch.object(search, "search_ids_batch", wraps=search.search_ids_batch) as spy:
+            search.search_batch(queries, datasets, self.REQUESTS, facets=facets)
+        # 3 groups: plain "Tous" (2 sources), filtered "Tous" (2 sources), Articles with k=5 (1 source)
+        assert spy.call_count == 5
+        assert sorted(len(call.args[1]) for call in spy.call_args_list) == [1, 2, 2, 2, 2]
+
+    def test_filters_applied_per_group(self, corpus):
+        datasets, facets, queries = corpus
+        batch = search.search_batch(queries, datasets, self.REQUESTS, facets=facets)
+        assert all(r["code_name"] == "Code civil" for r in batch[1]["articles"])
+        assert any(r["code_name"] == "Code du travail" for r in batch[0]["articles"] + batch[2]["articles"])
+
+
+class TestUnifiedFilters:
+    def test_sources_without_facets_are_filled_to_k(self, corpus):
+        import data_loader
+
+        datasets, _, queries = corpus
+        vectors = {s: np.array(ds["embedding"], dtype=np.float32) for s, ds in datasets.items()}
+        with patch.object(data_loader, "EMBED_DIM", DIM):
+            unified = data_loader.build_unified_index(vectors, {**data_loader.index_config("unified"), "factory": "Flat"})
+        filters = {"code_name": "Code civil"}
+        # No facet index: half the articles match, the 3 kept must all be "Code civil"
+        for query in queries:
+            results = search.search_all(query, datasets, "Articles", filters, unified=unified)
+            assert len(results["articles"]) == search.RESULTS_PER_SOURCE["articles"]
+            assert all(r["code_name"] == "Code civil" for r in results["articles"])
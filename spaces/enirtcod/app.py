@@ -2,42 +2,103 @@
 app.py — enirtcod.fr Gradio HF Space entry point.
 
 Startup sequence:
-  1. load_all_datasets() — loads 4 FAISS indexes into RAM (~60-90s cold start)
+  1. start_background_loading() — loads the 4 sources + FAISS indexes
+     concurrently in worker threads; the UI is served immediately
   2. Gradio Blocks layout with search bar, source selector, filter panel,
-     synthesis panel, and tabbed result cards.
+     live loading status, synthesis panel, and tabbed result cards.
+     Searches run against whichever sources are already loaded; result tabs
+     render as soon as retrieval finishes and the synthesis streams in after.
+     Each event has its own queue limit; retrieval, rendering and model
+     calls draw on the bounded pools of concurrency.py.
 """
 
 import os
+import time
+
 import gradio as gr
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
-from data_loader import load_all_datasets, embed_query, LOADING_STATUS
-from search import search_all, find_related_decisions
-from synthesis import synthesize
-from ui_components import build_tabs_html, build_article_card
+from data_loader import (
+    start_background_loading, loading_complete, embed_query, embed_queries, searching, data_fingerprint,
+    get_citation_index, embedding_cache_stats, index_stats,
+    LOADING_STATUS, LOADING_STATE, LOADING_DETAIL, INDEX_INFO, FACETS, REFERENCES,
+)
+from cache import LRUCache, normalize_query
+from concurrency import LLM_SLOTS, LLM_WAIT_S, cpu_pool, pool_stats
+from facets import facet_values, match_counts
+from metrics import Trace, rss_bytes, render
+from search import search_all, search_batch, find_related_decisions, lookup_references
+from synthesis import synthesize_stream, SYNTHESIS_ERROR_PREFIX
+from ui_components import build_tabs_html, build_article_card, build_loading_status_html, build_synthesis_html
 
 HF_TOKEN = os.environ.get("HF_TOKEN", "")
+# Generate a synthesis for exact-reference queries too (off: rows only, no model calls)
+EXACT_MATCH_SYNTHESIS = os.environ.get("EXACT_MATCH_SYNTHESIS", "0") == "1"
+
+# Gradio queue: searches running at once, batch calls running at once, waiting events
+SEARCH_CONCURRENCY = int(os.environ.get("SEARCH_CONCURRENCY", "16"))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "2"))
+QUEUE_MAX_SIZE = int(os.environ.get("QUEUE_MAX_SIZE", "128"))
+
+# Synthesis panel when every LLM slot is taken: the results are served alone
+DEGRADED_NOTE = (
+    "Synthèse indisponible pour le moment (forte affluence) : les résultats ci-dessous sont complets. "
+    "Relancez la recherche dans quelques instants pour obtenir la synthèse."
+)
 
 # ---------------------------------------------------------------------------
-# Cold start — runs once at module import (Space startup)
+# Cold start — loading runs in the background, the UI comes up at once
 # ---------------------------------------------------------------------------
-print("[app] Starting dataset loading… (may take up to 90s)")
-DATASETS = load_all_datasets()
-print(f"[app] Loading complete. Status: {LOADING_STATUS}")
+print("[app] Starting background dataset loading…")
+DATASETS = start_background_loading()
 
-# Populate filter dropdowns dynamically from loaded datasets
-_code_names = []
-if DATASETS.get("articles"):
-    try:
-        _code_names = sorted(set(DATASETS["articles"]["code_name"]))
-    except Exception:
-        _code_names = []
 
-_ministeres = []
-if DATASETS.get("circulaires"):
-    try:
-        _ministeres = sorted(set(m for m in DATASETS["circulaires"]["ministere"] if m))
-    except Exception:
-        _ministeres = []
+def filter_choices() -> tuple[list[str], list[str]]:
+    """(code names, ministères) from the facet indexes of the sources loaded so far."""
+    code_names = facet_values(FACETS.get("articles"), "code_name")
+    ministeres = sorted(
+        set(facet_values(FACETS.get("circulaires"), "ministere"))
+        | set(facet_values(FACETS.get("reponses"), "ministere"))
+    )
+    return code_names, ministeres
+
+
+def refresh_loading():
+    """Timer tick: live status panel + dropdowns; the timer stops once loading is done."""
+    code_names, ministeres = filter_choices()
+    return (
+        gr.update(value=build_loading_status_html(LOADING_STATE, LOADING_DETAIL, INDEX_INFO)),
+        gr.update(choices=["Tous"] + code_names),
+        gr.update(choices=["Tous"] + ministeres),
+        gr.Timer(active=not loading_complete()),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Response cache — rendered (synthesis, tabs) HTML per request tuple
+# ---------------------------------------------------------------------------
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL_S = float(os.environ.get("RESPONSE_CACHE_TTL_S", "3600"))
+
+_response_cache = LRUCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_S)
+_response_cache_fingerprint = None
+
+
+def _current_response_cache() -> LRUCache:
+    """The response cache, emptied first if the loaded data changed since it was filled."""
+    global _response_cache_fingerprint
+    fingerprint = data_fingerprint()
+    if fingerprint != _response_cache_fingerprint:
+        _response_cache.clear()
+        _response_cache_fingerprint = fingerprint
+    return _response_cache
+
+
+def response_cache_stats() -> dict:
+    """Size and hit / miss counters of the response cache."""
+    return _response_cache.stats()
 
 
 # ---------------------------------------------------------------------------
@@ -45,12 +106,44 @@ if DATASETS.get("circulaires"):
 # ---------------------------------------------------------------------------
 def run_search(query: str, source_filter: str, date_from: int, date_to: int,
                jurisdiction: str, code_name: str, ministere: str):
+    """
+    Streaming handler: yields (synthesis, tabs) updates — the result tabs as
+    soon as retrieval is done, then the synthesis as its tokens arrive.
+    A query that is just a reference ("article 1240 code civil", "21-20.145")
+    is answered from the reference indexes, without embedding or search.
+    Each stage is timed (metrics.Trace): one log line per request, and the
+    latency histograms served on /metrics.
+    Rendering runs on the CPU pool. The synthesis needs one of the LLM_SLOTS:
+    if none frees up within LLM_WAIT_S, the results are served without it.
+    """
+    trace = Trace("search")
+    try:
+        yield from _run_search(trace, query, source_filter, date_from, date_to, jurisdiction, code_name, ministere)
+    finally:
+        trace.finish()
+
+
+def _run_search(trace: Trace, query: str, source_filter: str, date_from: int, date_to: int,
+                jurisdiction: str, code_name: str, ministere: str):
     # Empty query guard
     if not query.strip():
-        return (
+        trace.kind = "empty"
+        yield (
             gr.update(value="<p style='color:#9ca3af;font-style:italic'>Veuillez entrer une question juridique.</p>"),
             gr.update(value=""),
         )
+        return
+
+    # Identical request served recently against the same data: replay it
+    cache_key = (normalize_query(query), source_filter, date_from, date_to, jurisdiction, code_name, ministere)
+    fingerprint = data_fingerprint()
+    with trace.span("response_cache"):
+        cached = _current_response_cache().get(cache_key)
+    if cached is not None:
+        trace.kind = "cached"
+        synthesis_html, tabs_html = cached
+        yield gr.update(value=synthesis_html), gr.update(value=tabs_html)
+        return
 
     # Query length guard
     warning_note = ""
@@ -58,14 +151,6 @@ def run_search(query: str, source_filter: str, date_from: int, date_to: int,
         query = query[:500]
         warning_note = "\n\n⚠️ *Requête tronquée à 500 caractères.*"
 
-    try:
-        embedding = embed_query(query, HF_TOKEN)
-    except ValueError as e:
-        return (
-            gr.update(value=f"<p style='color:#ef4444'>{e}</p>"),
-            gr.update(value=""),
-        )
-
     filters = {}
     if date_from:
         filters["date_from"] = int(date_from)
@@ -78,46 +163,226 @@ def run_search(query: str, source_filter: str, date_from: int, date_to: int,
     if ministere and ministere != "Tous":
         filters["ministere"] = ministere
 
-    results = search_all(embedding, DATASETS, source_filter=source_filter, filters=filters)
+    trace.fields.update(source_filter=source_filter, filters=sorted(filters))
+
+    # Exact references skip embedding and vector search (filtered by the facet masks)
+    with trace.span("lookup_references"):
+        results = lookup_references(query, DATASETS, REFERENCES, source_filter, filters, facets=FACETS)
+    exact_match = results is not None
+    if not exact_match:
+        try:
+            with trace.span("embed"):
+                embedding = embed_query(query, HF_TOKEN)
+        except ValueError as e:
+            trace.fields["error"] = "embed"
+            yield (
+                gr.update(value=f"<p style='color:#ef4444'>{e}</p>"),
+                gr.update(value=""),
+            )
+            return
+
+        with trace.span("search"), searching() as unified:
+            results = search_all(
+                embedding, DATASETS, source_filter=source_filter, filters=filters,
+                unified=unified, facets=FACETS,
+            )
+    else:
+        trace.kind = "exact"
+    trace.fields["results"] = {source: len(rows) for source, rows in results.items()}
+
+    tabs_html = cpu_pool.submit(_render_results, trace, results, filters, exact_match).result()
+
+    if exact_match and not EXACT_MATCH_SYNTHESIS:
+        n = sum(len(rows) for rows in results.values())
+        synthesis_html = build_synthesis_html(
+            f"Référence exacte : {n} extrait{'s' if n > 1 else ''} affiché{'s' if n > 1 else ''} ci-dessous. "
+            "Posez une question pour obtenir une synthèse." + warning_note
+        )
+        if data_fingerprint() == fingerprint:
+            _current_response_cache().put(cache_key, (synthesis_html, tabs_html))
+        yield gr.update(value=synthesis_html), gr.update(value=tabs_html)
+        return
+
+    # Backpressure: with every LLM slot taken, serve the results alone (not cached)
+    with trace.span("llm_wait"):
+        llm_slot = LLM_SLOTS.acquire(LLM_WAIT_S)
+    if not llm_slot:
+        trace.fields["degraded"] = True
+        yield gr.update(value=build_synthesis_html(DEGRADED_NOTE + warning_note)), gr.update(value=tabs_html)
+        return
+    try:
+        yield from _stream_synthesis(trace, query, results, tabs_html, warning_note, cache_key, fingerprint)
+    finally:
+        LLM_SLOTS.release()
+
 
+def _render_results(trace: Trace, results: dict, filters: dict, exact_match: bool) -> str:
+    """Result tabs HTML, article cards enriched with the decisions citing them."""
     # Cross-references: enrich article results with related decisions
     enriched_articles = []
-    for r in results.get("articles", []):
-        lf_id = r.get("id_legifrance", "")
-        related = find_related_decisions(lf_id, DATASETS.get("jurisprudence"))
-        enriched_articles.append((r, related))
+    citation_index = get_citation_index()
+    with trace.span("find_related_decisions"):
+        for r in results.get("articles", []):
+            related = find_related_decisions(r, DATASETS.get("jurisprudence"), citation_index)
+            enriched_articles.append((r, related))
 
-    # Build synthesis
-    synthesis_text = synthesize(query, results, HF_TOKEN) + warning_note
+    with trace.span("render"):
+        # Build article cards with cross-references
+        article_html = "".join(
+            build_article_card(r, related) for r, related in enriched_articles
+        )
+        # Temporarily replace articles list for tab builder (pass raw results for tab counts)
+        counts = match_counts(FACETS, filters) if filters and not exact_match else None
+        tabs_html = build_tabs_html(results, LOADING_STATUS, LOADING_STATE, counts)
+
+        # Inject enriched article cards into the Articles tab
+        if article_html and enriched_articles:
+            plain_article_html = "".join(build_article_card(r) for r, _ in enriched_articles)
+            tabs_html = tabs_html.replace(plain_article_html, article_html)
+    return tabs_html
 
-    # Build article cards with cross-references
-    article_html = "".join(
-        build_article_card(r, related) for r, related in enriched_articles
-    )
-    # Temporarily replace articles list for tab builder (pass raw results for tab counts)
-    tabs_html = build_tabs_html(results, LOADING_STATUS)
 
-    # Inject enriched article cards into the Articles tab
-    if article_html and enriched_articles:
-        plain_article_html = "".join(build_article_card(r) for r, _ in enriched_articles)
-        tabs_html = tabs_html.replace(plain_article_html, article_html)
+def _stream_synthesis(trace: Trace, query: str, results: dict, tabs_html: str, warning_note: str,
+                      cache_key: tuple, fingerprint):
+    # Results first: the tabs are final, the synthesis is still to come
+    yield gr.update(value=build_synthesis_html("", streaming=True)), gr.update(value=tabs_html)
 
-    synthesis_html = f"""
-    <div style="font-family:system-ui,sans-serif;background:#f8fafc;border-radius:8px;
-                padding:16px 20px;border-left:4px solid #2563eb;margin-bottom:16px">
-      <p style="font-size:13px;font-weight:700;color:#2563eb;margin:0 0 10px">Synthèse juridique</p>
-      <div style="font-size:14px;line-height:1.7;color:#1e293b;white-space:pre-wrap">{synthesis_text}</div>
-    </div>"""
+    # Then stream the synthesis into its panel (tabs left untouched).
+    # Only the time spent inside the model stream counts towards the stage,
+    # not the time Gradio takes to push each update to the browser.
+    synthesis_text = ""
+    failed = False
+    synthesis_seconds = 0.0
+    stream = synthesize_stream(query, results, HF_TOKEN)
+    while True:
+        started = time.perf_counter()
+        chunk = next(stream, None)
+        synthesis_seconds += time.perf_counter() - started
+        if chunk is None:
+            break
+        if not synthesis_text:
+            trace.record("synthesis_first_token", synthesis_seconds)
+        if chunk.startswith(SYNTHESIS_ERROR_PREFIX):
+            failed = True
+            trace.fields["error"] = "synthesis"
+            chunk = ("\n\n" if synthesis_text else "") + chunk
+        synthesis_text += chunk
+        yield gr.update(value=build_synthesis_html(synthesis_text, streaming=True)), gr.update()
 
-    return gr.update(value=synthesis_html), gr.update(value=tabs_html)
+    trace.record("synthesis", synthesis_seconds)
+    synthesis_html = build_synthesis_html(synthesis_text + warning_note)
+
+    # Failed syntheses are not cached, nor results computed while the data changed
+    if not failed and data_fingerprint() == fingerprint:
+        _current_response_cache().put(cache_key, (synthesis_html, tabs_html))
+
+    yield gr.update(value=synthesis_html), gr.update()
 
 
 # ---------------------------------------------------------------------------
-# Gradio layout
+# Batch search API — many queries, one embedding call, JSON results
+# ---------------------------------------------------------------------------
+BATCH_MAX_QUERIES = int(os.environ.get("BATCH_MAX_QUERIES", "256"))
+BATCH_MAX_K = 50
+FILTER_KEYS = ("date_from", "date_to", "jurisdiction", "code_name", "etat", "ministere")
+
+
+def _batch_request(item) -> tuple[str, dict]:
+    """(query, search_batch request) for one payload item; raises ValueError if malformed."""
+    if isinstance(item, str):
+        item = {"query": item}
+    if not isinstance(item, dict) or not str(item.get("query") or "").strip():
+        raise ValueError(f"Requête invalide : {item!r}")
+    filters = {}
+    for key, value in (item.get("filters") or {}).items():
+        if key not in FILTER_KEYS or value in (None, "", "Tous"):
+            continue
+        filters[key] = int(value) if key in ("date_from", "date_to") else str(value)
+    k = min(int(item["k"]), BATCH_MAX_K) if item.get("k") else None
+    request = {"source_filter": item.get("source_filter") or "Tous", "filters": filters, "k": k}
+    return str(item["query"])[:500], request
+
+
+def batch_search(payload) -> dict:
+    """
+    API handler (api_name="batch_search"): semantic retrieval for many
+    queries, without synthesis or exact-reference lookup.
+    payload: {"queries": [{"query": str, "source_filter": "Tous", "filters": {...}, "k": int}, …]};
+    items may also be bare query strings. Filters use the apply_filters keys.
+    All queries are embedded in one batch and searched with one matrix FAISS
+    search per source and distinct (sources, filters, k).
+    Returns {"results": [{"query", "results": {source: [rows with row_id and score]}}]}
+    in input order, or {"error": message}.
+    """
+    items = payload.get("queries") if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return {"error": "Aucune requête : attendu {\"queries\": [...]}."}
+    if len(items) > BATCH_MAX_QUERIES:
+        return {"error": f"Trop de requêtes ({len(items)}), maximum {BATCH_MAX_QUERIES} par appel."}
+    try:
+        queries, requests = zip(*(_batch_request(item) for item in items))
+    except (TypeError, ValueError) as e:
+        return {"error": str(e)}
+
+    trace = Trace("batch")
+    trace.fields["queries"] = len(queries)
+    try:
+        with trace.span("batch_embed"):
+            embeddings = embed_queries(list(queries), HF_TOKEN)
+    except ValueError as e:
+        trace.fields["error"] = "embed"
+        trace.finish()
+        return {"error": str(e)}
+
+    with trace.span("batch_search"), searching() as unified:
+        results = search_batch(
+            embeddings, DATASETS, list(requests), unified=unified, facets=FACETS,
+        )
+    trace.finish()
+    return {"results": [{"query": q, "results": r} for q, r in zip(queries, results)]}
+
+
+# ---------------------------------------------------------------------------
+# Metrics — Prometheus text on GET /metrics
 # ---------------------------------------------------------------------------
-LOADING_MSG = "Chargement des sources juridiques… (peut prendre jusqu'à 90 secondes)" \
-    if not all(LOADING_STATUS.values()) else ""
+def metrics_text() -> str:
+    """Latency histograms plus cache, index and memory figures read at scrape time."""
+    caches = {"embedding": embedding_cache_stats(), "response": response_cache_stats()}
+    indexes = index_stats()
+    pools = pool_stats()
+
+    def per_cache(field: str) -> list:
+        return [({"cache": name}, stats[field]) for name, stats in caches.items()]
+
+    def per_index(field: str) -> list:
+        return [({"source": source}, stats[field]) for source, stats in indexes.items()]
 
+    def per_pool(field: str) -> list:
+        return [({"pool": name}, stats[field]) for name, stats in pools.items()]
+
+    return render([
+        ("enirtcod_cache_hits_total", "counter", "Cache lookups answered from the cache", per_cache("hits")),
+        ("enirtcod_cache_misses_total", "counter", "Cache lookups that missed", per_cache("misses")),
+        ("enirtcod_cache_hit_ratio", "gauge", "Hits / lookups since start", per_cache("hit_rate")),
+        ("enirtcod_cache_entries", "gauge", "Entries currently cached", per_cache("size")),
+        ("enirtcod_source_ready", "gauge", "1 once the source is searchable",
+         [({"source": source}, int(ready)) for source, ready in LOADING_STATUS.items()]),
+        ("enirtcod_source_rows", "gauge", "Rows of the loaded dataset", per_index("rows")),
+        ("enirtcod_index_vectors", "gauge", "Vectors in the FAISS index", per_index("vectors")),
+        ("enirtcod_index_bytes", "gauge", "Approximate FAISS index size (vectors x code size)", per_index("index_bytes")),
+        ("enirtcod_vector_store_bytes", "gauge", "Size of the memory-mapped vector file", per_index("vector_bytes")),
+        ("enirtcod_index_file_bytes", "gauge", "Size of the cached index file", per_index("index_file_bytes")),
+        ("enirtcod_pool_slots", "gauge", "Concurrent inference calls allowed", per_pool("size")),
+        ("enirtcod_pool_in_use", "gauge", "Inference calls in progress", per_pool("in_use")),
+        ("enirtcod_pool_rejected_total", "counter",
+         "Callers that found no free slot in time (llm: served without synthesis)", per_pool("rejected")),
+        ("enirtcod_resident_memory_bytes", "gauge", "Resident set size of the Space process", [({}, rss_bytes())]),
+    ])
+
+
+# ---------------------------------------------------------------------------
+# Gradio layout
+# ---------------------------------------------------------------------------
 with gr.Blocks(
     title="enirtcod.fr — Recherche juridique française",
     css="""
@@ -134,12 +399,8 @@ with gr.Blocks(
       </p>
     </div>""")
 
-    if LOADING_MSG:
-        gr.HTML(f"""
-        <div style="background:#fef3c7;border:1px solid #f59e0b;border-radius:8px;
-                    padding:10px 16px;font-size:13px;color:#92400e;text-align:center">
-          ⏳ {LOADING_MSG}
-        </div>""")
+    loading_out = gr.HTML(build_loading_status_html(LOADING_STATE, LOADING_DETAIL, INDEX_INFO))
+    loading_timer = gr.Timer(2.0)
 
     with gr.Row():
         query_box = gr.Textbox(
@@ -168,12 +429,12 @@ with gr.Blocks(
                 label="Juridiction",
             )
             code_filter = gr.Dropdown(
-                choices=["Tous"] + _code_names,
+                choices=["Tous"] + filter_choices()[0],
                 value="Tous",
                 label="Code juridique",
             )
             min_filter = gr.Dropdown(
-                choices=["Tous"] + _ministeres,
+                choices=["Tous"] + filter_choices()[1],
                 value="Tous",
                 label="Ministère",
             )
@@ -181,11 +442,14 @@ with gr.Blocks(
     synthesis_out = gr.HTML(label="Synthèse")
     results_out   = gr.HTML(label="Résultats")
 
+    # Button and Enter share one queue limit; the LLM has its own (concurrency.LLM_SLOTS)
     search_btn.click(
         fn=run_search,
         inputs=[query_box, source_selector, date_from, date_to,
                 juris_filter, code_filter, min_filter],
         outputs=[synthesis_out, results_out],
+        concurrency_limit=SEARCH_CONCURRENCY,
+        concurrency_id="search",
     )
 
     query_box.submit(
@@ -193,7 +457,54 @@ with gr.Blocks(
         inputs=[query_box, source_selector, date_from, date_to,
                 juris_filter, code_filter, min_filter],
         outputs=[synthesis_out, results_out],
+        concurrency_limit=SEARCH_CONCURRENCY,
+        concurrency_id="search",
+    )
+
+    # Programmatic endpoint only: Client(...).predict(payload, api_name="/batch_search")
+    batch_in = gr.JSON(visible=False)
+    batch_out = gr.JSON(visible=False)
+    gr.Button(visible=False).click(
+        fn=batch_search,
+        inputs=batch_in,
+        outputs=batch_out,
+        api_name="batch_search",
+        concurrency_limit=BATCH_CONCURRENCY,
+        concurrency_id="batch",
+    )
+
+    # Status refreshes are cheap: never queued behind searches
+    loading_timer.tick(
+        fn=refresh_loading,
+        outputs=[loading_out, code_filter, min_filter, loading_timer],
+        concurrency_limit=None,
     )
+    demo.load(
+        fn=refresh_loading,
+        outputs=[loading_out, code_filter, min_filter, loading_timer],
+        concurrency_limit=None,
+    )
+
+# Events beyond QUEUE_MAX_SIZE waiting are refused ("queue full") rather than left to time out
+demo.queue(default_concurrency_limit=SEARCH_CONCURRENCY, max_size=QUEUE_MAX_SIZE)
+
+# ---------------------------------------------------------------------------
+# Server — FastAPI app declaring /metrics, with the Gradio UI mounted at /
+# (Gradio has no plain GET route of its own for a scrape target)
+# ---------------------------------------------------------------------------
+app = FastAPI()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> str:
+    return metrics_text()
+
+
+app = gr.mount_gradio_app(app, demo, path="/")
 
 if __name__ == "__main__":
-    demo.launch()
+    uvicorn.run(
+        app,
+        host=os.environ.get("GRADIO_SERVER_NAME", "0.0.0.0"),
+        port=int(os.environ.get("GRADIO_SERVER_PORT", "7860")),
+    )
@@ -0,0 +1,417 @@
+"""
+bench_search.py — Offline micro-benchmarks of the Space search engine.
+
+Builds synthetic corpora with the real config schemas (RESULT_COLUMNS +
+embedding, clustered vectors, jurisprudence text citing articles) and, for
+each corpus size × index factory, measures:
+  - load: index build from scratch and reload from the index cache (s per source)
+  - memory: resident set size after a cold build and after a cached reload (MB)
+  - latency: p50 / p99 of search_source, apply_filters, search_all,
+    search_batch and find_related_decisions (ms), plus recall@3 of the
+    articles index against exact search
+Each configuration runs in a fresh process, so memory figures are not
+polluted by the previous run. No network: load_source is handed the
+local synthetic Arrow files, queries are perturbed corpus vectors.
+
+Usage:
+    python bench_search.py                                   # 10k, 100k, 1M rows × Flat, HNSW32, IVF1024,Flat
+    python bench_search.py --rows 10000 --factories Flat --queries 100
+    python bench_search.py --unified --out results/bench.json
+
+Results go to --out (JSON): {"meta": {...}, "runs": [{"rows", "factory", "load",
+"memory_mb", "latency_ms", "recall_at_3", "index_info"}]}, one run per
+(rows, factory), with the same keys in every run.
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+
+# Share of the corpus per source (roughly the published dataset's proportions)
+SOURCE_SHARES = {"articles": 0.45, "jurisprudence": 0.40, "circulaires": 0.10, "reponses": 0.05}
+CONFIG_NAMES = {"articles": "default", "jurisprudence": "jurisprudence",
+                "circulaires": "circulaires", "reponses": "reponses_legis"}
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+DEFAULT_FACTORIES = ["Flat", "HNSW32", "IVF1024,Flat"]
+WRITE_BATCH_ROWS = 50_000
+N_CLUSTERS = 256
+# Rows above which find_related_decisions' full-scan fallback is not timed
+SCAN_MAX_ROWS = 100_000
+
+CODES = ["Code civil", "Code du travail", "Code pénal", "Code de commerce",
+         "Code de la sécurité sociale", "Code général des impôts"]
+JURISDICTIONS = ["Cour de cassation", "Cour d'appel"]
+MINISTERES = ["Justice", "Travail", "Intérieur", "Économie", "Santé"]
+
+
+# ---------------------------------------------------------------------------
+# Synthetic corpora
+# ---------------------------------------------------------------------------
+def _metadata(source: str, start: int, n: int, rng) -> dict:
+    """Metadata columns of rows [start, start + n) of a source, as in the published dataset."""
+    rows = range(start, start + n)
+    years = rng.integers(1990, 2026, size=n)
+    months = rng.integers(1, 13, size=n)
+    dates = [f"{y}-{m:02d}-01" for y, m in zip(years, months)]
+    # article_dateDebut is published as a Unix timestamp in milliseconds (string)
+    dates_ms = [str(int(datetime(y, m, 1, tzinfo=timezone.utc).timestamp() * 1000)) for y, m in zip(years, months)]
+    if source == "articles":
+        codes = rng.integers(0, len(CODES), size=n)
+        nums = rng.integers(1, 3000, size=n)
+        return {
+            "chunk_text": [f"Article {num} du {CODES[c]}. Texte synthétique {i}." for i, c, num in zip(rows, codes, nums)],
+            "chunk_index": [0] * n,
+            "id_legifrance": [f"LEGIARTI{i:012d}" for i in rows],
+            "code_name": [CODES[c] for c in codes],
+            "num": [str(num) for num in nums],
+            "etat": rng.choice(["VIGUEUR", "ABROGE"], size=n, p=[0.9, 0.1]).tolist(),
+            "article_etat": ["VIGUEUR"] * n,
+            "article_dateDebut": dates_ms,
+        }
+    if source == "jurisprudence":
+        cited = rng.integers(1, 3000, size=n)
+        codes = rng.integers(0, len(CODES), size=n)
+        return {
+            "chunk_text": [
+                f"Vu l'article {num} du {CODES[c].lower()}, pourvoi n° {i % 100:02d}-{i // 100 % 100:02d}.{i % 1000:03d}. "
+                f"Motifs synthétiques de la décision {i}."
+                for i, c, num in zip(rows, codes, cited)
+            ],
+            "chunk_index": [0] * n,
+            "source_id": [f"JURITEXT{i:012d}" for i in rows],
+            "jurisdiction": rng.choice(JURISDICTIONS, size=n).tolist(),
+            "chamber": ["civ1"] * n,
+            "date_decision": dates,
+            "solution": ["rejet"] * n,
+            "fiche_arret": [""] * n,
+            "url_judilibre": [""] * n,
+            "zone": ["motivations"] * n,
+        }
+    ministeres = rng.choice(MINISTERES, size=n).tolist()
+    if source == "circulaires":
+        return {
+            "chunk_text": [f"Circulaire synthétique {i}." for i in rows],
+            "chunk_index": [0] * n,
+            "source_id": [f"CIRC{i:08d}" for i in rows],
+            "numero": [f"{y}-{i % 1000:03d}" for i, y in zip(rows, years)],
+            "date_parution": dates,
+            "ministere": ministeres,
+            "objet": [f"Objet {i}" for i in rows],
+            "url_legifrance": [""] * n,
+        }
+    return {
+        "chunk_text": [f"Réponse ministérielle synthétique {i}." for i in rows],
+        "chunk_index": [0] * n,
+        "source_id": [f"QR{i:08d}" for i in rows],
+        "numero_question": [str(10_000 + i) for i in rows],
+        "date_reponse": dates,
+        "ministere": ministeres,
+        "question_text": [f"Question {i}" for i in rows],
+        "url_legifrance": [""] * n,
+    }
+
+
+def _vectors(centers: np.ndarray, n: int, rng) -> np.ndarray:
+    """n clustered vectors (cluster center + noise), like real embeddings rather than isotropic noise."""
+    vectors = centers[rng.integers(0, len(centers), size=n)]
+    vectors += rng.normal(scale=0.5, size=vectors.shape).astype(np.float32)
+    return vectors
+
+
+def write_corpus(directory: str, rows: int, dim: int, seed: int = 0) -> dict[str, str]:
+    """
+    Write one synthetic Arrow file per config under directory (reused if
+    already complete) and return config name → path. Written in the Arrow
+    stream format datasets memory-maps, WRITE_BATCH_ROWS at a time.
+    """
+    from datasets import Dataset
+
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(N_CLUSTERS, dim)).astype(np.float32)
+    paths = {}
+    for source, share in SOURCE_SHARES.items():
+        name = CONFIG_NAMES[source]
+        path = os.path.join(directory, f"{name}.arrow")
+        paths[name] = path
+        if os.path.exists(path + ".done"):
+            continue
+        total = max(1, int(rows * share))
+        with pa.OSFile(path, "wb") as sink:
+            writer = None
+            for start in range(0, total, WRITE_BATCH_ROWS):
+                n = min(WRITE_BATCH_ROWS, total - start)
+                columns = _metadata(source, start, n, rng)
+                flat = pa.array(_vectors(centers, n, rng).ravel(), type=pa.float32())
+                offsets = pa.array(np.arange(0, n * dim + 1, dim, dtype=np.int32))
+                columns["embedding"] = pa.ListArray.from_arrays(offsets, flat)
+                batch = pa.RecordBatch.from_pydict(columns)
+                if writer is None:
+                    writer = pa.ipc.new_stream(sink, batch.schema)
+                writer.write_batch(batch)
+            writer.close()
+        Dataset.from_file(path)  # fail now rather than in the benchmark process
+        open(path + ".done", "w").close()
+    return paths
+
+
+def make_queries(corpus_paths: dict[str, str], n: int, seed: int = 1) -> np.ndarray:
+    """n query vectors: corpus vectors drawn from every source, perturbed."""
+    from datasets import Dataset
+
+    rng = np.random.default_rng(seed)
+    picks = []
+    for path in corpus_paths.values():
+        ds = Dataset.from_file(path).with_format("numpy", columns=["embedding"])
+        rows = sorted(rng.choice(len(ds), size=min(len(ds), n), replace=False).tolist())
+        picks.append(np.asarray(ds[rows]["embedding"], dtype=np.float32))
+    queries = np.concatenate(picks)[rng.permutation(sum(len(p) for p in picks))[:n]]
+    queries += rng.normal(scale=0.3, size=queries.shape).astype(np.float32)
+    return queries
+
+
+# ---------------------------------------------------------------------------
+# Measurements (run inside a fresh process per configuration)
+# ---------------------------------------------------------------------------
+def rss_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _timings(fn, items, warmup: int = 3) -> dict:
+    """p50 / p99 / mean latency in ms of fn(item) over items (after a few warm-up calls)."""
+    for item in items[:warmup]:
+        fn(item)
+    samples = []
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50": round(float(np.percentile(samples, 50)), 4),
+        "p99": round(float(np.percentile(samples, 99)), 4),
+        "mean": round(float(np.mean(samples)), 4),
+        "n": len(samples),
+    }
+
+
+def _import_space(factory: str):
+    """Import data_loader / search configured for this run."""
+    os.environ["INDEX_FACTORY"] = factory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import data_loader
+    import search
+
+    return data_loader, search
+
+
+def _load_corpus(data_loader, key: str, config_name: str, cache_dir: str, corpus_paths: dict[str, str]):
+    """load_source on the local synthetic Arrow file of one config, with its index cache in cache_dir."""
+    from datasets import Dataset
+
+    return data_loader.load_source(key, config_name, None, "bench",
+                                   dataset=Dataset.from_file(corpus_paths[config_name]), cache_dir=cache_dir)
+
+
+def run_build(factory: str, cache_dir: str, corpus_paths: dict[str, str]) -> dict:
+    """Cold start: extract vectors and build every index from scratch (the index cache is written)."""
+    data_loader, _ = _import_space(factory)
+    baseline = rss_mb()
+    build_s = {}
+    for key, name in data_loader.CONFIGS:
+        started = time.perf_counter()
+        if _load_corpus(data_loader, key, name, cache_dir, corpus_paths) is None:
+            raise RuntimeError(f"{key}: {data_loader.LOADING_DETAIL[key]}")
+        build_s[key] = round(time.perf_counter() - started, 3)
+    return {"build_s": build_s, "rss_mb": round(rss_mb() - baseline, 1)}
+
+
+def run_search(factory: str, cache_dir: str, corpus_paths: dict[str, str], queries: np.ndarray,
+               unified: bool) -> dict:
+    """Restart: reload from the index cache, then time the search hot path."""
+    data_loader, search = _import_space(factory)
+    baseline = rss_mb()
+    load_s = {}
+    datasets = {}
+    for key, name in data_loader.CONFIGS:
+        started = time.perf_counter()
+        datasets[key] = _load_corpus(data_loader, key, name, cache_dir, corpus_paths)
+        load_s[key] = round(time.perf_counter() - started, 3)
+    gc.collect()
+    rss = round(rss_mb() - baseline, 1)
+
+    facets = data_loader.FACETS
+    citation_index = data_loader.get_citation_index()
+    vectors = data_loader.VECTORS
+    if data_loader.INDEX_METRIC == "cosine":
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    query_list = [q.tolist() for q in queries]
+    filters = {"code_name": CODES[0], "date_from": 2010, "ministere": MINISTERES[0], "jurisdiction": JURISDICTIONS[0]}
+
+    latency = {}
+    for key in search.SOURCES:
+        ds = datasets[key]
+        latency[f"search_source.{key}"] = _timings(
+            lambda q: search.search_source(ds, q, 3, key), query_list)
+        latency[f"search_source.{key}.filtered"] = _timings(
+            lambda q: search.search_source(ds, q, 3, key, search.facet_mask(facets[key], key, filters)), query_list)
+
+    candidates = [
+        search.search_source(datasets["articles"], q, 25, "articles")
+        + search.search_source(datasets["jurisprudence"], q, 25, "jurisprudence")
+        for q in query_list
+    ]
+    latency["apply_filters"] = _timings(lambda rows: search.apply_filters(rows, filters), candidates)
+    latency["search_all"] = _timings(lambda q: search.search_all(q, datasets, timeout=60), query_list)
+    latency["search_all.filtered"] = _timings(
+        lambda q: search.search_all(q, datasets, filters=filters, timeout=60, facets=facets), query_list)
+    batch = 32
+    blocks = [queries[i:i + batch] for i in range(0, len(queries), batch)]
+    latency[f"search_batch.{batch}"] = _timings(
+        lambda block: search.search_batch(block, datasets, [{}] * len(block)), blocks, warmup=1)
+
+    hits = [row for q in query_list[:50] for row in search.search_source(datasets["articles"], q, 3, "articles")]
+    latency["find_related_decisions"] = _timings(
+        lambda article: search.find_related_decisions(article, datasets["jurisprudence"], citation_index), hits)
+    if len(datasets["jurisprudence"]) <= SCAN_MAX_ROWS:
+        latency["find_related_decisions.scan"] = _timings(
+            lambda article: search.find_related_decisions(article, datasets["jurisprudence"]), hits[:20], warmup=1)
+
+    unified_build_s = None
+    if unified:
+        started = time.perf_counter()
+        index = data_loader.build_unified_index(vectors)
+        unified_build_s = round(time.perf_counter() - started, 3)
+        latency["search_all.unified"] = _timings(
+            lambda q: search.search_all(q, datasets, timeout=60, unified=index), query_list)
+        latency["search_all.unified.filtered"] = _timings(
+            lambda q: search.search_all(q, datasets, filters=filters, timeout=60, unified=index, facets=facets),
+            query_list)
+
+    # recall@3 of the articles index against exact search
+    found = [search.search_ids(datasets["articles"], q, 3)[0] for q in query_list]
+    exact = _exact_top(vectors["articles"], queries, 3, data_loader.INDEX_METRIC == "cosine")
+    recall = [len(set(e.tolist()) & set(f.tolist())) / 3 for e, f in zip(exact, found)]
+
+    return {
+        "cached_load_s": load_s,
+        "unified_build_s": unified_build_s,
+        "rss_mb": rss,
+        "latency_ms": latency,
+        "recall_at_3": round(float(np.mean(recall)), 4),
+        "index_info": dict(data_loader.INDEX_INFO),
+    }
+
+
+def _exact_top(vectors: np.ndarray, queries: np.ndarray, k: int, inner_product: bool) -> np.ndarray:
+    """Brute-force top-k row ids per query, scanning the vectors WRITE_BATCH_ROWS rows at a time."""
+    best_ids = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(vectors), WRITE_BATCH_ROWS):
+        block = np.asarray(vectors[start:start + WRITE_BATCH_ROWS], dtype=np.float32)
+        if inner_product:
+            scores = -(queries @ block.T)
+        else:
+            scores = (queries ** 2).sum(1)[:, None] - 2 * queries @ block.T + (block ** 2).sum(1)[None, :]
+        ids = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+        best_scores = np.concatenate([best_scores, scores], axis=1)
+        best_ids = np.concatenate([best_ids, ids], axis=1)
+        keep = np.argsort(best_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(best_scores, keep, axis=1)
+        best_ids = np.take_along_axis(best_ids, keep, axis=1)
+    return best_ids
+
+
+def _in_fresh_process(fn, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Space search engine on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS,
+                        help="Corpus sizes (total rows over the four sources)")
+    parser.add_argument("--factories", nargs="+", default=DEFAULT_FACTORIES,
+                        help="FAISS index_factory strings to compare")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per measurement")
+    parser.add_argument("--unified", action="store_true", help="Also time search_all on a unified index")
+    parser.add_argument("--workdir", default=None,
+                        help="Where synthetic corpora and index caches go (kept between runs; default: a temp dir)")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from data_loader import EMBED_DIM, INDEX_METRIC, VECTOR_DTYPE
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="enirtcod-bench-")
+    import faiss
+
+    meta = {
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "faiss": faiss.__version__,
+        "numpy": np.__version__,
+        "cpus": os.cpu_count(),
+        "machine": platform.machine(),
+        "dim": EMBED_DIM,
+        "metric": INDEX_METRIC,
+        "vector_dtype": VECTOR_DTYPE,
+        "queries": args.queries,
+    }
+    runs = []
+    for rows in args.rows:
+        started = time.perf_counter()
+        corpus = write_corpus(os.path.join(workdir, f"corpus_{rows}"), rows, EMBED_DIM)
+        queries = make_queries(corpus, args.queries)
+        print(f"[bench] corpus {rows} rows ready in {time.perf_counter() - started:.1f}s")
+        for factory in args.factories:
+            cache_dir = os.path.join(workdir, f"cache_{rows}_{factory.replace(',', '_')}")
+            shutil.rmtree(cache_dir, ignore_errors=True)  # the build run must not hit a previous cache
+            build = _in_fresh_process(run_build, factory, cache_dir, corpus)
+            measured = _in_fresh_process(run_search, factory, cache_dir, corpus, queries, args.unified)
+            runs.append({
+                "rows": rows,
+                "factory": factory,
+                "load": {"build_s": build["build_s"], "cached_load_s": measured["cached_load_s"],
+                         "unified_build_s": measured["unified_build_s"]},
+                "memory_mb": {"after_build": build["rss_mb"], "after_cached_load": measured["rss_mb"]},
+                "latency_ms": measured["latency_ms"],
+                "recall_at_3": measured["recall_at_3"],
+                "index_info": measured["index_info"],
+            })
+            latency = measured["latency_ms"]
+            print(
+                f"[bench] {rows} rows · {factory}: search_all p50 {latency['search_all']['p50']:.2f} ms "
+                f"p99 {latency['search_all']['p99']:.2f} ms · recall@3 {measured['recall_at_3']:.3f} · "
+                f"{measured['rss_mb']:.0f} MB"
+            )
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "runs": runs}, f, indent=2, ensure_ascii=False)
+    print(f"[bench] {len(runs)} runs written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
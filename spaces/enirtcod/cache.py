@@ -0,0 +1,82 @@
+"""
+cache.py — Small thread-safe LRU/TTL cache shared by the query-embedding and
+response caches, plus the query normalization used for their keys.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: accents folded, case folded, whitespace collapsed."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    folded = "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return re.sub(r"\s+", " ", folded).strip()
+
+
+class LRUCache:
+    """
+    Bounded mapping with least-recently-used eviction and an optional TTL.
+    Entries carry their insertion time (wall clock, so persisted entries keep
+    ageing across restarts). Every method is safe to call from several threads.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float | None = None, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and self._clock() - stored_at > self.ttl_seconds
+
+    def get(self, key):
+        """The cached value, or None on a miss (absent or expired)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[1]):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, stored_at: float | None = None) -> None:
+        with self._lock:
+            self._entries[key] = (value, self._clock() if stored_at is None else stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def items(self) -> list[tuple]:
+        """(key, value, stored_at) for the live entries, least recently used first."""
+        with self._lock:
+            return [(k, v, t) for k, (v, t) in self._entries.items() if not self._expired(t)]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            size, hits, misses = len(self._entries), self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,221 @@
+"""
+citations.py — Legal citation matching and the jurisprudence citation index.
+
+Decisions cite articles as "article 1240 du code civil", "art. L. 1237-19 du
+code du travail", "articles 6 et 700 du CPC" or by Legifrance id. One
+compiled multi-pattern regex finds these citations and normalizes each one
+to a key: "<code>|<num>" with accents and case folded, or the bare LEGIARTI
+id. build_citation_index maps every key to the jurisprudence rows that cite
+it. It is built once at load time, so related decisions are a dict lookup
+instead of a corpus scan.
+"""
+
+import re
+
+import numpy as np
+
+from cache import normalize_query
+
+# Spelled-out and abbreviated code names → code_name as published in the dataset
+CODE_ALIASES = {
+    "Code civil": ["code civil", "c. civ.", "c.civ.", "c. civ"],
+    "Code pénal": ["code pénal", "code penal", "c. pén.", "c. pen."],
+    "Code du travail": ["code du travail", "c. trav.", "c. trav"],
+    "Code de commerce": ["code de commerce", "c. com.", "c. com"],
+    "Code de procédure civile": ["code de procédure civile", "code de procedure civile", "cpc", "c. pr. civ."],
+    "Code de procédure pénale": ["code de procédure pénale", "code de procedure penale", "cpp", "c. pr. pén."],
+    "Code général des collectivités territoriales": ["code général des collectivités territoriales", "cgct"],
+    "Code général des impôts": ["code général des impôts", "cgi"],
+    "Code de la sécurité sociale": ["code de la sécurité sociale", "css", "c. séc. soc."],
+    "Code de la consommation": ["code de la consommation", "c. consom."],
+    "Code de l'environnement": ["code de l'environnement", "c. env."],
+    "Code de l'urbanisme": ["code de l'urbanisme", "c. urb."],
+    "Code de la construction et de l'habitation": ["code de la construction et de l'habitation", "cch"],
+    "Code de la santé publique": ["code de la santé publique", "csp"],
+    "Code des assurances": ["code des assurances", "c. assur."],
+    "Code monétaire et financier": ["code monétaire et financier", "comofi"],
+    "Code de la propriété intellectuelle": ["code de la propriété intellectuelle", "cpi"],
+    "Code de justice administrative": ["code de justice administrative", "cja"],
+    "Code de l'entrée et du séjour des étrangers et du droit d'asile": [
+        "code de l'entrée et du séjour des étrangers et du droit d'asile", "ceseda",
+    ],
+    "Code électoral": ["code électoral", "code electoral", "c. élect."],
+    "Code rural et de la pêche maritime": ["code rural et de la pêche maritime", "code rural"],
+    "Code de l'éducation": ["code de l'éducation"],
+    "Code des transports": ["code des transports"],
+    "Code de la route": ["code de la route"],
+    "Code des relations entre le public et l'administration": [
+        "code des relations entre le public et l'administration", "crpa",
+    ],
+}
+
+_ALIAS_TO_CODE = {normalize_query(alias): code for code, aliases in CODE_ALIASES.items() for alias in aliases}
+
+# Article number: optional L/R/D/A prefix (with or without a dot), digits, dashed parts
+_NUM = r"(?:[LRDA]\.?\s?)?\d+(?:-\d+)*(?:\s(?:bis|ter|quater))?"
+# Longest aliases first so "code de procédure civile" wins over "code civil"
+_CODE = "|".join(re.escape(a) for a in sorted(_ALIAS_TO_CODE, key=len, reverse=True))
+
+ARTICLE_CITATION_RE = re.compile(
+    rf"\bart(?:icles?|s?\.)\s*(?P<nums>{_NUM}(?:\s*(?:,|et|ou)\s*{_NUM})*)"
+    rf"\s*,?\s*(?:du|de la|de l'|des|de)?\s*(?P<code>{_CODE})(?![a-z])",
+    re.IGNORECASE,
+)
+_NUM_RE = re.compile(_NUM, re.IGNORECASE)
+_NUM_PARTS_RE = re.compile(r"([LRDA])?\.?\s?(\d+(?:-\d+)*)(?:\s(bis|ter|quater))?", re.IGNORECASE)
+LEGIFRANCE_ID_RE = re.compile(r"\bLEGIARTI\d{12}\b")
+
+
+def normalize_article_num(num: str) -> str:
+    """'L. 1237-19' / 'l1237-19' → 'L1237-19'; '1240' stays '1240'; '25 BIS' → '25 bis'."""
+    match = _NUM_PARTS_RE.fullmatch(num.strip())
+    if match is None:
+        return num.strip().upper()
+    prefix, digits, suffix = match.groups()
+    return (prefix or "").upper() + digits + (f" {suffix.lower()}" if suffix else "")
+
+
+def citation_key(code_name: str, num: str) -> str:
+    """Index key of an article: folded code name + normalized article number."""
+    return f"{normalize_query(code_name)}|{normalize_article_num(num)}"
+
+
+def canonical_code(alias: str) -> str | None:
+    """code_name for a spelled-out or abbreviated code name, or None if unknown."""
+    return _ALIAS_TO_CODE.get(normalize_query(alias))
+
+
+def extract_citations(text: str) -> set[str]:
+    """Citation keys (article keys and LEGIARTI ids) found in a text."""
+    keys = set(LEGIFRANCE_ID_RE.findall(text or ""))
+    # Aliases are stored accent- and case-folded: match against folded text
+    folded = normalize_query((text or "").replace("\u2019", "'"))
+    for match in ARTICLE_CITATION_RE.finditer(folded):
+        code = _ALIAS_TO_CODE[match.group("code")]
+        for num in _NUM_RE.findall(match.group("nums")):
+            keys.add(citation_key(code, num))
+    return keys
+
+
+def build_citation_index(juris_ds, batch_rows: int = 10_000) -> dict[str, np.ndarray]:
+    """
+    citation key → ascending jurisprudence row ids citing it. Reads only the
+    chunk_text column, one Arrow batch at a time.
+    """
+    postings: dict[str, list[int]] = {}
+    column = juris_ds.data.column("chunk_text")
+    row = 0
+    for chunk in column.chunks:
+        for start in range(0, len(chunk), batch_rows):
+            for text in chunk.slice(start, batch_rows).to_pylist():
+                for key in extract_citations(text):
+                    postings.setdefault(key, []).append(row)
+                row += 1
+    return {key: np.array(rows, dtype=np.int32) for key, rows in postings.items()}
+
+
+def article_keys(article: dict) -> list[str]:
+    """Keys under which decisions citing this article are indexed."""
+    keys = []
+    if article.get("id_legifrance"):
+        keys.append(article["id_legifrance"])
+    if article.get("code_name") and article.get("num"):
+        keys.append(citation_key(article["code_name"], article["num"]))
+    return keys
+
+
+# ---------------------------------------------------------------------------
+# Exact references — keyed lookup of the rows a query names directly
+# ---------------------------------------------------------------------------
+POURVOI_RE = re.compile(r"\b\d{2}-\d{2}\.\d{3}\b")
+
+# Whole-query patterns (matched against the folded query)
+_QUERY_ARTICLE_RES = [
+    re.compile(
+        rf"(?:art(?:icles?|s?\.?)\s*)?(?P<nums>{_NUM}(?:\s*(?:,|et)\s*{_NUM})*)"
+        rf"\s*,?\s*(?:du|de la|de l'|des|de)?\s*(?P<code>{_CODE})",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        rf"(?P<code>{_CODE})\s*,?\s*(?:art(?:icles?|s?\.?)\s*)?(?P<nums>{_NUM}(?:\s*(?:,|et)\s*{_NUM})*)",
+        re.IGNORECASE,
+    ),
+]
+_QUERY_POURVOI_RE = re.compile(r"(?:pourvoi\s*)?(?:n[°o]?\s*)?(?P<num>\d{2}-\d{2}\.\d{3})")
+_QUERY_CIRCULAIRE_RE = re.compile(r"(?:circulaire|circ\.?)\s*(?:n[°o]?\s*)?(?P<num>[\w./-]+)")
+_QUERY_QUESTION_RE = re.compile(r"(?:question|q\.?|qe|qr)\s*(?:ecrite\s*)?(?:n[°o]?\s*)?(?P<num>\d+)")
+# Bare identifiers tried as a source_id / numero in every source: Légifrance
+# document ids (JURITEXT000047…, CETATEXT…, JORFTEXT…), Judilibre decision ids
+# (24 hex digits) and NOR numbers
+_QUERY_ID_RE = re.compile(r"[a-z]{4}text\d{6,}|[0-9a-f]{24}|[a-z]{4}\d{7}[a-z]")
+
+# Per source: fields whose exact value is a lookup key
+REFERENCE_FIELDS = {
+    "articles":      ["id_legifrance"],
+    "jurisprudence": ["source_id"],
+    "circulaires":   ["source_id", "numero"],
+    "reponses":      ["source_id", "numero_question"],
+}
+
+
+def build_reference_index(ds, source: str) -> dict[str, np.ndarray]:
+    """
+    Exact-reference index of one source: key → ascending row ids.
+    Keys are the REFERENCE_FIELDS values (case- and accent-folded), "code|num"
+    article keys for articles and pourvoi numbers found in decision text for
+    jurisprudence.
+    """
+    postings: dict[str, list[int]] = {}
+    columns = set(ds.column_names)
+
+    def column(name: str) -> list:
+        return ds.data.column(name).to_pylist() if name in columns else []
+
+    for field in REFERENCE_FIELDS.get(source, []):
+        for row, value in enumerate(column(field)):
+            if value:
+                postings.setdefault(normalize_query(str(value)), []).append(row)
+    if source == "articles":
+        for row, (code_name, num) in enumerate(zip(column("code_name"), column("num"))):
+            if code_name and num:
+                postings.setdefault(citation_key(code_name, num), []).append(row)
+    if source == "jurisprudence":
+        for row, text in enumerate(column("chunk_text")):
+            for pourvoi in set(POURVOI_RE.findall(text or "")):
+                postings.setdefault(pourvoi, []).append(row)
+    return {key: np.unique(np.array(rows, dtype=np.int32)) for key, rows in postings.items()}
+
+
+def parse_references(query: str) -> dict[str, list[str]] | None:
+    """
+    Lookup keys when the whole query is a reference, else None:
+    "article 1240 code civil" / "L2121-1 CGCT" → articles "code|num" keys,
+    "21-20.145" / "pourvoi n° 21-20.145" → jurisprudence,
+    "circulaire n° 2023-045" → circulaires, "question n° 12345" → reponses,
+    a LEGIARTI id → articles. A bare document id (JURITEXT…, Judilibre id)
+    or NOR number is tried as a raw source_id / numero in every source; other
+    tokens (years, plain numbers) are left to the semantic search.
+    """
+    folded = normalize_query(query.replace("\u2019", "'")).rstrip(" .?")
+    if not folded:
+        return None
+
+    for pattern in _QUERY_ARTICLE_RES:
+        match = pattern.fullmatch(folded)
+        if match:
+            code = _ALIAS_TO_CODE[match.group("code")]
+            return {"articles": [citation_key(code, num) for num in _NUM_RE.findall(match.group("nums"))]}
+    if re.fullmatch(r"legiarti\d{12}", folded):
+        return {"articles": [folded]}
+    match = _QUERY_POURVOI_RE.fullmatch(folded)
+    if match:
+        return {"jurisprudence": [match.group("num")]}
+    match = _QUERY_CIRCULAIRE_RE.fullmatch(folded)
+    if match:
+        return {"circulaires": [match.group("num")]}
+    match = _QUERY_QUESTION_RE.fullmatch(folded)
+    if match:
+        return {"reponses": [match.group("num")]}
+    if _QUERY_ID_RE.fullmatch(folded):
+        return {source: [folded] for source in REFERENCE_FIELDS}
+    return None
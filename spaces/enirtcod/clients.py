@@ -0,0 +1,22 @@
+"""
+clients.py — Shared Hugging Face Inference API clients.
+
+One InferenceClient per token for the life of the process, so the query
+embeddings (data_loader.py) and the synthesis streams (synthesis.py) reuse
+its HTTP session instead of opening a new one per call.
+"""
+
+import threading
+
+from huggingface_hub import InferenceClient
+
+_clients: dict[str, InferenceClient] = {}
+_clients_lock = threading.Lock()
+
+
+def inference_client(hf_token: str) -> InferenceClient:
+    """The process-wide InferenceClient for this token (created on first use)."""
+    with _clients_lock:
+        if hf_token not in _clients:
+            _clients[hf_token] = InferenceClient(token=hf_token)
+        return _clients[hf_token]
@@ -0,0 +1,85 @@
+"""
+concurrency.py — Bounded execution pools for the stages of a request.
+
+Local CPU work and outbound inference calls are limited separately, so users
+waiting on the LLM do not hold the capacity that retrieval needs:
+  - cpu_pool runs FAISS searches (search.py) and result rendering (app.py)
+    on CPU_WORKERS threads;
+  - EMBED_SLOTS and LLM_SLOTS cap concurrent calls to the HF Inference API
+    (query embeddings, synthesis streams). A caller waits at most a timeout
+    for a slot; the search handler then degrades to retrieval-only output
+    instead of queueing behind the LLM (backpressure).
+The Gradio queue limits of the events themselves are set in app.py.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", os.environ.get("SEARCH_WORKERS", "8")))
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "8"))
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "4"))
+# Longest wait for a slot: past it, embedding fails and synthesis is skipped
+EMBED_WAIT_S = float(os.environ.get("EMBED_WAIT_S", "10"))
+LLM_WAIT_S = float(os.environ.get("LLM_WAIT_S", "0.5"))
+
+SATURATED_MESSAGE = "Service très sollicité : réessayez dans quelques instants."
+
+
+class Saturated(RuntimeError):
+    """No slot freed up within the wait budget."""
+
+
+class Slots:
+    """
+    At most `size` concurrent holders. acquire() waits up to a timeout and
+    counts the callers it turns away; in_use / rejected feed /metrics.
+    """
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self.in_use = 0
+        self.rejected = 0
+        self._semaphore = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> bool:
+        acquired = self._semaphore.acquire(timeout=max(timeout, 0.0))
+        with self._lock:
+            if acquired:
+                self.in_use += 1
+            else:
+                self.rejected += 1
+        return acquired
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_use -= 1
+        self._semaphore.release()
+
+    @contextmanager
+    def hold(self, timeout: float):
+        """Hold a slot for the enclosed block; raises Saturated if none frees up in time."""
+        if not self.acquire(timeout):
+            raise Saturated(SATURATED_MESSAGE)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self.size, "in_use": self.in_use, "rejected": self.rejected}
+
+
+cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+
+EMBED_SLOTS = Slots("embed", EMBED_CONCURRENCY)
+LLM_SLOTS = Slots("llm", LLM_CONCURRENCY)
+
+
+def pool_stats() -> dict[str, dict]:
+    """Size, slots in use and callers turned away, per inference pool."""
+    return {slots.name: slots.stats() for slots in (EMBED_SLOTS, LLM_SLOTS)}
@@ -1,20 +1,75 @@
 """
 data_loader.py — Dataset loading + FAISS index construction + query embedding.
 
-Runs at Space startup (once). Each dataset gets a FAISS index built in memory.
+Runs at Space startup (once), in background worker threads: the four sources
+load concurrently and each becomes searchable as soon as it is ready. Each
+dataset's vectors are extracted once into a memory-mapped matrix (see
+extract_vectors) and its embedding column is dropped, so the vectors are not
+held twice. Each dataset gets a FAISS index, loaded memory-mapped from the on-disk cache when
+it matches the current dataset revision, built in memory (and cached) otherwise.
+The index type is configurable per source (see index_config): exact Flat by
+default, or any FAISS factory string such as IVF4096,Flat / HNSW32 / IVF1024,PQ64.
+In the default cosine metric mode, corpus and query vectors are L2-normalized
+and searched with inner product, so scores are cosine similarities that are
+comparable across sources.
 Graceful degradation: if one source fails, the others continue.
+
+With UNIFIED_INDEX=1, once every source has loaded the per-source indexes are
+merged into one index over the whole corpus (see build_unified_index), cached
+like the per-source ones. Searches run inside searching(), so the per-source
+indexes are dropped only once the searches still using them have finished.
 """
 
+import atexit
+import hashlib
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import faiss
 import numpy as np
 from datasets import load_dataset
-from huggingface_hub import InferenceClient
+from datasets.search import FaissIndex
+from huggingface_hub import HfApi, hf_hub_download
+
+from cache import LRUCache, normalize_query
+from citations import build_citation_index, build_reference_index
+from clients import inference_client
+from concurrency import EMBED_SLOTS, EMBED_WAIT_S, Saturated
+from facets import build_facet_index
+from metrics import log_event, span
 
 DATASET_REPO = "ArthurSrz/open_codes"
 EMBED_MODEL = "mistral-embed"
 EMBED_DIM = 1024
 
-# Tracks which sources loaded successfully
+# "cosine": normalized vectors + inner-product indexes (score = cosine, higher is closer)
+# "l2": raw vectors + L2 indexes (score = squared distance, lower is closer)
+INDEX_METRIC = os.environ.get("INDEX_METRIC", "cosine")
+if INDEX_METRIC not in ("cosine", "l2"):
+    raise ValueError(f"INDEX_METRIC must be 'cosine' or 'l2', got {INDEX_METRIC!r}")
+_FAISS_METRIC = faiss.METRIC_INNER_PRODUCT if INDEX_METRIC == "cosine" else faiss.METRIC_L2
+
+# Rows per block when streaming the embedding column into an index
+ADD_BATCH_ROWS = 50_000
+
+# Storage type of the extracted vector files: "float32", or "float16" to halve
+# them (vectors are upcast block by block when they are added to an index)
+VECTOR_DTYPE = os.environ.get("VECTOR_DTYPE", "float32")
+if VECTOR_DTYPE not in ("float32", "float16"):
+    raise ValueError(f"VECTOR_DTYPE must be 'float32' or 'float16', got {VECTOR_DTYPE!r}")
+
+# Persistent storage (/data) survives restarts on Spaces with a storage tier.
+# Point HF_HOME at /data/.huggingface too so parquet shards are not re-downloaded.
+INDEX_CACHE_DIR = os.environ.get(
+    "INDEX_CACHE_DIR",
+    "/data/faiss_cache" if os.path.isdir("/data") else os.path.expanduser("~/.cache/enirtcod/faiss"),
+)
+
+# Tracks which sources loaded successfully (updated live by the loader threads)
 LOADING_STATUS: dict[str, bool] = {
     "articles": False,
     "jurisprudence": False,
@@ -22,62 +77,820 @@ LOADING_STATUS: dict[str, bool] = {
     "reponses": False,
 }
 
-_datasets: dict = {}
+# Per-source phase for the status panel: pending | loading | indexing | ready | failed
+LOADING_STATE: dict[str, str] = {key: "pending" for key in LOADING_STATUS}
+# Per-source detail line (row count, load time or error)
+LOADING_DETAIL: dict[str, str] = {key: "" for key in LOADING_STATUS}
+# Active index parameters per source (+ "unified"), shown on the status panel
+INDEX_INFO: dict[str, str] = {}
+# Facet bitmap index per source (facets.build_facet_index), None until loaded
+FACETS: dict = {key: None for key in LOADING_STATUS}
+# Exact-reference index per source (citations.build_reference_index), None until loaded
+REFERENCES: dict = {key: None for key in LOADING_STATUS}
+# Index-ready vectors per source (extract_vectors), memory-mapped; None until loaded
+VECTORS: dict = {key: None for key in LOADING_STATUS}
+
+_datasets: dict = {key: None for key in LOADING_STATUS}
+_loading_done = threading.Event()
+# Dataset commit SHA the sources were loaded at (None until resolved / offline)
+_revision: str | None = None
+
+# Citation key → jurisprudence row ids, built once jurisprudence has loaded
+_citation_index: dict | None = None
+
+# Optional single index over all sources: one search per query instead of four
+UNIFIED_INDEX = os.environ.get("UNIFIED_INDEX", "0") == "1"
+_unified: dict | None = None
+# Searches in progress that started before the unified index existed (they read per-source indexes)
+_per_source_searches = 0
+_searches_changed = threading.Condition()
+
+CONFIGS = [
+    ("articles",      "default"),
+    ("jurisprudence", "jurisprudence"),
+    ("circulaires",   "circulaires"),
+    ("reponses",      "reponses_legis"),
+]
+
+
+# Parquet directory of each config in the dataset repo (as export_to_hf.py pushes them)
+CONFIG_DATA_DIRS = {
+    "default":        "data",
+    "jurisprudence":  "jurisprudence",
+    "circulaires":    "circulaires",
+    "reponses_legis": "reponses_legis",
+}
+
+
+def _published_shards(api: HfApi, sha: str, config_name: str) -> list[dict]:
+    """The config's parquet shards at this commit, as (path, sha256) entries sorted by path."""
+    entries = api.list_repo_tree(DATASET_REPO, path_in_repo=CONFIG_DATA_DIRS[config_name],
+                                 repo_type="dataset", recursive=True, revision=sha)
+    files = [e for e in entries if getattr(e, "path", "").endswith(".parquet") and hasattr(e, "size")]
+    return [
+        {"path": f.path, "sha256": getattr(f.lfs, "sha256", None) if f.lfs else None}
+        for f in sorted(files, key=lambda f: f.path)
+    ]
+
+
+def manifest_matches_shards(entry: dict, shards: list[dict]) -> bool:
+    """
+    True when a manifest.json config entry describes exactly these shards
+    (same paths and LFS SHA-256), i.e. its content_hash is that of the
+    parquet actually published at the commit.
+    """
+    listed = entry.get("shards")
+    if not listed or not shards:
+        return False
+    expected = sorted((s.get("path"), s.get("sha256")) for s in listed)
+    actual = sorted((s["path"], s["sha256"]) for s in shards)
+    return expected == actual and all(sha256 for _, sha256 in actual)
+
+
+def resolve_revisions() -> tuple[str | None, dict[str, str | None]]:
+    """
+    Resolve the dataset's current commit SHA and a cache key per config.
+    The key is the config's content hash from manifest.json when published
+    and its shard checksums match the config's parquet at that SHA (so
+    configs untouched by a push keep their cached index), else the SHA.
+    The export pushes manifest.json last: a commit between the parquet and
+    the manifest pushes carries new shards under the old content hash.
+    Returns (None, {}) when the Hub is unreachable.
+    """
+    api = HfApi()
+    try:
+        sha = api.dataset_info(DATASET_REPO).sha
+    except Exception as e:
+        print(f"[data_loader] Could not resolve dataset revision: {e}")
+        return None, {}
+
+    try:
+        path = hf_hub_download(DATASET_REPO, "manifest.json", repo_type="dataset", revision=sha)
+        with open(path, encoding="utf-8") as f:
+            manifest_configs = json.load(f).get("configs", {})
+    except Exception as e:
+        print(f"[data_loader] No manifest.json at {sha[:12]} ({e}), keying index cache by revision")
+        return sha, {name: sha for _, name in CONFIGS}
+
+    cache_keys: dict = {}
+    for _, name in CONFIGS:
+        entry = manifest_configs.get(name) or {}
+        cache_keys[name] = sha
+        if not entry.get("content_hash"):
+            continue
+        try:
+            shards = _published_shards(api, sha, name)
+        except Exception as e:
+            print(f"[data_loader] Could not list {name} shards at {sha[:12]} ({e}), keying index cache by revision")
+            continue
+        if manifest_matches_shards(entry, shards):
+            cache_keys[name] = entry["content_hash"]
+        else:
+            print(f"[data_loader] manifest.json does not describe the {name} shards at {sha[:12]}, "
+                  "keying index cache by revision")
+    return sha, cache_keys
+
+
+def index_config(key: str) -> dict:
+    """
+    ANN index settings for one source (or "unified"). Global defaults come
+    from INDEX_FACTORY, INDEX_TRAIN_SAMPLE, INDEX_NPROBE and INDEX_EF_SEARCH;
+    the same name suffixed with the source overrides it for that source,
+    e.g. INDEX_FACTORY_JURISPRUDENCE="IVF4096,Flat".
+    """
+    def setting(name: str, default: str) -> str:
+        return os.environ.get(f"{name}_{key.upper()}", os.environ.get(name, default))
+
+    return {
+        "factory":      setting("INDEX_FACTORY", "Flat"),
+        "train_sample": int(setting("INDEX_TRAIN_SAMPLE", "100000")),
+        "nprobe":       int(setting("INDEX_NPROBE", "16")),
+        "efSearch":     int(setting("INDEX_EF_SEARCH", "64")),
+        "metric":       INDEX_METRIC,
+    }
+
+
+def new_index(config: dict, train_vectors) -> faiss.Index:
+    """
+    Create an empty index from the config's factory string. Indexes that need
+    training (IVF, PQ) are trained on train_vectors(n), a random sample of at
+    most train_sample rows; if training fails (corpus too small for the
+    number of lists) the exact Flat index is used instead.
+    """
+    index = faiss.index_factory(EMBED_DIM, config["factory"], _FAISS_METRIC)
+    if index.is_trained:
+        return index
+    try:
+        index.train(train_vectors(config["train_sample"]))
+        return index
+    except Exception as e:
+        print(f"[data_loader] Could not train {config['factory']} ({e}), falling back to Flat")
+        return faiss.index_factory(EMBED_DIM, "Flat", _FAISS_METRIC)
+
+
+def apply_search_params(index: faiss.Index, config: dict) -> str:
+    """Set nprobe / efSearch on the index and return a one-line description."""
+    factory = config["factory"]
+    if faiss.try_extract_index_ivf(index) is not None:
+        faiss.ParameterSpace().set_index_parameter(index, "nprobe", config["nprobe"])
+        return f"{factory} · nprobe={config['nprobe']}"
+    if hasattr(faiss.downcast_index(index), "hnsw"):
+        faiss.ParameterSpace().set_index_parameter(index, "efSearch", config["efSearch"])
+        return f"{factory} · efSearch={config['efSearch']}"
+    if isinstance(faiss.downcast_index(index), faiss.IndexFlat):
+        return "Flat"  # also covers the fallback when training failed
+    return factory
+
+
+def _sample_rows(num_rows: int, n: int, seed: int = 0) -> list[int]:
+    if num_rows <= n:
+        return list(range(num_rows))
+    return sorted(np.random.default_rng(seed).choice(num_rows, size=n, replace=False).tolist())
+
+
+def _cache_paths(config_name: str, cache_dir: str | None = None) -> tuple[str, str]:
+    base = os.path.join(cache_dir or INDEX_CACHE_DIR, config_name)
+    return f"{base}.faiss", f"{base}.json"
+
+
+def _load_cached_index(ds, config_name: str, cache_key: str | None, config: dict,
+                       cache_dir: str | None = None) -> bool:
+    """
+    Attach the cached index for this config if its revision key, row count,
+    factory string and metric match. The index file is memory-mapped, so only touched
+    pages become resident.
+    """
+    index_path, meta_path = _cache_paths(config_name, cache_dir)
+    if cache_key is None or not (os.path.exists(index_path) and os.path.exists(meta_path)):
+        return False
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("cache_key") != cache_key or meta.get("num_rows") != len(ds):
+            return False
+        if meta.get("factory", "Flat") != config["factory"] or meta.get("metric", "l2") != config["metric"]:
+            return False
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        index = faiss.read_index(index_path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        if index.ntotal != len(ds):
+            return False
+        # Same registration Dataset.load_faiss_index does, but with a memory-mapped index
+        ds._indexes["embedding"] = FaissIndex(custom_index=index)
+        return True
+    except Exception as e:
+        print(f"[data_loader] Cached index for {config_name} unusable: {e}")
+        return False
+
+
+def _save_cached_index(ds, config_name: str, cache_key: str | None, config: dict,
+                       cache_dir: str | None = None) -> None:
+    """Persist the freshly built index + its revision metadata (atomic rename)."""
+    if cache_key is None:
+        return
+    index_path, meta_path = _cache_paths(config_name, cache_dir)
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        ds.save_faiss_index("embedding", index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            meta = {"cache_key": cache_key, "num_rows": len(ds), "factory": config["factory"], "metric": config["metric"]}
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+    except Exception as e:
+        print(f"[data_loader] Could not cache index for {config_name}: {e}")
+
+
+def load_source(key: str, config_name: str, revision: str | None, cache_key: str | None,
+                dataset=None, cache_dir: str | None = None):
+    """
+    Load one config, attach its FAISS index and build its facet and reference
+    indexes. Updates LOADING_STATUS / LOADING_STATE / LOADING_DETAIL and
+    publishes the dataset into the shared dict as soon as it is searchable. Returns the dataset, or None on failure.
+    dataset: the config already in hand (skips load_dataset), e.g. a local snapshot.
+    cache_dir: where the vector and index files go (default INDEX_CACHE_DIR).
+    """
+    started = time.monotonic()
+    try:
+        LOADING_STATE[key] = "loading"
+        print(f"[data_loader] Loading {config_name}…")
+        def step(stage: str):
+            return span("enirtcod_load_stage_seconds", source=key, stage=stage)
+
+        with step("load_dataset"):
+            if dataset is None:
+                ds = load_dataset(DATASET_REPO, name=config_name, split="train", revision=revision)
+            else:
+                ds = dataset
+        with step("extract_vectors"):
+            vectors = extract_vectors(ds, config_name, cache_key, cache_dir)
+        # Nothing reads the column once the vectors are extracted: keep them only
+        # in the index and the memory-mapped file
+        ds = ds.remove_columns("embedding")
+        config = index_config(key)
+        with step("index_cache"):
+            cached = _load_cached_index(ds, config_name, cache_key, config, cache_dir)
+        if cached:
+            how = "FAISS index loaded from cache"
+        else:
+            LOADING_STATE[key] = "indexing"
+            with step("index_build"):
+                index = new_index(config, lambda n: vector_rows(vectors, _sample_rows(len(vectors), n)))
+                add_vectors(index, vectors)
+                ds._indexes["embedding"] = FaissIndex(custom_index=index)
+                _save_cached_index(ds, config_name, cache_key, config, cache_dir)
+            how = "FAISS index built"
+        INDEX_INFO[key] = apply_search_params(ds.get_index("embedding").faiss_index, config)
+        try:
+            with step("facets"):
+                FACETS[key] = build_facet_index(ds, key)
+        except Exception as e:
+            print(f"[data_loader] Facet index for {config_name} failed, filters fall back to post-filtering: {e}")
+        try:
+            with step("references"):
+                REFERENCES[key] = build_reference_index(ds, key)
+        except Exception as e:
+            print(f"[data_loader] Reference index for {config_name} failed, no exact-citation lookup: {e}")
+        if key == "jurisprudence":
+            with step("citations"):
+                _build_citation_index(ds)
+        elapsed = time.monotonic() - started
+        # Published together: VECTORS must always match the dataset and index of _datasets
+        VECTORS[key] = vectors
+        _datasets[key] = ds
+        LOADING_STATUS[key] = True
+        LOADING_STATE[key] = "ready"
+        LOADING_DETAIL[key] = f"{len(ds)} lignes · {elapsed:.0f} s"
+        print(f"[data_loader] ✓ {config_name}: {len(ds)} rows, {how} ({INDEX_INFO[key]}) in {elapsed:.1f}s")
+        log_event("source_loaded", source=key, rows=len(ds), seconds=round(elapsed, 2),
+                  index=INDEX_INFO[key], index_cached=cached)
+        return ds
+    except Exception as e:
+        print(f"[data_loader] ✗ {config_name} failed: {e}")
+        log_event("source_failed", source=key, error=str(e)[:200])
+        VECTORS[key] = None
+        _datasets[key] = None
+        LOADING_STATUS[key] = False
+        LOADING_STATE[key] = "failed"
+        LOADING_DETAIL[key] = str(e)[:200]
+        return None
+
+
+def embedding_matrix(ds, rows: list[int] | slice | None = None) -> np.ndarray:
+    """The embedding column (or the given rows of it) as a (n, EMBED_DIM) float32 array."""
+    view = ds.with_format("numpy", columns=["embedding"])
+    matrix = view["embedding"] if rows is None else view[rows]["embedding"]
+    return np.ascontiguousarray(matrix, dtype=np.float32)
+
+
+def index_vectors(ds, rows: list[int] | slice | None = None) -> np.ndarray:
+    """embedding_matrix, L2-normalized in place when INDEX_METRIC is cosine."""
+    matrix = embedding_matrix(ds, rows)
+    if INDEX_METRIC == "cosine":
+        faiss.normalize_L2(matrix)
+    return matrix
+
+
+def _vector_paths(config_name: str, cache_dir: str | None = None) -> tuple[str, str]:
+    base = os.path.join(cache_dir or INDEX_CACHE_DIR, config_name)
+    return f"{base}.vectors.npy", f"{base}.vectors.json"
+
+
+def extract_vectors(ds, config_name: str, cache_key: str | None, cache_dir: str | None = None) -> np.ndarray:
+    """
+    The index-ready vectors of a dataset (normalized when INDEX_METRIC is
+    cosine) as a contiguous (num_rows, EMBED_DIM) VECTOR_DTYPE matrix in a
+    memory-mapped .npy file next to the index cache. Reused when its revision
+    key, row count, metric and dtype match; otherwise streamed out of the
+    embedding column ADD_BATCH_ROWS at a time. Falls back to an in-memory
+    array when the cache directory is not writable.
+    """
+    path, meta_path = _vector_paths(config_name, cache_dir)
+    meta = {"cache_key": cache_key, "num_rows": len(ds), "metric": INDEX_METRIC, "dtype": VECTOR_DTYPE}
+    if cache_key is not None and os.path.exists(path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                if json.load(f) == meta:
+                    vectors = np.load(path, mmap_mode="r")
+                    if vectors.shape == (len(ds), EMBED_DIM):
+                        return vectors
+        except Exception as e:
+            print(f"[data_loader] Cached vectors for {config_name} unusable: {e}")
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        out = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=VECTOR_DTYPE, shape=(len(ds), EMBED_DIM))
+    except OSError as e:
+        print(f"[data_loader] Could not write vectors for {config_name}, keeping them in memory: {e}")
+        out = np.empty((len(ds), EMBED_DIM), dtype=VECTOR_DTYPE)
+    for start in range(0, len(ds), ADD_BATCH_ROWS):
+        block = index_vectors(ds, slice(start, start + ADD_BATCH_ROWS))
+        out[start:start + len(block)] = block
+    if not isinstance(out, np.memmap):
+        return out
+    out.flush()
+    del out
+    os.replace(path + ".tmp", path)
+    try:
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+    except OSError as e:
+        print(f"[data_loader] Could not record vector metadata for {config_name}: {e}")
+    return np.load(path, mmap_mode="r")
+
+
+def vector_rows(vectors: np.ndarray, rows: list[int] | slice) -> np.ndarray:
+    """The given rows of a vector matrix as a contiguous float32 array (what FAISS takes)."""
+    return np.ascontiguousarray(vectors[rows], dtype=np.float32)
+
+
+def add_vectors(index: faiss.Index, vectors: np.ndarray) -> None:
+    """Stream a vector matrix into the index, ADD_BATCH_ROWS at a time."""
+    for start in range(0, len(vectors), ADD_BATCH_ROWS):
+        index.add(vector_rows(vectors, slice(start, start + ADD_BATCH_ROWS)))
+
+
+def build_unified_index(vectors_dict: dict, config: dict | None = None) -> dict | None:
+    """
+    Build one index over the vectors of every loaded source (source → matrix
+    from extract_vectors), in CONFIGS order, using the
+    "unified" index_config (trainable indexes are trained on a sample drawn
+    from each source in proportion to its size).
+    Each source occupies a contiguous id range; source_ids (int8) and
+    row_ids (int32) map a unified id back to (source, row in that dataset).
+    Returns {"index", "config", "sources", "offsets", "source_ids", "row_ids"},
+    or None when no source is loaded.
+    """
+    config = config or index_config("unified")
+    loaded = [(key, vectors_dict[key]) for key, _ in CONFIGS if vectors_dict.get(key) is not None]
+    total = sum(len(vectors) for _, vectors in loaded)
+
+    def train_vectors(n: int) -> np.ndarray:
+        return np.concatenate([
+            vector_rows(vectors, _sample_rows(len(vectors), max(1, n * len(vectors) // total)))
+            for _, vectors in loaded
+        ])
+
+    if not loaded:
+        return None
+    index = new_index(config, train_vectors)
+    for _, vectors in loaded:
+        add_vectors(index, vectors)
+    return _unified_layout(index, config, [(key, len(vectors)) for key, vectors in loaded])
+
+
+def _unified_layout(index, config: dict, counts: list[tuple[str, int]]) -> dict:
+    """The unified index dict for an index holding counts[i][1] rows of each source, in order."""
+    sources, offsets, source_ids, row_ids = [], {}, [], []
+    start = 0
+    for key, n in counts:
+        offsets[key] = (start, start + n)
+        source_ids.append(np.full(n, len(sources), dtype=np.int8))
+        row_ids.append(np.arange(n, dtype=np.int32))
+        sources.append(key)
+        start += n
+    return {
+        "index": index,
+        "config": config,
+        "sources": sources,
+        "offsets": offsets,
+        "source_ids": np.concatenate(source_ids),
+        "row_ids": np.concatenate(row_ids),
+    }
+
+
+def unified_cache_key(cache_keys: dict[str, str | None]) -> str | None:
+    """
+    Cache key of the unified index: the content-hash keys of the loaded
+    sources it covers (CONFIGS order), or None if one of them has no key.
+    """
+    parts = []
+    for key, config_name in CONFIGS:
+        if _datasets.get(key) is None:
+            continue
+        if not cache_keys.get(config_name):
+            return None
+        parts.append(f"{config_name}={cache_keys[config_name]}")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest() if parts else None
+
+
+def _load_cached_unified(counts: list[tuple[str, int]], cache_key: str | None, config: dict) -> dict | None:
+    """The cached unified index when its key, per-source row counts, factory and metric match."""
+    index_path, meta_path = _cache_paths("unified")
+    if cache_key is None or not (os.path.exists(index_path) and os.path.exists(meta_path)):
+        return None
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("cache_key") != cache_key or meta.get("counts") != [list(c) for c in counts]:
+            return None
+        if meta.get("factory") != config["factory"] or meta.get("metric") != config["metric"]:
+            return None
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        index = faiss.read_index(index_path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        if index.ntotal != sum(n for _, n in counts):
+            return None
+        return _unified_layout(index, config, counts)
+    except Exception as e:
+        print(f"[data_loader] Cached unified index unusable: {e}")
+        return None
+
+
+def _save_cached_unified(unified: dict, cache_key: str | None) -> None:
+    """Persist the unified index + its key and per-source row counts (atomic rename)."""
+    if cache_key is None:
+        return
+    index_path, meta_path = _cache_paths("unified")
+    counts = [[key, end - start] for key, (start, end) in unified["offsets"].items()]
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        faiss.write_index(unified["index"], index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            meta = {"cache_key": cache_key, "counts": counts,
+                    "factory": unified["config"]["factory"], "metric": unified["config"]["metric"]}
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+    except Exception as e:
+        print(f"[data_loader] Could not cache unified index: {e}")
+
+
+def _build_citation_index(ds) -> None:
+    global _citation_index
+    started = time.monotonic()
+    try:
+        _citation_index = build_citation_index(ds)
+        print(f"[data_loader] ✓ Citation index: {len(_citation_index)} cited articles in {time.monotonic() - started:.1f}s")
+    except Exception as e:
+        print(f"[data_loader] Citation index failed, related decisions fall back to a scan: {e}")
+
+
+def get_citation_index() -> dict | None:
+    """Citation key → jurisprudence row ids, or None until built."""
+    return _citation_index
+
+
+def get_unified_index() -> dict | None:
+    """The unified index once built, else None (searches fan out per source)."""
+    return _unified
+
+
+@contextmanager
+def searching():
+    """
+    Run a search inside this block with the unified index it yields (None
+    before it is built). A search that starts before the unified swap keeps
+    the per-source indexes alive until it exits.
+    """
+    global _per_source_searches
+    with _searches_changed:
+        unified = _unified
+        if unified is None:
+            _per_source_searches += 1
+    try:
+        yield unified
+    finally:
+        if unified is None:
+            with _searches_changed:
+                _per_source_searches -= 1
+                _searches_changed.notify_all()
+
+
+def _build_unified(cache_keys: dict[str, str | None]) -> None:
+    global _unified
+    started = time.monotonic()
+    vectors = {key: VECTORS[key] for key, ds in _datasets.items() if ds is not None}
+    counts = [(key, len(vectors[key])) for key, _ in CONFIGS if key in vectors]
+    config = index_config("unified")
+    cache_key = unified_cache_key(cache_keys)
+    try:
+        with span("enirtcod_load_stage_seconds", source="unified", stage="index_cache"):
+            unified = _load_cached_unified(counts, cache_key, config) if counts else None
+        how = "loaded from cache"
+        if unified is None:
+            with span("enirtcod_load_stage_seconds", source="unified", stage="index_build"):
+                unified = build_unified_index(vectors, config)
+            if unified is not None:
+                _save_cached_unified(unified, cache_key)
+            how = "built"
+    except Exception as e:
+        print(f"[data_loader] Unified index failed, keeping per-source indexes: {e}")
+        return
+    if unified is None:
+        return
+    INDEX_INFO["unified"] = apply_search_params(unified["index"], unified["config"])
+    with _searches_changed:
+        _unified = unified
+        # Searches that started on the per-source indexes finish on them; new ones
+        # all get the unified index, so this wait cannot be starved
+        _searches_changed.wait_for(lambda: _per_source_searches == 0)
+    # The unified index now answers every search: free the per-source structures
+    for key in unified["sources"]:
+        _datasets[key].drop_index("embedding")
+    print(
+        f"[data_loader] ✓ Unified index: {unified['index'].ntotal} vectors over "
+        f"{', '.join(unified['sources'])} {how} in {time.monotonic() - started:.1f}s"
+    )
+
+
+def _load_all_concurrently() -> None:
+    global _revision
+    revision, cache_keys = resolve_revisions()
+    _revision = revision
+    try:
+        with ThreadPoolExecutor(max_workers=len(CONFIGS), thread_name_prefix="loader") as pool:
+            for key, config_name in CONFIGS:
+                pool.submit(load_source, key, config_name, revision, cache_keys.get(config_name))
+        if UNIFIED_INDEX:
+            _build_unified(cache_keys)
+    finally:
+        _loading_done.set()
+
+
+def start_background_loading() -> dict:
+    """
+    Start loading all four sources concurrently in daemon threads and return
+    immediately. The returned dict is the live source → Dataset mapping:
+    entries switch from None to a searchable Dataset as each source finishes.
+    """
+    threading.Thread(target=_load_all_concurrently, name="dataset-loader", daemon=True).start()
+    return _datasets
+
+
+def loading_complete() -> bool:
+    """True once every source has either loaded or failed."""
+    return _loading_done.is_set()
+
+
+def data_fingerprint() -> tuple:
+    """
+    Identifies what searches currently run against: the dataset revision,
+    the sources loaded so far and whether the unified index is active.
+    Anything derived from search results is stale once this changes.
+    """
+    ready = tuple(key for key, _ in CONFIGS if _datasets.get(key) is not None)
+    return _revision, ready, _unified is not None
+
+
+def index_stats() -> dict:
+    """
+    Per source (+ "unified" when built): rows, indexed vectors, approximate
+    index size (vectors × code size), bytes of the vector file and of the
+    cached index file. Read by the /metrics route.
+    """
+    def index_bytes(index) -> int:
+        try:
+            return index.ntotal * index.sa_code_size()
+        except Exception:
+            return 0
+
+    stats = {}
+    for key, config_name in CONFIGS:
+        ds, vectors = _datasets.get(key), VECTORS.get(key)
+        index = ds.get_index("embedding").faiss_index if ds is not None and ds.is_index_initialized("embedding") else None
+        index_path, _ = _cache_paths(config_name)
+        stats[key] = {
+            "rows": len(ds) if ds is not None else 0,
+            "vectors": index.ntotal if index is not None else 0,
+            "index_bytes": index_bytes(index) if index is not None else 0,
+            "vector_bytes": vectors.nbytes if vectors is not None else 0,
+            "index_file_bytes": os.path.getsize(index_path) if os.path.exists(index_path) else 0,
+        }
+    if _unified is not None:
+        index = _unified["index"]
+        index_path, _ = _cache_paths("unified")
+        stats["unified"] = {
+            "rows": index.ntotal, "vectors": index.ntotal, "index_bytes": index_bytes(index),
+            "vector_bytes": 0,
+            "index_file_bytes": os.path.getsize(index_path) if os.path.exists(index_path) else 0,
+        }
+    return stats
 
 
 def load_all_datasets() -> dict:
     """
-    Load all four configs from ArthurSrz/open_codes and build FAISS indexes.
+    Load all four configs from ArthurSrz/open_codes and attach FAISS indexes,
+    blocking until every source has loaded or failed.
+    Indexes come from INDEX_CACHE_DIR when the config is unchanged since they
+    were built; only changed configs are re-indexed.
     Returns dict with keys: articles, jurisprudence, circulaires, reponses.
     Missing sources have value None.
     """
-    configs = [
-        ("articles",      "default"),
-        ("jurisprudence", "jurisprudence"),
-        ("circulaires",   "circulaires"),
-        ("reponses",      "reponses_legis"),
-    ]
+    _load_all_concurrently()
+    return dict(_datasets)
 
-    result: dict = {}
 
-    for key, config_name in configs:
-        try:
-            print(f"[data_loader] Loading {config_name}…")
-            ds = load_dataset(DATASET_REPO, name=config_name, split="train")
-            ds.add_faiss_index(column="embedding")
-            result[key] = ds
-            LOADING_STATUS[key] = True
-            print(f"[data_loader] ✓ {config_name}: {len(ds)} rows, FAISS index built")
-        except Exception as e:
-            print(f"[data_loader] ✗ {config_name} failed: {e}")
-            result[key] = None
-            LOADING_STATUS[key] = False
+# ---------------------------------------------------------------------------
+# Query embeddings — process-wide cache + one long-lived inference client
+# ---------------------------------------------------------------------------
+EMBED_CACHE_SIZE = int(os.environ.get("EMBED_CACHE_SIZE", "4096"))
+EMBED_CACHE_TTL_S = float(os.environ.get("EMBED_CACHE_TTL_S", str(7 * 24 * 3600)))
+# Optional .npz file the cache is restored from at startup and saved to
+EMBED_CACHE_PATH = os.environ.get("EMBED_CACHE_PATH", "")
+# Save after this many new embeddings (and at exit)
+EMBED_CACHE_SAVE_EVERY = 32
+# Queries per feature_extraction request in embed_queries
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "64"))
+
+_embed_cache = LRUCache(EMBED_CACHE_SIZE, EMBED_CACHE_TTL_S)
+_embed_cache_unsaved = 0
+
+
+def _embed_cache_signature() -> str:
+    # Vectors from another model or metric mode must not be reused
+    return f"{EMBED_MODEL}|{INDEX_METRIC}"
+
+
+def load_embedding_cache(path: str = "") -> int:
+    """Restore persisted query embeddings (unexpired, same model/metric). Returns the count."""
+    path = path or EMBED_CACHE_PATH
+    if not path or not os.path.exists(path):
+        return 0
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["signature"]) != _embed_cache_signature():
+                return 0
+            for key, vector, stored_at in zip(data["keys"], data["vectors"], data["stored_at"]):
+                _embed_cache.put(str(key), vector, float(stored_at))
+        restored = len(_embed_cache)
+        print(f"[data_loader] Restored {restored} cached query embeddings from {path}")
+        return restored
+    except Exception as e:
+        print(f"[data_loader] Could not restore query embedding cache: {e}")
+        return 0
+
+
+def save_embedding_cache(path: str = "") -> None:
+    """Persist the live cache entries to an .npz file (atomic rename)."""
+    global _embed_cache_unsaved
+    path = path or EMBED_CACHE_PATH
+    if not path:
+        return
+    entries = _embed_cache.items()
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                signature=np.array(_embed_cache_signature()),
+                keys=np.array([k for k, _, _ in entries], dtype=str),
+                vectors=np.array([v for _, v, _ in entries], dtype=np.float32).reshape(len(entries), EMBED_DIM),
+                stored_at=np.array([t for _, _, t in entries], dtype=np.float64),
+            )
+        os.replace(path + ".tmp", path)
+        _embed_cache_unsaved = 0
+    except Exception as e:
+        print(f"[data_loader] Could not save query embedding cache: {e}")
+
+
+def embedding_cache_stats() -> dict:
+    return _embed_cache.stats()
 
-    _datasets.update(result)
-    return result
+
+if EMBED_CACHE_PATH:
+    load_embedding_cache()
+    atexit.register(save_embedding_cache)
 
 
 def embed_query(query_text: str, hf_token: str) -> list[float]:
     """
     Embed a query string using Mistral mistral-embed via HF Inference API.
-    Returns a 1024-dim float list.
+    Returns a 1024-dim float list, unit-norm when INDEX_METRIC is cosine.
+    Served from the process-wide cache when the normalized query (case,
+    accents and whitespace folded) was embedded recently; otherwise the
+    call takes one of the EMBED_SLOTS (concurrency.py).
     Raises ValueError with user-readable message on failure.
     """
+    global _embed_cache_unsaved
+    key = normalize_query(query_text)
+    cached = _embed_cache.get(key)
+    if cached is not None:
+        return cached.tolist()
+
     try:
-        client = InferenceClient(token=hf_token)
-        response = client.feature_extraction(
-            text=query_text,
-            model=EMBED_MODEL,
-        )
-        # feature_extraction returns np.ndarray — flatten to 1D list
-        embedding = np.array(response).flatten().tolist()
+        client = inference_client(hf_token)
+        with EMBED_SLOTS.hold(EMBED_WAIT_S):
+            response = client.feature_extraction(
+                text=query_text,
+                model=EMBED_MODEL,
+            )
+        # feature_extraction returns np.ndarray — flatten to 1D
+        embedding = np.array(response, dtype=np.float32).flatten()
         if len(embedding) != EMBED_DIM:
             raise ValueError(
                 f"Embedding dimension mismatch: expected {EMBED_DIM}, got {len(embedding)}"
             )
-        return embedding
+        if INDEX_METRIC == "cosine":
+            norm = np.linalg.norm(embedding)
+            if norm > 0:
+                embedding /= norm
+    except Saturated as e:
+        raise ValueError(str(e)) from e
     except Exception as e:
         raise ValueError(
             f"Impossible d'encoder la requête : {e}. "
             "Vérifiez que HF_TOKEN est configuré et que le quota API n'est pas dépassé."
         ) from e
+
+    _embed_cache.put(key, embedding)
+    _embed_cache_unsaved += 1
+    if EMBED_CACHE_PATH and _embed_cache_unsaved >= EMBED_CACHE_SAVE_EVERY:
+        save_embedding_cache()
+    return embedding.tolist()
+
+
+def embed_queries(query_texts: list[str], hf_token: str) -> np.ndarray:
+    """
+    Embed many query strings. Cached queries are reused; the distinct others
+    are sent to the HF Inference API in one feature_extraction call per
+    EMBED_BATCH_SIZE queries.
+    Returns an (n, EMBED_DIM) float32 matrix in input order, rows unit-norm
+    when INDEX_METRIC is cosine.
+    Raises ValueError with user-readable message on failure.
+    """
+    global _embed_cache_unsaved
+    keys = [normalize_query(text) for text in query_texts]
+    embeddings, missing = {}, {}
+    for key, text in zip(keys, query_texts):
+        if key in embeddings or key in missing:
+            continue
+        cached = _embed_cache.get(key)
+        if cached is not None:
+            embeddings[key] = cached
+        else:
+            missing[key] = text
+
+    pending = list(missing.items())
+    try:
+        client = inference_client(hf_token)
+        for start in range(0, len(pending), EMBED_BATCH_SIZE):
+            batch = pending[start:start + EMBED_BATCH_SIZE]
+            with EMBED_SLOTS.hold(EMBED_WAIT_S):
+                response = client.feature_extraction(
+                    text=[text for _, text in batch],
+                    model=EMBED_MODEL,
+                )
+            matrix = np.array(response, dtype=np.float32).reshape(len(batch), -1)
+            if matrix.shape[1] != EMBED_DIM:
+                raise ValueError(
+                    f"Embedding dimension mismatch: expected {EMBED_DIM}, got {matrix.shape[1]}"
+                )
+            if INDEX_METRIC == "cosine":
+                faiss.normalize_L2(matrix)
+            for (key, _), embedding in zip(batch, matrix):
+                embeddings[key] = embedding.copy()
+                _embed_cache.put(key, embeddings[key])
+                _embed_cache_unsaved += 1
+    except Saturated as e:
+        raise ValueError(str(e)) from e
+    except Exception as e:
+        raise ValueError(
+            f"Impossible d'encoder les requêtes : {e}. "
+            "Vérifiez que HF_TOKEN est configuré et que le quota API n'est pas dépassé."
+        ) from e
+
+    if EMBED_CACHE_PATH and _embed_cache_unsaved >= EMBED_CACHE_SAVE_EVERY:
+        save_embedding_cache()
+    if not keys:
+        return np.empty((0, EMBED_DIM), dtype=np.float32)
+    return np.stack([embeddings[key] for key in keys])
@@ -0,0 +1,386 @@
+"""
+eval_harness.py — Offline retrieval quality + latency harness.
+
+Runs labelled queries through the same stages as app.run_search (exact
+reference lookup, embedding, search, related decisions, synthesis, HTML) and
+reports recall@k, MRR and per-stage latency. The model calls are pluggable:
+  - HashingEmbedder: deterministic stand-in for mistral-embed (hashed words
+    through a fixed random projection). The corpus is re-embedded with it,
+    so query and corpus vectors live in the same space.
+  - CannedResponder: builds the real prompt and returns a fixed answer.
+  - HFEmbedder / HFResponder: the live Inference API (needs HF_TOKEN).
+No network is needed with the stand-ins and a local copy of the dataset.
+
+Query file (JSONL), one labelled query per line:
+    {"query": "…", "expected": ["LEGIARTI000006438819", "JURITEXT000047452116"],
+     "source_filter": "Tous", "filters": {"date_from": 2015}}
+expected holds id_legifrance (articles) or source_id (other sources) values;
+source_filter and filters are optional.
+
+Usage:
+    python eval_harness.py --queries eval.jsonl --data-dir ./snapshot
+    python eval_harness.py --self-labelled 200 --max-rows 50000 --out eval_results.json
+    python eval_harness.py --queries eval.jsonl --embedder hf --responder hf
+
+--data-dir holds one dataset per config (<config>/ from save_to_disk, or
+<config>.parquet); without it configs are read with load_dataset (the local
+HF cache works offline with HF_DATASETS_OFFLINE=1). --self-labelled N builds
+N queries from corpus rows (their first words, expecting that row).
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import data_loader
+from cache import normalize_query
+from search import find_related_decisions, lookup_references, search_all, search_batch
+from synthesis import _build_messages, synthesize
+from ui_components import build_synthesis_html, build_tabs_html
+
+STAGES = ["lookup_references", "embed", "search", "find_related_decisions", "synthesis", "render"]
+DEFAULT_K = [1, 3, 5, 10]
+
+# Id a labelled query expects, per source
+ID_FIELDS = {"articles": "id_legifrance", "jurisprudence": "source_id",
+             "circulaires": "source_id", "reponses": "source_id"}
+
+# Words carrying no meaning for retrieval, left out of the hashed features
+STOPWORDS = {
+    "le", "la", "les", "un", "une", "des", "du", "de", "d", "l", "et", "ou", "a", "au", "aux",
+    "en", "dans", "par", "pour", "sur", "que", "qui", "ne", "pas", "se", "sa", "son", "ses",
+    "est", "sont", "il", "elle", "ce", "cette", "qu", "s", "y",
+}
+
+
+# ---------------------------------------------------------------------------
+# Pluggable model stand-ins
+# ---------------------------------------------------------------------------
+class HashingEmbedder:
+    """
+    Deterministic embedder: each folded word maps (crc32 seed) to a fixed
+    Gaussian vector and a text is the sum of its words' vectors. Texts that
+    share words get similar vectors, which is all retrieval tests need.
+    """
+
+    reembeds_corpus = True
+
+    def __init__(self, dim: int = data_loader.EMBED_DIM, seed: int = 0):
+        self.dim = dim
+        self.seed = seed
+        self._words: dict[str, np.ndarray] = {}
+
+    def _word(self, word: str) -> np.ndarray:
+        vector = self._words.get(word)
+        if vector is None:
+            rng = np.random.default_rng(zlib.crc32(word.encode()) ^ self.seed)
+            vector = self._words[word] = rng.standard_normal(self.dim).astype(np.float32)
+        return vector
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in re.findall(r"\w+", normalize_query(text or "")):
+                if word not in STOPWORDS:
+                    out[i] += self._word(word)
+        return out
+
+
+class HFEmbedder:
+    """The production embedder (data_loader.embed_queries); the corpus keeps its published vectors."""
+
+    reembeds_corpus = False
+
+    def __init__(self, hf_token: str):
+        self.hf_token = hf_token
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        return data_loader.embed_queries(texts, self.hf_token)
+
+
+class CannedResponder:
+    """Builds the real synthesis prompt, answers with a fixed text after `latency_s`."""
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+
+    def respond(self, query: str, results: dict) -> str:
+        _build_messages(query, results)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        n = sum(len(rows) for rows in results.values())
+        return f"Synthèse de test fondée sur {n} extraits [1]."
+
+
+class HFResponder:
+    """The production LLM call (synthesis.synthesize)."""
+
+    def __init__(self, hf_token: str):
+        self.hf_token = hf_token
+
+    def respond(self, query: str, results: dict) -> str:
+        return synthesize(query, results, self.hf_token)
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+def read_config(config_name: str, data_dir: str | None, max_rows: int | None):
+    """One config as a Dataset: from data_dir when given, else load_dataset. None if unavailable."""
+    from datasets import Dataset, load_dataset, load_from_disk
+
+    try:
+        if data_dir:
+            path = os.path.join(data_dir, config_name)
+            if os.path.isdir(path):
+                ds = load_from_disk(path)
+            elif os.path.exists(path + ".parquet"):
+                ds = Dataset.from_parquet(path + ".parquet")
+            else:
+                print(f"[eval] {config_name}: not found in {data_dir}, skipped")
+                return None
+        else:
+            ds = load_dataset(data_loader.DATASET_REPO, name=config_name, split="train")
+    except Exception as e:
+        print(f"[eval] {config_name}: {e}, skipped")
+        return None
+    if max_rows and len(ds) > max_rows:
+        ds = ds.select(range(max_rows)).flatten_indices()
+    return ds
+
+
+def prepare_corpus(embedder, data_dir: str | None, max_rows: int | None) -> dict:
+    """
+    Load every config through data_loader.load_source (vectors, index,
+    facets, reference and citation indexes), after re-embedding chunk_text
+    with the embedder when it does not share the published vector space.
+    Returns source → Dataset (None for configs that could not be read).
+    """
+    prepared = {}
+    for key, config_name in data_loader.CONFIGS:
+        ds = read_config(config_name, data_dir, max_rows)
+        if ds is not None and embedder.reembeds_corpus:
+            started = time.perf_counter()
+            ds = ds.map(
+                lambda batch: {"embedding": embedder.embed(batch["chunk_text"])},
+                batched=True, batch_size=1000, desc=f"embedding {config_name}",
+            )
+            print(f"[eval] {config_name}: {len(ds)} rows re-embedded in {time.perf_counter() - started:.1f}s")
+        prepared[config_name] = ds
+
+    # Vector files of the evaluated corpus go to a scratch directory, never over the Space's cache
+    cache_dir = tempfile.mkdtemp(prefix="enirtcod-eval-")
+    return {
+        key: data_loader.load_source(key, config_name, None, None, dataset=prepared[config_name], cache_dir=cache_dir)
+        if prepared[config_name] is not None else None
+        for key, config_name in data_loader.CONFIGS
+    }
+
+
+def read_queries(path: str) -> list[dict]:
+    """Labelled queries of a JSONL file; raises ValueError naming the first malformed line."""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON ({e})") from e
+            if not isinstance(item, dict) or not isinstance(item.get("query"), str) or not item["query"].strip():
+                raise ValueError(f"{path}:{line_no}: expected an object with a non-empty \"query\" string")
+            expected = item.get("expected")
+            if not isinstance(expected, list) or not expected or not all(isinstance(e, str) and e for e in expected):
+                raise ValueError(f"{path}:{line_no}: \"expected\" must be a non-empty list of ids")
+            if not isinstance(item.get("source_filter", ""), str) or not isinstance(item.get("filters", {}), dict):
+                raise ValueError(f"{path}:{line_no}: \"source_filter\" must be a string, \"filters\" an object")
+            queries.append(item)
+    return queries
+
+
+def self_labelled_queries(datasets: dict, n: int, words: int = 12, seed: int = 0) -> list[dict]:
+    """n queries made of the first words of random corpus rows, each expecting its row's id."""
+    rng = np.random.default_rng(seed)
+    loaded = [(source, ds) for source, ds in datasets.items() if ds is not None and len(ds)]
+    queries = []
+    for _ in range(n):
+        source, ds = loaded[rng.integers(len(loaded))]
+        row = ds[int(rng.integers(len(ds)))]
+        text = " ".join((row.get("chunk_text") or "").split()[:words])
+        if text and row.get(ID_FIELDS[source]):
+            queries.append({"query": text, "expected": [row[ID_FIELDS[source]]]})
+    return queries
+
+
+# ---------------------------------------------------------------------------
+# Evaluation
+# ---------------------------------------------------------------------------
+def ranked_ids(results: dict) -> list[str]:
+    """Result ids of all sources merged in score order (scores are comparable across sources)."""
+    rows = [row for source_rows in results.values() for row in source_rows]
+    descending = data_loader.INDEX_METRIC == "cosine"
+    rows.sort(key=lambda row: row["score"], reverse=descending)
+    return [row.get(ID_FIELDS[row["source_type"]]) for row in rows]
+
+
+def run_query(item: dict, datasets: dict, embedder, responder, depth: int | None) -> tuple[list[str], dict, bool]:
+    """
+    One labelled query through the run_search stages.
+    Returns (ranked result ids, stage → seconds, answered by exact reference).
+    """
+    timings = {}
+    query = item["query"][:500]
+    source_filter = item.get("source_filter", "Tous")
+    filters = item.get("filters") or {}
+
+    started = time.perf_counter()
+    results = lookup_references(query, datasets, data_loader.REFERENCES, source_filter)
+    timings["lookup_references"] = time.perf_counter() - started
+    exact = results is not None
+    if not exact:
+        started = time.perf_counter()
+        embedding = embedder.embed([query])[0]
+        if data_loader.INDEX_METRIC == "cosine":
+            embedding /= np.linalg.norm(embedding) or 1.0
+        timings["embed"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        if depth:
+            request = {"source_filter": source_filter, "filters": filters, "k": depth}
+            results = search_batch(embedding[None], datasets, [request], facets=data_loader.FACETS)[0]
+        else:
+            results = search_all(embedding.tolist(), datasets, source_filter, filters, facets=data_loader.FACETS)
+        timings["search"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    citation_index = data_loader.get_citation_index()
+    for row in results.get("articles", []):
+        find_related_decisions(row, datasets.get("jurisprudence"), citation_index)
+    timings["find_related_decisions"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    answer = responder.respond(query, results)
+    timings["synthesis"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    build_tabs_html(results, data_loader.LOADING_STATUS, data_loader.LOADING_STATE)
+    build_synthesis_html(answer)
+    timings["render"] = time.perf_counter() - started
+
+    return ranked_ids(results), timings, exact
+
+
+def _summary(samples: list[float]) -> dict:
+    ms = np.array(samples) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 4),
+        "p99": round(float(np.percentile(ms, 99)), 4),
+        "mean": round(float(ms.mean()), 4),
+        "n": len(ms),
+    }
+
+
+def evaluate(queries: list[dict], datasets: dict, embedder, responder, ks: list[int],
+             depth: int | None = None) -> dict:
+    """recall@k (share of expected ids in the top k), MRR and per-stage latency over the queries."""
+    recall = {k: [] for k in ks}
+    reciprocal_ranks = []
+    stage_samples = {stage: [] for stage in STAGES}
+    per_query = []
+    for item in queries:
+        ids, timings, exact = run_query(item, datasets, embedder, responder, depth)
+        expected = set(item["expected"])
+        for k in ks:
+            recall[k].append(len(expected & set(ids[:k])) / len(expected))
+        rank = next((i + 1 for i, result_id in enumerate(ids) if result_id in expected), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        for stage, seconds in timings.items():
+            stage_samples[stage].append(seconds)
+        per_query.append({"query": item["query"], "rank": rank, "exact": exact, "top": ids[:max(ks)]})
+
+    return {
+        "quality": {
+            "queries": len(queries),
+            **{f"recall@{k}": round(float(np.mean(v)), 4) for k, v in recall.items()},
+            "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+            "exact_reference_share": round(sum(q["exact"] for q in per_query) / len(per_query), 4),
+        },
+        "latency_ms": {stage: _summary(s) for stage, s in stage_samples.items() if s},
+        "per_query": per_query,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval quality and latency evaluation")
+    parser.add_argument("--queries", help="Labelled queries (JSONL)")
+    parser.add_argument("--self-labelled", type=int, default=0,
+                        help="Also build N queries from corpus rows (their first words, expecting that row)")
+    parser.add_argument("--data-dir", help="Local dataset snapshot (<config>/ or <config>.parquet)")
+    parser.add_argument("--max-rows", type=int, help="Keep the first N rows of each config")
+    parser.add_argument("--embedder", choices=["hash", "hf"], default="hash")
+    parser.add_argument("--responder", choices=["canned", "hf"], default="canned")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency of the canned responder")
+    parser.add_argument("--k", type=int, nargs="+", default=DEFAULT_K, help="Cut-offs for recall@k")
+    parser.add_argument("--depth", type=int,
+                        help="Results per source (default: the UI quotas of search_all, 3/3/2/1)")
+    parser.add_argument("--out", default="eval_results.json", help="JSON report")
+    args = parser.parse_args()
+    if not args.queries and not args.self_labelled:
+        parser.error("give --queries and/or --self-labelled")
+
+    hf_token = os.environ.get("HF_TOKEN", "")
+    embedder = HashingEmbedder() if args.embedder == "hash" else HFEmbedder(hf_token)
+    responder = CannedResponder(args.llm_latency_ms / 1000) if args.responder == "canned" else HFResponder(hf_token)
+
+    # Checked before the (slow) corpus preparation
+    queries = []
+    if args.queries:
+        try:
+            queries = read_queries(args.queries)
+        except ValueError as e:
+            sys.exit(f"[eval] {e}")
+
+    started = time.perf_counter()
+    datasets = prepare_corpus(embedder, args.data_dir, args.max_rows)
+    load_s = time.perf_counter() - started
+
+    queries += self_labelled_queries(datasets, args.self_labelled)
+    if not queries:
+        sys.exit("[eval] no queries to run")
+
+    report = evaluate(queries, datasets, embedder, responder, sorted(args.k), args.depth)
+    report["meta"] = {
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "embedder": args.embedder,
+        "responder": args.responder,
+        "depth": args.depth,
+        "metric": data_loader.INDEX_METRIC,
+        "index_info": dict(data_loader.INDEX_INFO),
+        "rows": {key: len(ds) for key, ds in datasets.items() if ds is not None},
+        "load_s": round(load_s, 2),
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    quality = report["quality"]
+    print("[eval] " + " · ".join(f"{name} {value}" for name, value in quality.items()))
+    for stage, summary in report["latency_ms"].items():
+        print(f"[eval] {stage:<24} p50 {summary['p50']:8.2f} ms   p99 {summary['p99']:8.2f} ms")
+    print(f"[eval] report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+facets.py — Facet bitmap indexes for filter-aware retrieval.
+
+Built once per source at load time: for each facet field, value → row-id
+bitmap (packed bits, bit i = row i, the layout faiss.IDSelectorBitmap reads),
+plus one bitmap per year. A filter dict becomes a row mask by AND-ing / OR-ing
+bitmaps, which search.py hands to FAISS as an ID selector, so filtered
+queries rank only the matching rows. The same index feeds the filter
+dropdowns and the per-source match counts.
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Facet columns per source (year buckets come from DATE_FIELDS)
+FACET_FIELDS = {
+    "articles":      ["code_name", "etat"],
+    "jurisprudence": ["jurisdiction"],
+    "circulaires":   ["ministere"],
+    "reponses":      ["ministere"],
+}
+
+DATE_FIELDS = {
+    "articles":      "article_dateDebut",
+    "jurisprudence": "date_decision",
+    "circulaires":   "date_parution",
+    "reponses":      "date_reponse",
+}
+
+# Filter key → sources it applies to (mirrors search.apply_filters)
+FILTER_SOURCES = {
+    "code_name":    ("articles",),
+    "etat":         ("articles",),
+    "jurisdiction": ("jurisprudence",),
+    "ministere":    ("circulaires", "reponses"),
+}
+
+
+def _bitmaps(values: np.ndarray, num_rows: int) -> dict:
+    """
+    value → packed bitmap, for every distinct value of a column. One sort
+    (np.unique inverse codes) groups the rows by value; each bitmap is then
+    set from its own rows only, instead of comparing every row to every value.
+    """
+    distinct, codes = np.unique(values, return_inverse=True)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(distinct) + 1))
+    out = {}
+    for i, value in enumerate(distinct):
+        rows = order[bounds[i]:bounds[i + 1]]
+        bitmap = np.zeros((num_rows + 7) // 8, dtype=np.uint8)
+        np.bitwise_or.at(bitmap, rows >> 3, (1 << (rows & 7)).astype(np.uint8))
+        out[value] = bitmap
+    return out
+
+
+def date_year(value) -> int:
+    """
+    Year of a dataset date, or -1 if unparseable. article_dateDebut holds Unix
+    timestamps in milliseconds ("1301616000000", negative before 1970); the
+    other sources hold ISO dates ("2023-04-13").
+    """
+    text = str(value or "").strip()
+    try:
+        if len(text.lstrip("-")) > 4 and text.lstrip("-").isdigit():
+            return datetime.fromtimestamp(int(text) / 1000, tz=timezone.utc).year
+        return int(text[:4])
+    except (ValueError, OverflowError, OSError):
+        return -1
+
+
+def build_facet_index(ds, source: str) -> dict:
+    """
+    Build the facet index of one source.
+    Returns {"num_rows", "fields": {field: {value: bitmap}}, "years": {year: bitmap},
+    "undated": bitmap}. Empty values are not indexed; rows without a parseable
+    date go to "undated" (apply_filters keeps them under a date filter).
+    """
+    num_rows = len(ds)
+    columns = set(ds.column_names)
+    fields = {}
+    for field in FACET_FIELDS.get(source, []):
+        if field not in columns:
+            continue
+        values = np.array([v or "" for v in ds[field]], dtype=object)
+        bitmaps = _bitmaps(values, num_rows)
+        bitmaps.pop("", None)
+        fields[field] = bitmaps
+
+    date_field = DATE_FIELDS.get(source)
+    years = np.array([date_year(v) for v in ds[date_field]] if date_field in columns else [-1] * num_rows)
+    year_bitmaps = _bitmaps(years, num_rows)
+    undated = year_bitmaps.pop(-1, np.zeros((num_rows + 7) // 8, dtype=np.uint8))
+
+    return {
+        "num_rows": num_rows,
+        "fields": fields,
+        "years": {int(y): bitmap for y, bitmap in year_bitmaps.items()},
+        "undated": undated,
+    }
+
+
+def facet_values(facets: dict | None, field: str) -> list[str]:
+    """Sorted distinct values of a facet field (dropdown choices)."""
+    if not facets:
+        return []
+    return sorted(facets["fields"].get(field, {}))
+
+
+def facet_mask(facets: dict, source: str, filters: dict) -> np.ndarray | None:
+    """
+    Packed bitmap of the rows of `source` matching `filters`, or None when no
+    filter applies to this source (every row matches).
+    """
+    mask = None
+
+    def narrow(bitmap: np.ndarray) -> None:
+        nonlocal mask
+        mask = bitmap.copy() if mask is None else mask & bitmap
+
+    empty = np.zeros((facets["num_rows"] + 7) // 8, dtype=np.uint8)
+    for key, sources in FILTER_SOURCES.items():
+        if filters.get(key) and source in sources:
+            narrow(facets["fields"].get(key, {}).get(filters[key], empty))
+
+    date_from, date_to = filters.get("date_from"), filters.get("date_to")
+    if date_from or date_to:
+        in_range = facets["undated"].copy()
+        for year, bitmap in facets["years"].items():
+            if (not date_from or year >= date_from) and (not date_to or year <= date_to):
+                in_range |= bitmap
+        narrow(in_range)
+
+    return mask
+
+
+def mask_count(mask: np.ndarray | None, num_rows: int) -> int:
+    """Number of rows selected by a facet mask (None = all rows)."""
+    if mask is None:
+        return num_rows
+    return int(np.unpackbits(mask, count=num_rows, bitorder="little").sum())
+
+
+def mask_contains(mask: np.ndarray | None, row_ids: np.ndarray) -> np.ndarray:
+    """Boolean array: whether each row id is selected by a facet mask (None = all rows)."""
+    row_ids = np.asarray(row_ids, dtype=np.int64)
+    if mask is None:
+        return np.ones(len(row_ids), dtype=bool)
+    return ((mask[row_ids >> 3] >> (row_ids & 7)) & 1).astype(bool)
+
+
+def match_counts(facets_dict: dict, filters: dict) -> dict:
+    """source → number of rows matching the filters, for the sources with a facet index."""
+    return {
+        source: mask_count(facet_mask(facets, source, filters), facets["num_rows"])
+        for source, facets in facets_dict.items()
+        if facets is not None
+    }
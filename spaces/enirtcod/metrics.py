@@ -0,0 +1,183 @@
+"""
+metrics.py — Stage timings, latency histograms and the Prometheus exposition.
+
+Handlers and loaders time their stages with span() (or a request Trace).
+Every span feeds a latency histogram with cumulative Prometheus buckets. A
+Trace also collects the stage timings of one request and ends in a single
+structured JSON log line. render() produces the text served on GET /metrics:
+the histograms plus gauges and counters read at scrape time (caches,
+indexes, memory).
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# One JSON line per request / load step on stdout (STRUCTURED_LOGS=0 to silence)
+STRUCTURED_LOGS = os.environ.get("STRUCTURED_LOGS", "1") == "1"
+
+HELP = {
+    "enirtcod_request_seconds":      "End-to-end handler latency by request kind",
+    "enirtcod_request_stage_seconds": "Latency of each stage of a request",
+    "enirtcod_search_seconds":       "FAISS search + filtering latency per source (or the unified index)",
+    "enirtcod_apply_filters_seconds": "Post-retrieval filtering latency (sources without a facet index)",
+    "enirtcod_load_stage_seconds":   "Duration of each startup loading step per source",
+}
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; observe() is safe to call from several threads."""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # last slot: above the largest bound
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        slot = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            self._counts[slot] += 1
+            self._sum += seconds
+            self._count += 1
+
+    def snapshot(self) -> tuple[list[int], float, int]:
+        """(cumulative count per bucket, +Inf last), sum and count."""
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+_histograms: dict[tuple[str, tuple], Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def observe(family: str, seconds: float, **labels) -> None:
+    """Record one duration in the histogram of `family` with these labels."""
+    key = (family, tuple(sorted(labels.items())))
+    histogram = _histograms.get(key)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(key, Histogram())
+    histogram.observe(seconds)
+
+
+@contextmanager
+def span(family: str, **labels):
+    """Time the enclosed block into the `family` histogram (also when it raises)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(family, time.perf_counter() - started, **labels)
+
+
+def log_event(event: str, **fields) -> None:
+    """One structured log line: {"ts", "event", **fields} as JSON."""
+    if STRUCTURED_LOGS:
+        record = {"ts": round(time.time(), 3), "event": event, **fields}
+        print(json.dumps(record, ensure_ascii=False, default=str), flush=True)
+
+
+class Trace:
+    """
+    Stage timings of one request. span(stage) feeds both this trace and the
+    enirtcod_request_stage_seconds histogram; finish() records the total
+    under enirtcod_request_seconds{kind} and logs the request as one line.
+    Set `kind` and add `fields` along the way to describe the outcome.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.fields: dict = {}
+        self.stages: dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Add a duration measured elsewhere (spans of one stage accumulate)."""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        observe("enirtcod_request_stage_seconds", seconds, stage=stage)
+
+    def finish(self) -> None:
+        total = time.perf_counter() - self._started
+        observe("enirtcod_request_seconds", total, kind=self.kind)
+        log_event(
+            "request",
+            kind=self.kind,
+            total_ms=round(total * 1000, 2),
+            stages_ms={stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()},
+            **self.fields,
+        )
+
+
+def rss_bytes() -> int:
+    """Current resident set size of the process (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+# ---------------------------------------------------------------------------
+# Prometheus text exposition
+# ---------------------------------------------------------------------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(samples: list[tuple[str, str, str, list[tuple[dict, float]]]]) -> str:
+    """
+    The /metrics page: every histogram, then the scrape-time samples given as
+    (name, type, help, [(labels, value), …]) with type "gauge" or "counter".
+    """
+    lines = []
+    with _histograms_lock:
+        histograms = sorted(_histograms.items(), key=lambda item: item[0])
+    family = None
+    for (name, label_items), histogram in histograms:
+        if name != family:
+            family = name
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+        labels = dict(label_items)
+        cumulative, total, count = histogram.snapshot()
+        for bound, c in zip(histogram.buckets + ("+Inf",), cumulative):
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {c}")
+        lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+
+    for name, kind, help_text, values in samples:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in values:
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
@@ -1,35 +1,164 @@
 """
 search.py — FAISS retrieval + post-retrieval filtering across 4 legal sources.
+
+search_all fans out to the sources concurrently on the shared CPU pool
+(concurrency.cpu_pool; FAISS releases the GIL), so latency is the slowest
+source, not the sum.
+When data_loader built a unified index, the sources it covers are answered
+by a single search with per-source quotas instead (search_unified).
+Filters are applied before ranking: the facet index (facets.py) turns them
+into a row bitmap that FAISS searches through as an ID selector.
+Searches yield row ids and scores; only the hits, and only the RESULT_COLUMNS
+of each source, are then read from the Arrow table in one take.
 """
 
+import os
+import time
+from concurrent.futures import wait
+
+import faiss
 import numpy as np
+import pyarrow as pa
+
+from citations import article_keys, parse_references
+from concurrency import cpu_pool
+from facets import date_year, facet_mask, mask_contains, mask_count
+from metrics import span
+
+SOURCES = ["articles", "jurisprudence", "circulaires", "reponses"]
+
+# Source selector value → sources it searches ("Tous" and unknown values: all)
+SOURCE_FILTERS = {
+    "Articles":      ["articles"],
+    "Jurisprudence": ["jurisprudence"],
+    "Circulaires":   ["circulaires"],
+    "Q&R":           ["reponses"],
+}
+
+# Columns materialized for a hit: what the cards (ui_components), the LLM context
+# (synthesis) and apply_filters read. Add a column here before reading it there.
+RESULT_COLUMNS = {
+    "articles": [
+        "chunk_text", "chunk_index", "id_legifrance", "code_name", "num",
+        "etat", "article_etat", "article_dateDebut",
+    ],
+    "jurisprudence": [
+        "chunk_text", "chunk_index", "source_id", "jurisdiction", "chamber",
+        "date_decision", "solution", "fiche_arret", "url_judilibre", "zone",
+    ],
+    "circulaires": [
+        "chunk_text", "chunk_index", "source_id", "numero", "date_parution",
+        "ministere", "objet", "url_legifrance",
+    ],
+    "reponses": [
+        "chunk_text", "chunk_index", "source_id", "numero_question", "date_reponse",
+        "ministere", "question_text", "url_legifrance",
+    ],
+}
+
+# Results kept per source (search_all, and search_batch unless a request sets k)
+RESULTS_PER_SOURCE = {"articles": 3, "jurisprudence": 3, "circulaires": 2, "reponses": 1}
+
+# Rows returned per source by the exact-reference fast path
+EXACT_MATCH_LIMIT = 10
+
+# Per-source budget: a source that misses it contributes no results to this request
+SEARCH_TIMEOUT_S = float(os.environ.get("SEARCH_TIMEOUT_S", "5"))
+
+def _selector_params(index, selector) -> faiss.SearchParameters:
+    """Search parameters restricting hits to the selector, keeping the index's nprobe / efSearch."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    hnsw_index = faiss.downcast_index(index)
+    if hasattr(hnsw_index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=hnsw_index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
 
 
-def search_source(ds, query_embedding: list[float], k: int, source_type: str) -> list[dict]:
+def take_rows(ds, row_ids: list[int], columns: list[str]) -> list[dict]:
     """
-    Run FAISS nearest-neighbour search on a single dataset.
-    Returns top-k result dicts enriched with source_type and score.
-    Fetches k*5 candidates to allow for post-filter headroom.
+    Read `columns` of the given rows as dicts with one Arrow take, without
+    decoding the other columns (embedding, full article HTML, …).
     """
-    if ds is None:
+    if not row_ids:
         return []
+    columns = [c for c in columns if c in ds.column_names]
+    if ds._indices is not None:
+        # Dataset view (select / shuffle): map view rows to table rows
+        row_ids = ds._indices.column(0).take(pa.array(row_ids)).to_pylist()
+    return ds.data.table.select(columns).take(pa.array(row_ids, type=pa.int64())).to_pylist()
 
-    try:
-        scores, results = ds.get_nearest_examples(
-            "embedding", np.array(query_embedding, dtype=np.float32), k=k * 5
-        )
-    except Exception as e:
-        print(f"[search] FAISS error on {source_type}: {e}")
-        return []
 
-    rows = []
-    for i, score in enumerate(scores):
-        row = {col: results[col][i] for col in results}
+def _to_rows(ds, row_ids: list[int], scores, source_type: str) -> list[dict]:
+    """Materialize hits (RESULT_COLUMNS only) as result dicts with source_type, row_id and score."""
+    rows = take_rows(ds, row_ids, RESULT_COLUMNS[source_type])
+    for row, row_id, score in zip(rows, row_ids, scores):
         row["source_type"] = source_type
+        row["row_id"] = int(row_id)
         row["score"] = float(score)
-        rows.append(row)
+    return rows
+
+
+def sources_for(source_filter: str) -> list[str]:
+    return SOURCE_FILTERS.get(source_filter, SOURCES)
+
+
+def search_ids_batch(ds, queries: np.ndarray, k: int, mask: np.ndarray | None = None,
+                     label: str = "") -> list[tuple[np.ndarray, np.ndarray]]:
+    """
+    Run FAISS nearest-neighbour search on a single dataset, for a (n, dim)
+    matrix of queries in one index.search call.
+    mask: packed row bitmap from facets.facet_mask; only those rows are ranked.
+    ANN indexes can return fewer than k hits under a selective mask, so the
+    fetch window doubles until every query has k matching rows (or all of them).
+    Returns one (row ids, scores) pair per query, top-k hits best first. Scores
+    are cosine similarities under the default INDEX_METRIC, squared L2
+    distances otherwise.
+    """
+    no_hits = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    index = ds.get_index("embedding").faiss_index
+    queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, index.d)
+    wanted = min(k, mask_count(mask, len(ds)), index.ntotal)
+    if wanted == 0:
+        return [no_hits] * len(queries)
+    params = None
+    if mask is not None:
+        params = _selector_params(index, faiss.IDSelectorBitmap(len(ds), faiss.swig_ptr(mask)))
 
-    return rows[:k]
+    fetch = k
+    while True:
+        fetch = min(fetch, index.ntotal)
+        try:
+            scores, ids = index.search(queries, fetch, params=params)
+        except Exception as e:
+            print(f"[search] FAISS error on {label}: {e}")
+            return [no_hits] * len(queries)
+        valid = ids >= 0
+        hits = [(ids[i][valid[i]][:k], scores[i][valid[i]][:k]) for i in range(len(queries))]
+        if fetch >= index.ntotal or all(len(row_ids) >= wanted for row_ids, _ in hits):
+            break
+        fetch *= 2
+
+    return hits
+
+
+def search_ids(ds, query_embedding: list[float], k: int, mask: np.ndarray | None = None,
+               label: str = "") -> tuple[np.ndarray, np.ndarray]:
+    """search_ids_batch for one query: (row ids, scores) of its top-k hits."""
+    return search_ids_batch(ds, np.array(query_embedding, dtype=np.float32), k, mask, label)[0]
+
+
+def search_source(ds, query_embedding: list[float], k: int, source_type: str,
+                  mask: np.ndarray | None = None) -> list[dict]:
+    """
+    search_ids on one source, then materialize the hits as result dicts
+    (RESULT_COLUMNS of the source + source_type and score).
+    """
+    if ds is None:
+        return []
+    ids, scores = search_ids(ds, query_embedding, k, mask, label=source_type)
+    return _to_rows(ds, ids.tolist(), scores, source_type)
 
 
 def apply_filters(results: list[dict], filters: dict) -> list[dict]:
@@ -38,6 +167,7 @@ def apply_filters(results: list[dict], filters: dict) -> list[dict]:
     - date_from / date_to: int years, applied to all source types
     - jurisdiction: string, applied to jurisprudence only
     - code_name: string, applied to articles only
+    - etat: string, applied to articles only
     - ministere: string, applied to circulaires and reponses
     """
     out = []
@@ -53,14 +183,12 @@ def apply_filters(results: list[dict], filters: dict) -> list[dict]:
                 or r.get("date_reponse")
                 or ""
             )
-            try:
-                year = int(str(date_str)[:4])
+            year = date_year(date_str)
+            if year != -1:  # keep if date unparseable
                 if filters.get("date_from") and year < filters["date_from"]:
                     continue
                 if filters.get("date_to") and year > filters["date_to"]:
                     continue
-            except (ValueError, TypeError):
-                pass  # keep if date unparseable
 
         # Jurisdiction filter (jurisprudence only)
         if filters.get("jurisdiction") and source == "jurisprudence":
@@ -71,6 +199,9 @@ def apply_filters(results: list[dict], filters: dict) -> list[dict]:
         if filters.get("code_name") and source == "articles":
             if r.get("code_name") != filters["code_name"]:
                 continue
+        if filters.get("etat") and source == "articles":
+            if r.get("etat") != filters["etat"]:
+                continue
 
         # Ministry filter (circulaires + reponses)
         if filters.get("ministere") and source in ("circulaires", "reponses"):
@@ -81,66 +212,355 @@ def apply_filters(results: list[dict], filters: dict) -> list[dict]:
     return out
 
 
+def search_unified_batch(unified: dict, queries: np.ndarray, datasets_dict: dict, k_map: dict,
+                         masks: dict | None = None) -> list[dict]:
+    """
+    One FAISS search over the unified index for a (n, dim) matrix of queries,
+    then source-aware top-k: each query's hits are walked in rank order and
+    each source keeps its first k_map[source] rows.
+    masks: source → packed row bitmap (facets.facet_mask) or None for all rows.
+    With a mask, or a single source, the search runs through a bitmap selector
+    over the unified ids, so only eligible rows are ranked.
+    The fetch window starts at 5x the total quota (1x for a single source)
+    and doubles until, for every query, every source has its quota, has run
+    out of matching rows, or the index is exhausted.
+    Returns one {source: [result dicts]} per query, for the sources in k_map.
+    """
+    index = unified["index"]
+    offsets = unified["offsets"]
+    masks = masks or {}
+    queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, index.d)
+    sources = [s for s in k_map if s in offsets and datasets_dict.get(s) is not None]
+    if not sources:
+        return [{} for _ in range(len(queries))]
+
+    available = {s: mask_count(masks.get(s), offsets[s][1] - offsets[s][0]) for s in sources}
+    params = None
+    total = sum(k_map[s] for s in sources)
+    fetch = total * 5 if len(sources) > 1 else total
+    if len(sources) == 1 or any(masks.get(s) is not None for s in sources):
+        eligible = np.zeros(index.ntotal, dtype=bool)
+        for s in sources:
+            start, end = offsets[s]
+            mask = masks.get(s)
+            eligible[start:end] = True if mask is None else np.unpackbits(mask, count=end - start, bitorder="little")
+        bitmap = np.packbits(eligible, bitorder="little")
+        params = _selector_params(index, faiss.IDSelectorBitmap(index.ntotal, faiss.swig_ptr(bitmap)))
+
+    source_codes = {s: unified["sources"].index(s) for s in sources}
+    while True:
+        fetch = min(fetch, index.ntotal)
+        try:
+            scores, ids = index.search(queries, fetch, params=params)
+        except Exception as e:
+            print(f"[search] FAISS error on unified index: {e}")
+            return [{} for _ in range(len(queries))]
+        hits = []
+        for row_scores, row_ids in zip(scores, ids):
+            valid = row_ids >= 0
+            row_scores, row_ids = row_scores[valid], row_ids[valid]
+            hit_sources = unified["source_ids"][row_ids]
+            per_source = {
+                s: np.flatnonzero(hit_sources == source_codes[s])[:k_map[s]]
+                for s in sources
+            }
+            hits.append((row_scores, row_ids, per_source))
+        if fetch >= index.ntotal or all(
+            len(per_source[s]) >= min(k_map[s], available[s]) for _, _, per_source in hits for s in sources
+        ):
+            break
+        fetch *= 2
+
+    return [
+        {
+            source: _to_rows(
+                datasets_dict[source], unified["row_ids"][row_ids[positions]].tolist(), row_scores[positions], source,
+            )
+            for source, positions in per_source.items()
+        }
+        for row_scores, row_ids, per_source in hits
+    ]
+
+
+def search_unified(unified: dict, query_embedding: list[float], datasets_dict: dict, k_map: dict,
+                   masks: dict | None = None) -> dict:
+    """search_unified_batch for one query: {source: [result dicts]} for the sources in k_map."""
+    query = np.array(query_embedding, dtype=np.float32)
+    return search_unified_batch(unified, query, datasets_dict, k_map, masks)[0]
+
+
+def _search_and_filter(ds, queries: np.ndarray, k: int, source: str, filters: dict,
+                       facets: dict | None) -> list[list[dict]]:
+    """Filtered top-k rows of one source for each query of a (n, dim) matrix."""
+    with span("enirtcod_search_seconds", source=source, batch=int(len(queries) > 1)):
+        if facets is not None:
+            hits = search_ids_batch(ds, queries, k, facet_mask(facets, source, filters), label=source)
+            return [_to_rows(ds, ids.tolist(), scores, source) for ids, scores in hits]
+        # No facet index for this source: over-fetch, post-filter, keep the top k
+        fetch = k * 5 if filters else k
+        hits = search_ids_batch(ds, queries, fetch, label=source)
+        rows = [_to_rows(ds, ids.tolist(), scores, source) for ids, scores in hits]
+        with span("enirtcod_apply_filters_seconds", source=source):
+            return [apply_filters(r, filters)[:k] for r in rows]
+
+
+def _search_unified_and_filter(unified: dict, queries: np.ndarray, datasets_dict: dict,
+                               k_map: dict, filters: dict, facets_dict: dict) -> list[dict]:
+    """
+    Filtered top-k rows of the sources covered by the unified index, for each
+    query. As in _search_and_filter, sources with a facet index are masked
+    inside the search; the others over-fetch 5x their quota, are
+    post-filtered, then cut to k.
+    """
+    with span("enirtcod_search_seconds", source="unified", batch=int(len(queries) > 1)):
+        masks = {s: facet_mask(facets_dict[s], s, filters) for s in k_map if facets_dict.get(s) is not None}
+        unmasked = [s for s in k_map if s not in masks] if filters else []
+        fetch_map = {s: k * 5 if s in unmasked else k for s, k in k_map.items()}
+        batch = search_unified_batch(unified, queries, datasets_dict, fetch_map, masks)
+        if unmasked:
+            with span("enirtcod_apply_filters_seconds", source="unified"):
+                batch = [
+                    {source: apply_filters(rows, filters)[:k_map[source]] if source in unmasked else rows
+                     for source, rows in results.items()}
+                    for results in batch
+                ]
+        return batch
+
+
 def search_all(
     query_embedding: list[float],
     datasets_dict: dict,
     source_filter: str = "Tous",
     filters: dict | None = None,
+    timeout: float | None = None,
+    unified: dict | None = None,
+    facets: dict | None = None,
 ) -> dict:
     """
-    Run search across all loaded datasets.
+    Run search across all loaded datasets, one concurrent task per source.
     source_filter: "Tous" | "Articles" | "Jurisprudence" | "Circulaires" | "Q&R"
+    timeout: seconds to wait for the sources (default SEARCH_TIMEOUT_S); a
+    source still running after it returns [] instead of blocking the response.
+    unified: data_loader.get_unified_index(); the sources it covers are
+    answered by one search_unified task instead of one task each.
+    facets: source → facet index (data_loader.FACETS); filters on sources
+    with one are applied inside the FAISS search, others are post-filtered.
     Returns dict: {articles: [...], jurisprudence: [...], circulaires: [...], reponses: [...]}
     """
     if filters is None:
         filters = {}
+    if facets is None:
+        facets = {}
 
-    source_map = {
-        "Articles":      ["articles"],
-        "Jurisprudence": ["jurisprudence"],
-        "Circulaires":   ["circulaires"],
-        "Q&R":           ["reponses"],
-    }
+    active_sources = sources_for(source_filter)
+    k_map = RESULTS_PER_SOURCE
+    query = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
 
-    active_sources = (
-        source_map.get(source_filter, ["articles", "jurisprudence", "circulaires", "reponses"])
-        if source_filter != "Tous"
-        else ["articles", "jurisprudence", "circulaires", "reponses"]
-    )
+    loaded = [s for s in SOURCES if s in active_sources and datasets_dict.get(s) is not None]
+    covered = [s for s in loaded if unified is not None and s in unified["offsets"]]
 
-    k_map = {"articles": 3, "jurisprudence": 3, "circulaires": 2, "reponses": 1}
+    futures = {
+        source: cpu_pool.submit(
+            _search_and_filter, datasets_dict.get(source), query, k_map[source], source, filters,
+            facets.get(source),
+        )
+        for source in loaded
+        if source not in covered
+    }
+    if covered:
+        unified_future = cpu_pool.submit(
+            _search_unified_and_filter, unified, query, datasets_dict,
+            {s: k_map[s] for s in covered}, filters, facets,
+        )
+        for source in covered:
+            futures[source] = unified_future
+
+    budget = SEARCH_TIMEOUT_S if timeout is None else timeout
+    started = time.monotonic()
+    wait(set(futures.values()), timeout=budget)
 
     result = {}
-    for source in ["articles", "jurisprudence", "circulaires", "reponses"]:
-        if source not in active_sources:
+    for source in SOURCES:
+        future = futures.get(source)
+        if future is None:
+            result[source] = []
+        elif not future.done():
+            print(f"[search] {source} timed out after {time.monotonic() - started:.2f}s — partial results")
             result[source] = []
+        else:
+            try:
+                rows = future.result()[0]
+                result[source] = rows.get(source, []) if source in covered else rows
+            except Exception as e:
+                print(f"[search] {source} failed: {e}")
+                result[source] = []
+
+    return result
+
+
+def search_batch(
+    queries: np.ndarray,
+    datasets_dict: dict,
+    requests: list[dict],
+    unified: dict | None = None,
+    facets: dict | None = None,
+) -> list[dict]:
+    """
+    search_all for many queries at once. queries is an (n, dim) matrix;
+    requests[i] holds the options of query i: "source_filter" (as in
+    search_all), "filters" (apply_filters keys) and optionally "k" (results
+    per source, default RESULTS_PER_SOURCE).
+    Queries sharing the same sources, filters and k form a group, and each
+    group costs one matrix FAISS search per source (or one unified search).
+    No timeout applies: every source answers.
+    Returns one {source: [result dicts]} per query, in the search_all shape.
+    """
+    facets = facets or {}
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    groups: dict = {}
+    for i, request in enumerate(requests):
+        filters = request.get("filters") or {}
+        key = (request.get("source_filter", "Tous"), tuple(sorted(filters.items())), request.get("k"))
+        groups.setdefault(key, []).append(i)
+
+    results = [{source: [] for source in SOURCES} for _ in requests]
+    tasks = []
+    for (source_filter, filter_items, k), members in groups.items():
+        filters = dict(filter_items)
+        k_map = {s: k for s in SOURCES} if k else RESULTS_PER_SOURCE
+        block = queries[members]
+        loaded = [s for s in sources_for(source_filter) if datasets_dict.get(s) is not None]
+        covered = [s for s in loaded if unified is not None and s in unified["offsets"]]
+        for source in loaded:
+            if source not in covered:
+                future = cpu_pool.submit(
+                    _search_and_filter, datasets_dict[source], block, k_map[source], source, filters,
+                    facets.get(source),
+                )
+                tasks.append((members, [source], future))
+        if covered:
+            future = cpu_pool.submit(
+                _search_unified_and_filter, unified, block, datasets_dict,
+                {s: k_map[s] for s in covered}, filters, facets,
+            )
+            tasks.append((members, covered, future))
+
+    for members, sources, future in tasks:
+        try:
+            per_query = future.result()
+        except Exception as e:
+            print(f"[search] batch {', '.join(sources)} failed: {e}")
             continue
+        for i, rows in zip(members, per_query):
+            for source in sources:
+                results[i][source] = rows.get(source, []) if isinstance(rows, dict) else rows
 
-        raw = search_source(datasets_dict.get(source), query_embedding, k_map[source], source)
-        result[source] = apply_filters(raw, filters) if filters else raw
+    return results
 
-    return result
+
+def lookup_references(query: str, datasets_dict: dict, references: dict, source_filter: str = "Tous",
+                      filters: dict | None = None, facets: dict | None = None) -> dict | None:
+    """
+    Exact-reference fast path: when the whole query names references
+    ("article 1240 code civil", "L2121-1 CGCT", "21-20.145", …) that exist in
+    the reference indexes (citations.build_reference_index), return their rows
+    (score 1.0, at most EXACT_MATCH_LIMIT per source) in the search_all shape.
+    filters / facets: as in search_all; the matching rows are narrowed by the
+    facet mask of their source, or post-filtered when it has no facet index.
+    Returns None when the query is not a reference or nothing matches, in
+    which case the caller runs the normal semantic search.
+    """
+    parsed = parse_references(query)
+    if not parsed:
+        return None
+    filters = filters or {}
+    facets = facets or {}
+
+    active = sources_for(source_filter)
+    result = {source: [] for source in SOURCES}
+    found = False
+    for source, keys in parsed.items():
+        index, ds = references.get(source), datasets_dict.get(source)
+        if source not in active or index is None or ds is None:
+            continue
+        postings = [index[key] for key in keys if key in index]
+        if not postings:
+            continue
+        row_ids = np.unique(np.concatenate(postings))
+        if filters and facets.get(source) is None:
+            rows = _to_rows(ds, row_ids.tolist(), [1.0] * len(row_ids), source)
+            rows = apply_filters(rows, filters)[:EXACT_MATCH_LIMIT]
+        else:
+            if filters:
+                row_ids = row_ids[mask_contains(facet_mask(facets[source], source, filters), row_ids)]
+            row_ids = row_ids[:EXACT_MATCH_LIMIT].tolist()
+            rows = _to_rows(ds, row_ids, [1.0] * len(row_ids), source)
+        result[source] = rows
+        found = found or bool(rows)
+    return result if found else None
 
 
-def find_related_decisions(article_id_legifrance: str, juris_ds) -> list[dict]:
+def find_related_decisions(article: dict, juris_ds, citation_index: dict | None = None, limit: int = 3) -> list[dict]:
     """
-    Find up to 3 jurisprudence chunks that mention a given article ID in their chunk_text.
-    Simple O(N) string match — precomputed at startup if dataset is large.
+    Find up to `limit` decisions citing an article (one chunk per decision).
+    With the citation index (citations.build_citation_index) this is a lookup
+    on the article's Legifrance id and "code|num" key; decisions are ranked by
+    how many citations of the article their chunks carry (ties: first row),
+    and only the matching rows are read. Without it, falls back to scanning
+    chunk_text for the id, in row order.
     """
-    if juris_ds is None or not article_id_legifrance:
+    if juris_ds is None:
         return []
 
-    related = []
-    for row in juris_ds:
-        if article_id_legifrance in (row.get("chunk_text") or ""):
-            related.append({
-                "jurisdiction":   row.get("jurisdiction", ""),
-                "date_decision":  row.get("date_decision", ""),
-                "solution":       row.get("solution", ""),
-                "url_judilibre":  row.get("url_judilibre", ""),
-                "chunk_text":     (row.get("chunk_text") or "")[:300],
-            })
-            if len(related) >= 3:
-                break
+    if citation_index is not None:
+        postings = [citation_index[key] for key in article_keys(article) if key in citation_index]
+        if not postings:
+            return []
+        row_ids, counts = np.unique(np.concatenate(postings), return_counts=True)
+        decisions = take_rows(juris_ds, row_ids.tolist(), ["source_id"])
+        citations: dict = {}
+        best_row: dict = {}
+        for row_id, count, row in zip(row_ids.tolist(), counts.tolist(), decisions):
+            decision = row.get("source_id") or row_id
+            citations[decision] = citations.get(decision, 0) + count
+            if count > best_row.get(decision, (0, row_id))[0]:
+                best_row[decision] = (count, row_id)
+        ranked = sorted(citations, key=lambda d: (-citations[d], best_row[d][1]))
+        row_ids = [best_row[decision][1] for decision in ranked[:limit]]
+    else:
+        article_id = article.get("id_legifrance", "")
+        if not article_id:
+            return []
+        texts = juris_ds.data.column("chunk_text")
+        if juris_ds._indices is not None:
+            # Dataset view: scan in view order so row ids are view rows (take_rows maps them)
+            texts = texts.take(juris_ds._indices.column(0))
+        row_ids = []
+        for row_id, text in enumerate(texts.to_pylist()):
+            if article_id in (text or ""):
+                row_ids.append(row_id)
+                if len(row_ids) >= limit * 3:
+                    break
+    if not row_ids:
+        return []
+
+    rows = take_rows(
+        juris_ds, row_ids, ["source_id", "jurisdiction", "date_decision", "solution", "url_judilibre", "chunk_text"],
+    )
+    related, seen = [], set()
+    for row_id, row in zip(row_ids, rows):
+        decision = row.get("source_id") or row_id
+        if decision in seen:
+            continue
+        seen.add(decision)
+        related.append({
+            "jurisdiction":   row.get("jurisdiction") or "",
+            "date_decision":  row.get("date_decision") or "",
+            "solution":       row.get("solution") or "",
+            "url_judilibre":  row.get("url_judilibre") or "",
+            "chunk_text":     (row.get("chunk_text") or "")[:300],
+        })
+        if len(related) >= limit:
+            break
 
     return related
@@ -1,11 +1,18 @@
 """
 synthesis.py — LLM synthesis with inline French legal citations.
+
+synthesize returns the whole text; synthesize_stream yields it chunk by
+chunk as the model generates it (chat_completion stream mode).
 """
 
-from huggingface_hub import InferenceClient
+from clients import inference_client
 
 GENERATION_MODEL = "mistralai/Mistral-7B-Instruct-v0.3"
 
+# Prefix of the text synthesize() returns when the model call fails
+SYNTHESIS_ERROR_PREFIX = "Erreur lors de la synthèse"
+NO_RESULT_MESSAGE = "Aucun résultat pertinent trouvé pour cette requête."
+
 SYSTEM_PROMPT = """Tu es un assistant juridique français expert. Réponds à la question en te basant UNIQUEMENT sur les extraits numérotés fournis. N'utilise aucune connaissance extérieure.
 
 Pour chaque affirmation, cite la source entre crochets selon le style juridique français :
@@ -43,6 +50,14 @@ def format_context_for_llm(results_dict: dict) -> str:
     return "\n\n".join(lines)
 
 
+def _build_messages(query: str, results_dict: dict) -> list[dict]:
+    context = format_context_for_llm(results_dict)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user",   "content": f"Question : {query}\n\nExtraits :\n{context}"},
+    ]
+
+
 def synthesize(query: str, results_dict: dict, hf_token: str) -> str:
     """
     Generate a prose synthesis with inline citations using Mistral 7B Instruct.
@@ -50,17 +65,12 @@ def synthesize(query: str, results_dict: dict, hf_token: str) -> str:
     """
     all_empty = all(len(v) == 0 for v in results_dict.values())
     if all_empty:
-        return "Aucun résultat pertinent trouvé pour cette requête."
-
-    context = format_context_for_llm(results_dict)
+        return NO_RESULT_MESSAGE
 
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user",   "content": f"Question : {query}\n\nExtraits :\n{context}"},
-    ]
+    messages = _build_messages(query, results_dict)
 
     try:
-        client = InferenceClient(token=hf_token)
+        client = inference_client(hf_token)
         response = client.chat_completion(
             model=GENERATION_MODEL,
             messages=messages,
@@ -68,7 +78,33 @@ def synthesize(query: str, results_dict: dict, hf_token: str) -> str:
         )
         return response.choices[0].message.content
     except Exception as e:
-        return f"Erreur lors de la synthèse : {e}"
+        return f"{SYNTHESIS_ERROR_PREFIX} : {e}"
+
+
+def synthesize_stream(query: str, results_dict: dict, hf_token: str):
+    """
+    Streaming variant of synthesize: yields text chunks as the model produces
+    them. Yields the no-result message alone if context is empty. If the call
+    fails, the last chunk starts with SYNTHESIS_ERROR_PREFIX.
+    """
+    if all(len(v) == 0 for v in results_dict.values()):
+        yield NO_RESULT_MESSAGE
+        return
+
+    messages = _build_messages(query, results_dict)
+
+    try:
+        client = inference_client(hf_token)
+        for chunk in client.chat_completion(
+            model=GENERATION_MODEL,
+            messages=messages,
+            max_tokens=1024,
+            stream=True,
+        ):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        yield f"{SYNTHESIS_ERROR_PREFIX} : {e}"
 
 
 # --- Citation key helpers ---
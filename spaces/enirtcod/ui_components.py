@@ -120,10 +120,80 @@ def build_reponse_card(result: dict) -> str:
     </div>"""
 
 
-def build_tabs_html(results_dict: dict, loading_status: dict) -> str:
+def build_synthesis_html(text: str, streaming: bool = False) -> str:
+    """
+    Synthesis panel. While streaming, shows a placeholder until the first
+    tokens arrive, then the text so far followed by a cursor.
+    """
+    if streaming and not text:
+        body = '<span style="color:#9ca3af;font-style:italic">Rédaction de la synthèse…</span>'
+    else:
+        body = text + ("▍" if streaming else "")
+    return f"""
+    <div style="font-family:system-ui,sans-serif;background:#f8fafc;border-radius:8px;
+                padding:16px 20px;border-left:4px solid #2563eb;margin-bottom:16px">
+      <p style="font-size:13px;font-weight:700;color:#2563eb;margin:0 0 10px">Synthèse juridique</p>
+      <div style="font-size:14px;line-height:1.7;color:#1e293b;white-space:pre-wrap">{body}</div>
+    </div>"""
+
+
+def build_loading_status_html(loading_state: dict, loading_detail: dict, index_info: dict | None = None) -> str:
+    """
+    Compact status panel listing each source's loading phase and, once
+    known, its active FAISS index parameters (index_info).
+    Once every source is ready only the index line remains (empty if none).
+    """
+    labels = {
+        "articles":      "Articles",
+        "jurisprudence": "Jurisprudence",
+        "circulaires":   "Circulaires",
+        "reponses":      "Q&R",
+        "unified":       "Index unifié",
+    }
+    index_info = index_info or {}
+    index_items = " · ".join(
+        f'<span style="white-space:nowrap">{label} : <code>{index_info[key]}</code></span>'
+        for key, label in labels.items() if key in index_info
+    )
+    index_line = f'<div style="margin-top:6px;font-size:12px;color:#64748b">Index FAISS — {index_items}</div>' if index_items else ""
+
+    if all(state == "ready" for state in loading_state.values()):
+        if not index_line:
+            return ""
+        return f'<div style="font-family:system-ui,sans-serif;text-align:center">{index_line}</div>'
+    phases = {
+        "pending":  ("⏸️", "en attente"),
+        "loading":  ("⏳", "téléchargement…"),
+        "indexing": ("⚙️", "indexation…"),
+        "ready":    ("✅", "prêt"),
+        "failed":   ("⚠️", "indisponible"),
+    }
+
+    items = ""
+    for key, label in labels.items():
+        if key not in loading_state:
+            continue
+        icon, text = phases.get(loading_state.get(key, "pending"), phases["pending"])
+        detail = loading_detail.get(key, "")
+        detail_html = f' <span style="color:#b45309">({detail})</span>' if detail else ""
+        items += f'<span style="margin:0 10px;white-space:nowrap">{icon} <strong>{label}</strong> : {text}{detail_html}</span>'
+
+    return f"""
+    <div style="background:#fef3c7;border:1px solid #f59e0b;border-radius:8px;
+                padding:10px 16px;font-size:13px;color:#92400e;text-align:center">
+      Chargement des sources juridiques — les recherches portent sur les sources déjà prêtes.
+      <div style="margin-top:6px">{items}</div>{index_line}
+    </div>"""
+
+
+def build_tabs_html(results_dict: dict, loading_status: dict, loading_state: dict | None = None,
+                    match_counts: dict | None = None) -> str:
     """
     Build a 4-tab HTML panel. Each tab shows its source count in the label.
-    If a source failed to load, shows 'Source temporairement indisponible'.
+    If a source is still loading, says so; if it failed to load, shows
+    'Source temporairement indisponible'.
+    match_counts: source → number of documents matching the active filters,
+    shown at the top of each tab when filters are set.
     """
     tabs_config = [
         ("articles",      "Articles",      build_article_card),
@@ -149,12 +219,24 @@ def build_tabs_html(results_dict: dict, loading_status: dict) -> str:
           {label} ({count})
         </button>"""
 
-        if not loading_status.get(key, False):
+        state = (loading_state or {}).get(key)
+        if not loading_status.get(key, False) and state in ("pending", "loading", "indexing"):
+            content = '<p style="color:#9ca3af;font-style:italic;padding:20px">Source en cours de chargement…</p>'
+        elif not loading_status.get(key, False):
             content = '<p style="color:#9ca3af;font-style:italic;padding:20px">Source temporairement indisponible</p>'
+        elif match_counts is not None and match_counts.get(key) == 0:
+            content = '<p style="color:#9ca3af;font-style:italic;padding:20px">Aucun document ne correspond aux filtres.</p>'
         elif not results:
             content = '<p style="color:#9ca3af;font-style:italic;padding:20px">Aucun résultat pour cette source.</p>'
         else:
             content = "".join(builder(r) for r in results)
+            if match_counts is not None and key in match_counts:
+                n = match_counts[key]
+                n_fr = f"{n:,}".replace(",", "\u202f")
+                content = (
+                    f'<p style="color:#6b7280;font-size:12px;margin:0 0 8px">'
+                    f'{n_fr} document{"s" if n > 1 else ""} correspond{"ent" if n > 1 else ""} aux filtres</p>'
+                ) + content
 
         display = "block" if i == 0 else "none"
         tab_panels += f"""